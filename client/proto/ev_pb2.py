@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x08\x65v.proto\x12\x08\x65v_sales\"T\n\rUploadRequest\x12\"\n\x04info\x18\x01 \x01(\x0b\x32\x12.ev_sales.FileInfoH\x00\x12\x14\n\nchunk_data\x18\x02 \x01(\x0cH\x00\x42\t\n\x07payload\"\x1c\n\x08\x46ileInfo\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\"0\n\x0cUploadStatus\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x80\x01\n\x12SalesFilterRequest\x12:\n\x07\x66ilters\x18\x01 \x03(\x0b\x32).ev_sales.SalesFilterRequest.FiltersEntry\x1a.\n\x0c\x46iltersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\x1f\n\nSalesReply\x12\x11\n\tsales_xml\x18\x01 \x03(\t2\x95\x01\n\x07\x45VSales\x12\x46\n\x10GetSalesFiltered\x12\x1c.ev_sales.SalesFilterRequest\x1a\x14.ev_sales.SalesReply\x12\x42\n\rUploadDataset\x12\x17.ev_sales.UploadRequest\x1a\x16.ev_sales.UploadStatus(\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x08\x65v.proto\x12\x08\x65v_sales\"T\n\rUploadRequest\x12\"\n\x04info\x18\x01 \x01(\x0b\x32\x12.ev_sales.FileInfoH\x00\x12\x14\n\nchunk_data\x18\x02 \x01(\x0cH\x00\x42\t\n\x07payload\"\x1c\n\x08\x46ileInfo\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\"Q\n\x0cUploadStatus\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x0e\n\x06job_id\x18\x03 \x01(\t\x12\x0f\n\x07\x64\x61taset\x18\x04 \x01(\t\"\"\n\x10JobStatusRequest\x12\x0e\n\x06job_id\x18\x01 \x01(\t\"\x94\x01\n\tJobStatus\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\r\n\x05state\x18\x02 \x01(\t\x12\r\n\x05stage\x18\x03 \x01(\t\x12\x16\n\x0erows_processed\x18\x04 \x01(\x04\x12\x17\n\x0frows_per_second\x18\x05 \x01(\x01\x12\x17\n\x0f\x65lapsed_seconds\x18\x06 \x01(\x01\x12\x0f\n\x07message\x18\x07 \x01(\t\"\xd2\x02\n\x12SalesFilterRequest\x12:\n\x07\x66ilters\x18\x01 \x03(\x0b\x32).ev_sales.SalesFilterRequest.FiltersEntry\x12\x11\n\tpage_size\x18\x02 \x01(\r\x12\'\n\npredicates\x18\x03 \x03(\x0b\x32\x13.ev_sales.Predicate\x12\x0f\n\x07\x64\x61taset\x18\x04 \x01(\t\x12\x33\n\x06\x66ormat\x18\x05 \x01(\x0e\x32#.ev_sales.SalesFilterRequest.Format\x12\x0e\n\x06\x66ields\x18\x06 \x03(\t\x12\r\n\x05limit\x18\x07 \x01(\r\x12\x0e\n\x06\x63ursor\x18\x08 \x01(\t\x1a.\n\x0c\x46iltersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\x1f\n\x06\x46ormat\x12\x07\n\x03XML\x10\x00\x12\x0c\n\x08\x43OLUMNAR\x10\x01\"\xc7\x01\n\tPredicate\x12\r\n\x05\x66ield\x18\x01 \x01(\t\x12(\n\x02op\x18\x02 \x01(\x0e\x32\x1c.ev_sales.Predicate.Operator\x12$\n\x06values\x18\x03 \x03(\x0b\x32\x14.ev_sales.TypedValue\"[\n\x08Operator\x12\x06\n\x02\x45Q\x10\x00\x12\x06\n\x02NE\x10\x01\x12\x06\n\x02LT\x10\x02\x12\x06\n\x02LE\x10\x03\x12\x06\n\x02GT\x10\x04\x12\x06\n\x02GE\x10\x05\x12\x0b\n\x07\x42\x45TWEEN\x10\x06\x12\x06\n\x02IN\x10\x07\x12\n\n\x06PREFIX\x10\x08\"o\n\nTypedValue\x12\x16\n\x0cstring_value\x18\x01 \x01(\tH\x00\x12\x13\n\tint_value\x18\x02 \x01(\x03H\x00\x12\x16\n\x0c\x64ouble_value\x18\x03 \x01(\x01H\x00\x12\x14\n\nbool_value\x18\x04 \x01(\x08H\x00\x42\x06\n\x04kind\"\x15\n\x13ListDatasetsRequest\"\xc0\x01\n\x0b\x44\x61tasetInfo\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x12\n\ntable_name\x18\x02 \x01(\t\x12\x11\n\trow_count\x18\x03 \x01(\x04\x12\x0f\n\x07\x63olumns\x18\x04 \x03(\t\x12\x14\n\x0csource_bytes\x18\x05 \x01(\x04\x12\x16\n\x0esnapshot_bytes\x18\x06 \x01(\x04\x12\x13\n\x0bindex_bytes\x18\x07 \x01(\x04\x12\x14\n\x0cindex_loaded\x18\x08 \x01(\x08\x12\x12\n\nupdated_at\x18\t \x01(\x01\"O\n\x0b\x44\x61tasetList\x12\'\n\x08\x64\x61tasets\x18\x01 \x03(\x0b\x32\x15.ev_sales.DatasetInfo\x12\x17\n\x0f\x64\x65\x66\x61ult_dataset\x18\x02 \x01(\t\"\x89\x01\n\x0b\x41ggregation\x12\x30\n\x08\x66unction\x18\x01 \x01(\x0e\x32\x1e.ev_sales.Aggregation.Function\x12\r\n\x05\x66ield\x18\x02 \x01(\t\"9\n\x08\x46unction\x12\t\n\x05\x43OUNT\x10\x00\x12\x07\n\x03SUM\x10\x01\x12\x07\n\x03\x41VG\x10\x02\x12\x07\n\x03MIN\x10\x03\x12\x07\n\x03MAX\x10\x04\"\xf5\x01\n\x10\x41ggregateRequest\x12\x0f\n\x07\x64\x61taset\x18\x01 \x01(\t\x12\x38\n\x07\x66ilters\x18\x02 \x03(\x0b\x32\'.ev_sales.AggregateRequest.FiltersEntry\x12\'\n\npredicates\x18\x03 \x03(\x0b\x32\x13.ev_sales.Predicate\x12\x10\n\x08group_by\x18\x04 \x03(\t\x12+\n\x0c\x61ggregations\x18\x05 \x03(\x0b\x32\x15.ev_sales.Aggregation\x1a.\n\x0c\x46iltersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\",\n\x0c\x41ggregateRow\x12\x0c\n\x04keys\x18\x01 \x03(\t\x12\x0e\n\x06values\x18\x02 \x03(\x01\"G\n\x0e\x41ggregateReply\x12\x0f\n\x07\x63olumns\x18\x01 \x03(\t\x12$\n\x04rows\x18\x02 \x03(\x0b\x32\x16.ev_sales.AggregateRow\"\x13\n\x11\x43\x61\x63heStatsRequest\"\xe8\x01\n\nCacheStats\x12\x0f\n\x07\x65nabled\x18\x01 \x01(\x08\x12\x0c\n\x04hits\x18\x02 \x01(\x04\x12\x0e\n\x06misses\x18\x03 \x01(\x04\x12\x11\n\tevictions\x18\x04 \x01(\x04\x12\x13\n\x0b\x65xpirations\x18\x05 \x01(\x04\x12\x15\n\rinvalidations\x18\x06 \x01(\x04\x12\x11\n\ttoo_large\x18\x07 \x01(\x04\x12\x0f\n\x07\x65ntries\x18\x08 \x01(\x04\x12\r\n\x05\x62ytes\x18\t \x01(\x04\x12\x11\n\tmax_bytes\x18\n \x01(\x04\x12\x13\n\x0bmax_entries\x18\x0b \x01(\x04\x12\x11\n\thit_ratio\x18\x0c \x01(\x01\"\xe6\x01\n\x06\x43olumn\x12\x0c\n\x04name\x18\x01 \x01(\t\x12#\n\x04type\x18\x02 \x01(\x0e\x32\x15.ev_sales.Column.Type\x12\x12\n\ndictionary\x18\x03 \x03(\t\x12\r\n\x05\x63odes\x18\x04 \x03(\r\x12\x12\n\nint_values\x18\x05 \x03(\x12\x12\x15\n\rdouble_values\x18\x06 \x03(\x01\x12\x13\n\x0b\x62ool_values\x18\x07 \x03(\x08\x12\x11\n\tnull_rows\x18\x08 \x03(\r\"3\n\x04Type\x12\n\n\x06STRING\x10\x00\x12\t\n\x05INT64\x10\x01\x12\n\n\x06\x44OUBLE\x10\x02\x12\x08\n\x04\x42OOL\x10\x03\"D\n\x0c\x43olumnarRows\x12\x11\n\trow_count\x18\x01 \x01(\r\x12!\n\x07\x63olumns\x18\x02 \x03(\x0b\x32\x10.ev_sales.Column\"^\n\nSalesReply\x12\x11\n\tsales_xml\x18\x01 \x03(\t\x12(\n\x08\x63olumnar\x18\x02 \x01(\x0b\x32\x16.ev_sales.ColumnarRows\x12\x13\n\x0bnext_cursor\x18\x03 \x01(\t2\xb2\x04\n\x07\x45VSales\x12\x46\n\x10GetSalesFiltered\x12\x1c.ev_sales.SalesFilterRequest\x1a\x14.ev_sales.SalesReply\x12\x42\n\rUploadDataset\x12\x17.ev_sales.UploadRequest\x1a\x16.ev_sales.UploadStatus(\x01\x12N\n\x16GetSalesFilteredStream\x12\x1c.ev_sales.SalesFilterRequest\x1a\x14.ev_sales.SalesReply0\x01\x12?\n\x0cGetJobStatus\x12\x1a.ev_sales.JobStatusRequest\x1a\x13.ev_sales.JobStatus\x12=\n\x08WatchJob\x12\x1a.ev_sales.JobStatusRequest\x1a\x13.ev_sales.JobStatus0\x01\x12\x44\n\x0cListDatasets\x12\x1d.ev_sales.ListDatasetsRequest\x1a\x15.ev_sales.DatasetList\x12\x42\n\rGetCacheStats\x12\x1b.ev_sales.CacheStatsRequest\x1a\x14.ev_sales.CacheStats\x12\x41\n\tAggregate\x12\x1a.ev_sales.AggregateRequest\x1a\x18.ev_sales.AggregateReplyb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,18 +33,60 @@ if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_SALESFILTERREQUEST_FILTERSENTRY']._loaded_options = None
   _globals['_SALESFILTERREQUEST_FILTERSENTRY']._serialized_options = b'8\001'
+  _globals['_AGGREGATEREQUEST_FILTERSENTRY']._loaded_options = None
+  _globals['_AGGREGATEREQUEST_FILTERSENTRY']._serialized_options = b'8\001'
   _globals['_UPLOADREQUEST']._serialized_start=22
   _globals['_UPLOADREQUEST']._serialized_end=106
   _globals['_FILEINFO']._serialized_start=108
   _globals['_FILEINFO']._serialized_end=136
   _globals['_UPLOADSTATUS']._serialized_start=138
-  _globals['_UPLOADSTATUS']._serialized_end=186
-  _globals['_SALESFILTERREQUEST']._serialized_start=189
-  _globals['_SALESFILTERREQUEST']._serialized_end=317
-  _globals['_SALESFILTERREQUEST_FILTERSENTRY']._serialized_start=271
-  _globals['_SALESFILTERREQUEST_FILTERSENTRY']._serialized_end=317
-  _globals['_SALESREPLY']._serialized_start=319
-  _globals['_SALESREPLY']._serialized_end=350
-  _globals['_EVSALES']._serialized_start=353
-  _globals['_EVSALES']._serialized_end=502
+  _globals['_UPLOADSTATUS']._serialized_end=219
+  _globals['_JOBSTATUSREQUEST']._serialized_start=221
+  _globals['_JOBSTATUSREQUEST']._serialized_end=255
+  _globals['_JOBSTATUS']._serialized_start=258
+  _globals['_JOBSTATUS']._serialized_end=406
+  _globals['_SALESFILTERREQUEST']._serialized_start=409
+  _globals['_SALESFILTERREQUEST']._serialized_end=747
+  _globals['_SALESFILTERREQUEST_FILTERSENTRY']._serialized_start=668
+  _globals['_SALESFILTERREQUEST_FILTERSENTRY']._serialized_end=714
+  _globals['_SALESFILTERREQUEST_FORMAT']._serialized_start=716
+  _globals['_SALESFILTERREQUEST_FORMAT']._serialized_end=747
+  _globals['_PREDICATE']._serialized_start=750
+  _globals['_PREDICATE']._serialized_end=949
+  _globals['_PREDICATE_OPERATOR']._serialized_start=858
+  _globals['_PREDICATE_OPERATOR']._serialized_end=949
+  _globals['_TYPEDVALUE']._serialized_start=951
+  _globals['_TYPEDVALUE']._serialized_end=1062
+  _globals['_LISTDATASETSREQUEST']._serialized_start=1064
+  _globals['_LISTDATASETSREQUEST']._serialized_end=1085
+  _globals['_DATASETINFO']._serialized_start=1088
+  _globals['_DATASETINFO']._serialized_end=1280
+  _globals['_DATASETLIST']._serialized_start=1282
+  _globals['_DATASETLIST']._serialized_end=1361
+  _globals['_AGGREGATION']._serialized_start=1364
+  _globals['_AGGREGATION']._serialized_end=1501
+  _globals['_AGGREGATION_FUNCTION']._serialized_start=1444
+  _globals['_AGGREGATION_FUNCTION']._serialized_end=1501
+  _globals['_AGGREGATEREQUEST']._serialized_start=1504
+  _globals['_AGGREGATEREQUEST']._serialized_end=1749
+  _globals['_AGGREGATEREQUEST_FILTERSENTRY']._serialized_start=668
+  _globals['_AGGREGATEREQUEST_FILTERSENTRY']._serialized_end=714
+  _globals['_AGGREGATEROW']._serialized_start=1751
+  _globals['_AGGREGATEROW']._serialized_end=1795
+  _globals['_AGGREGATEREPLY']._serialized_start=1797
+  _globals['_AGGREGATEREPLY']._serialized_end=1868
+  _globals['_CACHESTATSREQUEST']._serialized_start=1870
+  _globals['_CACHESTATSREQUEST']._serialized_end=1889
+  _globals['_CACHESTATS']._serialized_start=1892
+  _globals['_CACHESTATS']._serialized_end=2124
+  _globals['_COLUMN']._serialized_start=2127
+  _globals['_COLUMN']._serialized_end=2357
+  _globals['_COLUMN_TYPE']._serialized_start=2306
+  _globals['_COLUMN_TYPE']._serialized_end=2357
+  _globals['_COLUMNARROWS']._serialized_start=2359
+  _globals['_COLUMNARROWS']._serialized_end=2427
+  _globals['_SALESREPLY']._serialized_start=2429
+  _globals['_SALESREPLY']._serialized_end=2523
+  _globals['_EVSALES']._serialized_start=2526
+  _globals['_EVSALES']._serialized_end=3088
 # @@protoc_insertion_point(module_scope)
@@ -26,10 +26,7 @@ if _version_not_supported:
 
 
 class EVSalesStub(object):
-    """====================================================================
-    Definição do Serviço
-    ====================================================================
-    """
+    """Missing associated documentation comment in .proto file."""
 
     def __init__(self, channel):
         """Constructor.
@@ -47,24 +44,85 @@ class EVSalesStub(object):
                 request_serializer=ev__pb2.UploadRequest.SerializeToString,
                 response_deserializer=ev__pb2.UploadStatus.FromString,
                 _registered_method=True)
+        self.GetSalesFilteredStream = channel.unary_stream(
+                '/ev_sales.EVSales/GetSalesFilteredStream',
+                request_serializer=ev__pb2.SalesFilterRequest.SerializeToString,
+                response_deserializer=ev__pb2.SalesReply.FromString,
+                _registered_method=True)
+        self.GetJobStatus = channel.unary_unary(
+                '/ev_sales.EVSales/GetJobStatus',
+                request_serializer=ev__pb2.JobStatusRequest.SerializeToString,
+                response_deserializer=ev__pb2.JobStatus.FromString,
+                _registered_method=True)
+        self.WatchJob = channel.unary_stream(
+                '/ev_sales.EVSales/WatchJob',
+                request_serializer=ev__pb2.JobStatusRequest.SerializeToString,
+                response_deserializer=ev__pb2.JobStatus.FromString,
+                _registered_method=True)
+        self.ListDatasets = channel.unary_unary(
+                '/ev_sales.EVSales/ListDatasets',
+                request_serializer=ev__pb2.ListDatasetsRequest.SerializeToString,
+                response_deserializer=ev__pb2.DatasetList.FromString,
+                _registered_method=True)
+        self.GetCacheStats = channel.unary_unary(
+                '/ev_sales.EVSales/GetCacheStats',
+                request_serializer=ev__pb2.CacheStatsRequest.SerializeToString,
+                response_deserializer=ev__pb2.CacheStats.FromString,
+                _registered_method=True)
+        self.Aggregate = channel.unary_unary(
+                '/ev_sales.EVSales/Aggregate',
+                request_serializer=ev__pb2.AggregateRequest.SerializeToString,
+                response_deserializer=ev__pb2.AggregateReply.FromString,
+                _registered_method=True)
 
 
 class EVSalesServicer(object):
-    """====================================================================
-    Definição do Serviço
-    ====================================================================
-    """
+    """Missing associated documentation comment in .proto file."""
 
     def GetSalesFiltered(self, request, context):
-        """Método 1: Consulta de filtros (existente)
-        """
+        """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
     def UploadDataset(self, request_iterator, context):
-        """Método 2: Dataset Upload (Obrigatório para o Servidor Dinâmico)
-        """
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetSalesFilteredStream(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetJobStatus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WatchJob(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListDatasets(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetCacheStats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Aggregate(self, request, context):
+        """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
@@ -82,6 +140,36 @@ def add_EVSalesServicer_to_server(servicer, server):
                     request_deserializer=ev__pb2.UploadRequest.FromString,
                     response_serializer=ev__pb2.UploadStatus.SerializeToString,
             ),
+            'GetSalesFilteredStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetSalesFilteredStream,
+                    request_deserializer=ev__pb2.SalesFilterRequest.FromString,
+                    response_serializer=ev__pb2.SalesReply.SerializeToString,
+            ),
+            'GetJobStatus': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetJobStatus,
+                    request_deserializer=ev__pb2.JobStatusRequest.FromString,
+                    response_serializer=ev__pb2.JobStatus.SerializeToString,
+            ),
+            'WatchJob': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchJob,
+                    request_deserializer=ev__pb2.JobStatusRequest.FromString,
+                    response_serializer=ev__pb2.JobStatus.SerializeToString,
+            ),
+            'ListDatasets': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListDatasets,
+                    request_deserializer=ev__pb2.ListDatasetsRequest.FromString,
+                    response_serializer=ev__pb2.DatasetList.SerializeToString,
+            ),
+            'GetCacheStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetCacheStats,
+                    request_deserializer=ev__pb2.CacheStatsRequest.FromString,
+                    response_serializer=ev__pb2.CacheStats.SerializeToString,
+            ),
+            'Aggregate': grpc.unary_unary_rpc_method_handler(
+                    servicer.Aggregate,
+                    request_deserializer=ev__pb2.AggregateRequest.FromString,
+                    response_serializer=ev__pb2.AggregateReply.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'ev_sales.EVSales', rpc_method_handlers)
@@ -91,10 +179,7 @@ def add_EVSalesServicer_to_server(servicer, server):
 
  # This class is part of an EXPERIMENTAL API.
 class EVSales(object):
-    """====================================================================
-    Definição do Serviço
-    ====================================================================
-    """
+    """Missing associated documentation comment in .proto file."""
 
     @staticmethod
     def GetSalesFiltered(request,
@@ -149,3 +234,165 @@ class EVSales(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetSalesFilteredStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/ev_sales.EVSales/GetSalesFilteredStream',
+            ev__pb2.SalesFilterRequest.SerializeToString,
+            ev__pb2.SalesReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetJobStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/ev_sales.EVSales/GetJobStatus',
+            ev__pb2.JobStatusRequest.SerializeToString,
+            ev__pb2.JobStatus.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WatchJob(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/ev_sales.EVSales/WatchJob',
+            ev__pb2.JobStatusRequest.SerializeToString,
+            ev__pb2.JobStatus.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListDatasets(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/ev_sales.EVSales/ListDatasets',
+            ev__pb2.ListDatasetsRequest.SerializeToString,
+            ev__pb2.DatasetList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetCacheStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/ev_sales.EVSales/GetCacheStats',
+            ev__pb2.CacheStatsRequest.SerializeToString,
+            ev__pb2.CacheStats.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Aggregate(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/ev_sales.EVSales/Aggregate',
+            ev__pb2.AggregateRequest.SerializeToString,
+            ev__pb2.AggregateReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
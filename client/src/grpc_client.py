@@ -1,3 +1,4 @@
+import csv
 import grpc
 import sys
 from pathlib import Path
@@ -33,9 +34,7 @@ except ImportError as e:
     logging.error(f"Failed to import stubs (ev_pb2/ev_pb2_grpc). Check local compilation: {e}")
 
 
-def filter_sales_logic(stub: ev_pb2_grpc.EVSalesStub):
-    print("\n--- Start Sales Query (Filters) ---")
-    
+def read_filters() -> dict:
     filters = {}
     print("Enter filters (leave 'Field' empty to finish):")
     
@@ -46,16 +45,107 @@ def filter_sales_logic(stub: ev_pb2_grpc.EVSalesStub):
         value = input(f"Value for {field}: ").strip()
         filters[field] = value
 
+    return filters
+
+
+def read_dataset() -> str:
+    return input("Dataset (empty for the latest upload): ").strip()
+
+
+def columnar_records(columnar) -> list:
+    # Decodes a ColumnarRows page into one dict per row; empty cells come back as None.
+    columns = []
+    for column in columnar.columns:
+        if column.type == ev_pb2.Column.STRING:
+            values = [column.dictionary[code] for code in column.codes]
+        elif column.type == ev_pb2.Column.INT64:
+            values = list(column.int_values)
+        elif column.type == ev_pb2.Column.DOUBLE:
+            values = list(column.double_values)
+        else:
+            values = list(column.bool_values)
+        for row in column.null_rows:
+            values[row] = None
+        columns.append(values)
+
+    names = [column.name for column in columnar.columns]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def fetch_sales(stub: ev_pb2_grpc.EVSalesStub, request: ev_pb2.SalesFilterRequest) -> list:
+    # Follows next_cursor for as long as the user asks for another page.
+    replies = []
+    while True:
+        reply = stub.GetSalesFiltered(request)
+        replies.append(reply)
+        if not reply.next_cursor:
+            return replies
+        if input("More records available. Fetch the next page? (y/N): ").strip().lower() != "y":
+            return replies
+        request.cursor = reply.next_cursor
+
+
+def columnar_sales_logic(stub: ev_pb2_grpc.EVSalesStub, request: ev_pb2.SalesFilterRequest):
     try:
-        response = stub.GetSalesFiltered(ev_pb2.SalesFilterRequest(filters=filters))
+        replies = fetch_sales(stub, request)
     except grpc.RpcError as e:
         print(f"gRPC Communication Failure. Code: {e.code()}")
         print(f"Details: {e.details()}")
         return
 
-    if response.sales_xml:
-        total_records = len(response.sales_xml)
-        xml_content = "\n".join(response.sales_xml)
+    records = [record for reply in replies for record in columnar_records(reply.columnar)]
+    if not records:
+        print("\nNo data matched the filters.")
+        return
+
+    CLIENT_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    file_path = CLIENT_DATA_DIR / "filtered_results.csv"
+    try:
+        with open(file_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+    except Exception as e:
+        print(f"Error saving file locally: {e}")
+
+    print(f"\nTotal records: {len(records)} ({sum(reply.ByteSize() for reply in replies)} bytes)\n")
+    for i, record in enumerate(records[:3], 1):
+        print(f"--- Record {i} ---")
+        print(record)
+    if len(records) > 3:
+        print(f"...")
+        print(f"({len(records) - 3} more records not shown here)")
+
+    print(f"\nFiltered CSV saved successfully.")
+    print(f"File path: {file_path}")
+
+
+def filter_sales_logic(stub: ev_pb2_grpc.EVSalesStub):
+    print("\n--- Start Sales Query (Filters) ---")
+    
+    dataset = read_dataset()
+    filters = read_filters()
+    fields = [field.strip() for field in input("Fields (comma-separated, empty for all): ").split(",") if field.strip()]
+    limit = input("Records per page (empty for all): ").strip()
+    columnar = input("Reply format (xml/columnar, empty for xml): ").strip().lower() == "columnar"
+
+    request = ev_pb2.SalesFilterRequest(filters=filters, dataset=dataset, fields=fields, limit=int(limit) if limit.isdigit() else 0)
+    if columnar:
+        request.format = ev_pb2.SalesFilterRequest.COLUMNAR
+        columnar_sales_logic(stub, request)
+        return
+
+    try:
+        replies = fetch_sales(stub, request)
+    except grpc.RpcError as e:
+        print(f"gRPC Communication Failure. Code: {e.code()}")
+        print(f"Details: {e.details()}")
+        return
+
+    sales = [sale for reply in replies for sale in reply.sales_xml]
+    if sales:
+        total_records = len(sales)
+        xml_content = "\n".join(sales)
         
         CLIENT_DATA_DIR.mkdir(parents=True, exist_ok=True) 
         file_path = CLIENT_DATA_DIR / "filtered_results.xml"
@@ -70,7 +160,7 @@ def filter_sales_logic(stub: ev_pb2_grpc.EVSalesStub):
         
         num_to_display = 3
         
-        for i, sale in enumerate(response.sales_xml[:num_to_display], 1):
+        for i, sale in enumerate(sales[:num_to_display], 1):
             print(f"--- Record {i} ---")
             print(sale)
         
@@ -84,11 +174,170 @@ def filter_sales_logic(stub: ev_pb2_grpc.EVSalesStub):
     else:
         if filters:
              print("\nNo data matched the filters.")
-             print("Check the Server log for warnings on fields or values that might have been ignored.")
+             print("Filters on unknown fields or values are ignored, and a query whose filters were all ignored returns no data; see the Server log.")
         else:
              print("No data received for these filters.")
 
 
+def filter_sales_stream_logic(stub: ev_pb2_grpc.EVSalesStub):
+    print("\n--- Start Sales Query (Stream) ---")
+
+    dataset = read_dataset()
+    filters = read_filters()
+    page_size = input("Page size (empty for server default): ").strip()
+    request = ev_pb2.SalesFilterRequest(filters=filters, page_size=int(page_size) if page_size.isdigit() else 0, dataset=dataset)
+
+    CLIENT_DATA_DIR.mkdir(parents=True, exist_ok=True) 
+    file_path = CLIENT_DATA_DIR / "filtered_results.xml"
+
+    total_records = 0
+    pages = 0
+    num_to_display = 3
+
+    try:
+        with open(file_path, "w", encoding="utf-8") as f:
+            for page in stub.GetSalesFilteredStream(request):
+                for sale in page.sales_xml:
+                    if total_records:
+                        f.write("\n")
+                    f.write(sale)
+
+                    total_records += 1
+                    if total_records <= num_to_display:
+                        print(f"--- Record {total_records} ---")
+                        print(sale)
+                pages += 1
+    except grpc.RpcError as e:
+        print(f"gRPC Communication Failure. Code: {e.code()}")
+        print(f"Details: {e.details()}")
+        return
+    except Exception as e:
+        print(f"Error saving file locally: {e}")
+        return
+
+    if total_records:
+        if total_records > num_to_display:
+            print(f"...")
+            print(f"({total_records - num_to_display} more records not shown here)")
+
+        print(f"\nTotal records: {total_records} ({pages} pages)")
+        print(f"\nFiltered XML saved successfully.")
+        print(f"File path: {file_path}") 
+    else:
+        print("\nNo data matched the filters.")
+        print("Filters on unknown fields or values are ignored, and a query whose filters were all ignored returns no data; see the Server log.")
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def upload_requests(file_path: Path) -> Iterator[ev_pb2.UploadRequest]:
+    yield ev_pb2.UploadRequest(info=ev_pb2.FileInfo(filename=file_path.name))
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield ev_pb2.UploadRequest(chunk_data=chunk)
+
+
+def upload_dataset_logic(stub: ev_pb2_grpc.EVSalesStub):
+    print("\n--- Upload Dataset (CSV) ---")
+
+    file_path = Path(input("CSV file path: ").strip())
+    if not file_path.is_file():
+        print(f"File not found: {file_path}")
+        return
+
+    try:
+        status = stub.UploadDataset(upload_requests(file_path))
+    except grpc.RpcError as e:
+        print(f"gRPC Communication Failure. Code: {e.code()}")
+        print(f"Details: {e.details()}")
+        return
+
+    print(status.message)
+    if not status.success or not status.job_id:
+        return
+
+    job = None
+    try:
+        for job in stub.WatchJob(ev_pb2.JobStatusRequest(job_id=status.job_id)):
+            print(
+                f"[{job.state}] stage={job.stage or '-'} rows={job.rows_processed} "
+                f"({job.rows_per_second:.0f} rows/s, {job.elapsed_seconds:.1f}s)"
+            )
+    except grpc.RpcError as e:
+        print(f"Lost track of job {status.job_id}. Code: {e.code()}")
+        return
+
+    if job is not None and job.message:
+        print(job.message)
+    if status.dataset:
+        print(f"Query it as dataset '{status.dataset}'.")
+
+
+def list_datasets_logic(stub: ev_pb2_grpc.EVSalesStub):
+    print("\n--- Datasets ---")
+
+    try:
+        response = stub.ListDatasets(ev_pb2.ListDatasetsRequest())
+    except grpc.RpcError as e:
+        print(f"gRPC Communication Failure. Code: {e.code()}")
+        print(f"Details: {e.details()}")
+        return
+
+    if not response.datasets:
+        print("No datasets loaded.")
+        return
+
+    for dataset in response.datasets:
+        marker = "*" if dataset.name == response.default_dataset else " "
+        print(
+            f"{marker} {dataset.name}: {dataset.row_count} rows, {len(dataset.columns)} columns, "
+            f"source {dataset.source_bytes / 1024:.0f} KiB, snapshot {dataset.snapshot_bytes / 1024:.0f} KiB, "
+            f"index {'in memory' if dataset.index_loaded else 'not loaded'}"
+        )
+    print("(* = default when no dataset is given)")
+
+
+def aggregate_logic(stub: ev_pb2_grpc.EVSalesStub):
+    print("\n--- Aggregate ---")
+
+    dataset = read_dataset()
+    filters = read_filters()
+    group_by = [name.strip() for name in input("Group by (comma-separated, empty for totals): ").split(",") if name.strip()]
+
+    aggregations = []
+    print("Enter aggregates as function:field, e.g. sum:value (functions: count, sum, avg, min, max; empty to finish):")
+    while True:
+        text = input("Aggregate: ").strip()
+        if not text:
+            break
+        function, _, field = text.partition(":")
+        try:
+            aggregations.append(ev_pb2.Aggregation(function=ev_pb2.Aggregation.Function.Value(function.strip().upper()), field=field.strip()))
+        except ValueError:
+            print(f"Unknown function '{function}'.")
+
+    request = ev_pb2.AggregateRequest(dataset=dataset, filters=filters, group_by=group_by, aggregations=aggregations)
+    try:
+        response = stub.Aggregate(request)
+    except grpc.RpcError as e:
+        print(f"gRPC Communication Failure. Code: {e.code()}")
+        print(f"Details: {e.details()}")
+        return
+
+    print("\n" + " | ".join(response.columns))
+    for row in response.rows:
+        values = [f"{value:g}" for value in row.values]
+        print(" | ".join(list(row.keys) + values))
+    print(f"\n{len(response.rows)} groups.")
+    # Nothing but zeros and NaN (value != value) means no row matched.
+    if filters and not any(value for row in response.rows for value in row.values if value == value):
+        print("In aggregates a filter value the column does not have matches no rows; see the Server log for warnings.")
+
+
 def run():
     try:
         channel = grpc.insecure_channel('localhost:50051')
@@ -105,7 +354,11 @@ def run():
     while True:
         print("\n==================================")
         print("1. Start Sales Query (Filters)")
-        print("2. Exit")
+        print("2. Start Sales Query (Stream)")
+        print("3. Upload Dataset (CSV)")
+        print("4. List Datasets")
+        print("5. Aggregate")
+        print("6. Exit")
         print("==================================")
         
         option = input("Option: ").strip()
@@ -113,6 +366,14 @@ def run():
         if option == "1":
             filter_sales_logic(stub)
         elif option == "2":
+            filter_sales_stream_logic(stub)
+        elif option == "3":
+            upload_dataset_logic(stub)
+        elif option == "4":
+            list_datasets_logic(stub)
+        elif option == "5":
+            aggregate_logic(stub)
+        elif option == "6":
             print("Shutting down client...")
             break
         else:
@@ -0,0 +1,184 @@
+import argparse
+import csv
+import io
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+import logging
+
+import grpc
+
+PROTO_DIR = Path(__file__).resolve().parent.parent / "proto"
+if str(PROTO_DIR) not in sys.path:
+    sys.path.append(str(PROTO_DIR))
+
+import ev_pb2
+import ev_pb2_grpc
+
+logging.getLogger().setLevel(logging.WARNING)
+
+DEFAULT_CSV = Path(__file__).resolve().parent.parent / "data" / "test.csv"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class Variant:
+    # One version of the dataset the uploaders publish, and how many rows the filter must return for it.
+    def __init__(self, name: str, data: bytes, field: str, value: str):
+        self.name = name
+        self.data = data
+        self.expected = sum(1 for row in csv.DictReader(io.StringIO(data.decode("utf-8"))) if row[field] == value)
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.codes = Counter()
+        self.results = Counter()
+        self.inconsistent = 0
+        self.uploads = []
+        self.upload_failures = 0
+
+    def query(self, latency: float, code: str, rows: int, consistent: bool):
+        with self.lock:
+            self.latencies.append(latency)
+            self.codes[code] += 1
+            if code == "OK":
+                self.results[rows] += 1
+                self.inconsistent += not consistent
+
+
+def make_variants(csv_path: Path, field: str, value: str):
+    data = csv_path.read_bytes()
+    lines = data.splitlines(keepends=True)
+    header, body = lines[0], lines[1:]
+    half = header + b"".join(body[:len(body) // 2])
+    return [Variant("full", data, field, value), Variant("half", half, field, value)]
+
+
+def default_filter(csv_path: Path):
+    # First column of the first row: present in both variants.
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        row = next(csv.DictReader(f))
+    field = next(iter(row))
+    return field, row[field]
+
+
+def upload(stub, filename: str, data: bytes) -> bool:
+    def requests():
+        yield ev_pb2.UploadRequest(info=ev_pb2.FileInfo(filename=filename))
+        for start in range(0, len(data), UPLOAD_CHUNK_SIZE):
+            yield ev_pb2.UploadRequest(chunk_data=data[start:start + UPLOAD_CHUNK_SIZE])
+
+    status = stub.UploadDataset(requests())
+    if not status.success:
+        return False
+    for job in stub.WatchJob(ev_pb2.JobStatusRequest(job_id=status.job_id)):
+        if job.state in ("SUCCEEDED", "FAILED"):
+            return job.state == "SUCCEEDED"
+    return False
+
+
+def run_queries(stub, request, stream: bool, valid_counts: set, stats: Stats, stop: threading.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            if stream:
+                rows = sum(len(reply.sales_xml) for reply in stub.GetSalesFilteredStream(request))
+            else:
+                rows = len(stub.GetSalesFiltered(request).sales_xml)
+            code = "OK"
+        except grpc.RpcError as e:
+            rows, code = 0, e.code().name
+        stats.query(time.perf_counter() - start, code, rows, rows in valid_counts)
+
+
+def run_uploads(stub, filename: str, variants, stats: Stats, stop: threading.Event, offset: int):
+    i = offset
+    while not stop.is_set():
+        variant = variants[i % len(variants)]
+        start = time.perf_counter()
+        try:
+            ok = upload(stub, filename, variant.data)
+        except grpc.RpcError:
+            ok = False
+        with stats.lock:
+            if ok:
+                stats.uploads.append(time.perf_counter() - start)
+            else:
+                stats.upload_failures += 1
+        i += 1
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(args):
+    field, value = args.filter.split("=", 1) if args.filter else default_filter(args.csv)
+    variants = make_variants(args.csv, field, value)
+    valid_counts = {variant.expected for variant in variants}
+    filename = f"{args.dataset}.csv"
+    dataset = filename.replace('.', '_').replace('-', '_').lower()
+
+    print(f"Target {args.target}, dataset '{dataset}', filter {field}={value!r}")
+    print("Variants: " + ", ".join(f"{v.name} ({len(v.data) / 1e6:.1f} MB, expects {v.expected} rows)" for v in variants))
+
+    with grpc.insecure_channel(args.target) as channel:
+        stub = ev_pb2_grpc.EVSalesStub(channel)
+        if not upload(stub, filename, variants[0].data):
+            print("Initial upload failed.")
+            return 1
+
+        request = ev_pb2.SalesFilterRequest(filters={field: value}, dataset=dataset)
+        stats = Stats()
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=run_queries, args=(stub, request, args.stream, valid_counts, stats, stop))
+            for _ in range(args.queries)
+        ] + [
+            threading.Thread(target=run_uploads, args=(stub, filename, variants, stats, stop, i + 1))
+            for i in range(args.uploads)
+        ]
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    latencies = [latency * 1000 for latency in stats.latencies]
+    print(f"\n{'queries':<14} {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.1f}/s), {args.queries} threads")
+    print(f"{'latency (ms)':<14} p50 {percentile(latencies, 50):.1f}  p95 {percentile(latencies, 95):.1f}  "
+          f"p99 {percentile(latencies, 99):.1f}  max {max(latencies, default=0):.1f}")
+    print(f"{'status':<14} {dict(stats.codes)}")
+    print(f"{'row counts':<14} {dict(stats.results)}")
+    print(f"{'uploads':<14} {len(stats.uploads)} published, {stats.upload_failures} failed, "
+          f"median {percentile(stats.uploads, 50):.2f}s to publish")
+    print(f"{'inconsistent':<14} {stats.inconsistent}")
+
+    # Any error or a row count that matches no published version means a query saw a partial dataset.
+    return 0 if stats.inconsistent == 0 and set(stats.codes) <= {"OK"} and not stats.upload_failures else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a dataset from many threads while it is re-uploaded over and over.")
+    parser.add_argument("--target", default="localhost:50051")
+    parser.add_argument("--csv", type=Path, default=DEFAULT_CSV)
+    parser.add_argument("--dataset", default="bench-concurrency", help="Upload file name (without .csv) the dataset is named after.")
+    parser.add_argument("--filter", help="field=value; defaults to the first column of the first row.")
+    parser.add_argument("--queries", type=int, default=8, help="Query threads.")
+    parser.add_argument("--uploads", type=int, default=2, help="Upload threads.")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--stream", action="store_true", help="Use GetSalesFilteredStream instead of GetSalesFiltered.")
+    args = parser.parse_args()
+
+    sys.exit(run(args))
@@ -0,0 +1,454 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent import futures
+from contextlib import contextmanager
+from pathlib import Path
+import logging
+
+import grpc
+
+BENCH_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCH_DIR.parent / "src"
+PROTO_DIR = BENCH_DIR.parent / "proto"
+for path in (SRC_DIR, PROTO_DIR):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+import ev_pb2
+import ev_pb2_grpc
+from generate_dataset import ensure_dataset, parse_rows
+from jobs import Job
+
+logging.getLogger().setLevel(logging.WARNING)
+
+ETL_MODES = ["fast", "parallel", "xml"]
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+DEFAULT_DATA_DIR = Path(tempfile.gettempdir()) / "ev_bench"
+
+
+# ---------------------------------------------------------------- memory
+
+def reset_peak_rss() -> bool:
+    # Linux: writing 5 to clear_refs resets VmHWM, so each stage reports its own peak.
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak of the whole process (KB on Linux).
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def children_peak_rss_mb() -> float:
+    # Largest finished child (parallel ETL workers), once the pool that ran them has shut down.
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+# ---------------------------------------------------------------- database stub
+
+class StubCursor:
+    # Accepts every statement; COPY input is read to the end, so building it is still timed.
+    rowcount = 0
+
+    def execute(self, sql, params=None):
+        pass
+
+    def copy_expert(self, sql, file, size=UPLOAD_CHUNK_SIZE):
+        while file.read(size):
+            pass
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return (0,)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class StubConnection:
+    closed = 0
+
+    def cursor(self, *args, **kwargs):
+        return StubCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@contextmanager
+def stub_connection():
+    yield StubConnection()
+
+
+# ---------------------------------------------------------------- server
+
+def load_server(args, datasets_dir: Path):
+    # The server modules read their settings from the environment when imported.
+    os.environ["DATASETS_DIR"] = str(datasets_dir)
+    os.environ["QUERY_BACKEND"] = args.backend
+    os.environ["RESULT_CACHE_ENABLED"] = "true" if args.result_cache else "false"
+
+    import grpc_server
+    import import_xml_to_postgres
+
+    if args.db == "stub":
+        if args.backend == "postgres":
+            raise SystemExit("The postgres query backend needs --db postgres.")
+        import_xml_to_postgres.connection = stub_connection
+    else:
+        grpc_server.init_db_pool()
+    return grpc_server
+
+
+class InProcessServer:
+    # The real servicer behind a gRPC server on an ephemeral local port, so RPCs pay serialization and transport.
+
+    def __init__(self, servicer, mode: str, threads: int):
+        self.servicer = servicer
+        self.mode = mode
+        self.threads = threads
+        self.port = 0
+        self._server = None
+        self._loop = None
+        self._stopped = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self) -> str:
+        if self.mode == "sync":
+            self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=self.threads))
+            ev_pb2_grpc.add_EVSalesServicer_to_server(self.servicer, self._server)
+            self.port = self._server.add_insecure_port("127.0.0.1:0")
+            self._server.start()
+        else:
+            self._thread = threading.Thread(target=asyncio.run, args=(self._serve_aio(),), daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return f"127.0.0.1:{self.port}"
+
+    async def _serve_aio(self):
+        import grpc_aio_server
+
+        aio_servicer = grpc_aio_server.AsyncEVSalesServicer(self.servicer)
+        server = grpc.aio.server()
+        ev_pb2_grpc.add_EVSalesServicer_to_server(aio_servicer, server)
+        self.port = server.add_insecure_port("127.0.0.1:0")
+        await server.start()
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._ready.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            await server.stop(0)
+            aio_servicer.shutdown()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop(0)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+            self._thread.join()
+
+
+# ---------------------------------------------------------------- ETL stages
+
+class StageTimer(Job):
+    # Records each stage run_etl_pipeline() goes through: wall time, rows and the process peak RSS within it.
+
+    def __init__(self, filename: str, table_name: str):
+        super().__init__(filename, table_name)
+        self.stages = []
+        self._stage_start = None
+
+    def set_stage(self, stage: str):
+        self.close_stage()
+        super().set_stage(stage)
+        reset_peak_rss()
+        self._stage_start = time.perf_counter()
+
+    def close_stage(self):
+        if self._stage_start is None:
+            return
+        self.stages.append({
+            "stage": self.stage,
+            "seconds": time.perf_counter() - self._stage_start,
+            "rows": self.rows_processed,
+            "peak_rss_mb": peak_rss_mb(),
+        })
+        self._stage_start = None
+
+
+def bench_etl(grpc_server, servicer, csv_path: Path, modes, repeat: int) -> dict:
+    results = {}
+    for mode in modes:
+        grpc_server.ETL_MODE = mode
+        runs = []
+        for _ in range(repeat):
+            job = StageTimer(csv_path.name, f"bench_etl_{mode}")
+            start = time.perf_counter()
+            ok = servicer.run_etl_pipeline(csv_path, f"bench_etl_{mode}", job=job)
+            elapsed = time.perf_counter() - start
+            job.close_stage()
+            runs.append({"ok": ok, "seconds": elapsed, "stages": job.stages, "message": job.message})
+            print(f"  etl {mode:<9} {'ok' if ok else 'FAILED':<7} {elapsed:8.2f}s  "
+                  + "  ".join(f"{s['stage']} {s['seconds']:.2f}s/{s['peak_rss_mb']:.0f}MB" for s in job.stages))
+
+        best = min(runs, key=lambda run: run["seconds"])
+        results[mode] = {
+            "runs": runs,
+            "best_seconds": best["seconds"],
+            "rows_per_second": servicer.catalog.get(f"bench_etl_{mode}").row_count / best["seconds"] if best["ok"] else 0.0,
+            "children_peak_rss_mb": children_peak_rss_mb(),
+        }
+    return results
+
+
+# ---------------------------------------------------------------- RPCs
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summarize(latencies, elapsed: float, codes: Counter) -> dict:
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "count": len(ms),
+        "seconds": elapsed,
+        "qps": len(ms) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "mean_ms": sum(ms) / len(ms) if ms else 0.0,
+        "max_ms": max(ms, default=0.0),
+        "status": dict(codes),
+    }
+
+
+def upload_requests(csv_path: Path, filename: str):
+    yield ev_pb2.UploadRequest(info=ev_pb2.FileInfo(filename=filename))
+    with open(csv_path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield ev_pb2.UploadRequest(chunk_data=chunk)
+
+
+def bench_uploads(stub, csv_path: Path, filename: str, count: int) -> dict:
+    # UploadDataset only receives and queues the file; the dataset is queryable once its job succeeds.
+    rpc, published, codes = [], [], Counter()
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        try:
+            status = stub.UploadDataset(upload_requests(csv_path, filename))
+            received = time.perf_counter()
+            state = "FAILED"
+            for job in stub.WatchJob(ev_pb2.JobStatusRequest(job_id=status.job_id)):
+                state = job.state
+            code = "OK" if status.success and state == "SUCCEEDED" else state
+        except grpc.RpcError as e:
+            code = e.code().name
+        codes[code] += 1
+        if code == "OK":
+            rpc.append(received - sent)
+            published.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+    return {"rpc": summarize(rpc, elapsed, codes), "published": summarize(published, elapsed, codes)}
+
+
+def query_scenarios(dataset: str) -> dict:
+    columnar = ev_pb2.SalesFilterRequest.COLUMNAR
+    selective = {"parameter": "EV sales", "region": "Portugal", "powertrain": "BEV"}
+    years = [ev_pb2.Predicate(field="year", op=ev_pb2.Predicate.BETWEEN,
+                              values=[ev_pb2.TypedValue(int_value=2020), ev_pb2.TypedValue(int_value=2023)])]
+    return {
+        "selective_xml": ev_pb2.SalesFilterRequest(dataset=dataset, filters=selective),
+        "selective_columnar": ev_pb2.SalesFilterRequest(dataset=dataset, filters=selective, format=columnar),
+        "range_columnar_1000": ev_pb2.SalesFilterRequest(dataset=dataset, filters={"region": "Portugal"}, predicates=years,
+                                                         format=columnar, limit=1000),
+        "first_page_100": ev_pb2.SalesFilterRequest(dataset=dataset, filters={"parameter": "EV sales"},
+                                                    fields=["region", "year", "value"], limit=100),
+    }
+
+
+def reply_rows(reply) -> int:
+    return reply.columnar.row_count if reply.HasField("columnar") else len(reply.sales_xml)
+
+
+def bench_queries(stub, request, concurrency: int, duration: float, max_queries: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        stub.GetSalesFiltered(request)
+
+    lock = threading.Lock()
+    stop = threading.Event()
+    latencies, codes = [], Counter()
+    sizes = {"rows": 0, "bytes": 0}
+
+    def worker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                reply = stub.GetSalesFiltered(request)
+                code = "OK"
+            except grpc.RpcError as e:
+                reply, code = None, e.code().name
+            latency = time.perf_counter() - start
+            with lock:
+                latencies.append(latency)
+                codes[code] += 1
+                if reply is not None:
+                    sizes["rows"] = reply_rows(reply)
+                    sizes["bytes"] = reply.ByteSize()
+                if max_queries and len(latencies) >= max_queries:
+                    stop.set()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {**summarize(latencies, elapsed, codes), "concurrency": concurrency, "reply_rows": sizes["rows"], "reply_bytes": sizes["bytes"]}
+
+
+# ---------------------------------------------------------------- driver
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def bench_size(args, grpc_server, servicer, stub, rows: int) -> dict:
+    start = time.perf_counter()
+    csv_path = args.csv or ensure_dataset(args.data_dir, rows, args.seed)
+    prepared = time.perf_counter() - start
+    print(f"\n{csv_path.name}: {csv_path.stat().st_size / 1e6:.1f} MB (ready in {prepared:.1f}s)")
+
+    result = {"rows": rows, "csv": str(csv_path), "csv_bytes": csv_path.stat().st_size, "prepare_seconds": prepared}
+    result["etl"] = bench_etl(grpc_server, servicer, csv_path, args.etl_modes, args.etl_repeat)
+
+    # Uploads run with the first ETL mode; the last one publishes the dataset the queries read.
+    grpc_server.ETL_MODE = args.etl_modes[0]
+    filename = f"bench_{rows}.csv"
+    result["upload"] = bench_uploads(stub, csv_path, filename, args.uploads)
+    upload = result["upload"]["published"]
+    print(f"  upload    {upload['count']} published, p50 {upload['p50_ms']:.0f} ms, p99 {upload['p99_ms']:.0f} ms "
+          f"(rpc p50 {result['upload']['rpc']['p50_ms']:.0f} ms)")
+
+    dataset = grpc_server.dataset_name(filename)
+    result["queries"] = {}
+    for name, request in query_scenarios(dataset).items():
+        stats = bench_queries(stub, request, args.concurrency, args.duration, args.queries, args.warmup)
+        result["queries"][name] = stats
+        print(f"  {name:<22} {stats['qps']:8.1f} qps  p50 {stats['p50_ms']:7.2f} ms  p99 {stats['p99_ms']:7.2f} ms  "
+              f"{stats['reply_rows']} rows/{stats['reply_bytes']} B  {stats['status']}")
+    return result
+
+
+def run(args) -> int:
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="datasets_", dir=args.data_dir) as datasets_dir:
+        grpc_server = load_server(args, Path(datasets_dir))
+        servicer = grpc_server.GenericXMLServicer()
+        server = InProcessServer(servicer, args.server, args.concurrency + 4)
+        target = server.start()
+        print(f"In-process {args.server} server on {target}: backend {args.backend}, db {args.db}, "
+              f"result cache {'on' if args.result_cache else 'off'}")
+
+        results = {
+            "meta": {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "settings": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+            },
+            "sizes": [],
+        }
+        try:
+            with grpc.insecure_channel(target, options=[("grpc.max_receive_message_length", -1)]) as channel:
+                stub = ev_pb2_grpc.EVSalesStub(channel)
+                for rows in ([0] if args.csv else args.rows):
+                    results["sizes"].append(bench_size(args, grpc_server, servicer, stub, rows))
+        finally:
+            server.stop()
+            servicer.jobs.shutdown(wait=False)
+
+    args.out.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {args.out}")
+    failed = any(
+        not run["ok"] for size in results["sizes"] for mode in size["etl"].values() for run in mode["runs"]
+    ) or any(
+        set(stats["status"]) - {"OK"} for size in results["sizes"] for stats in size["queries"].values()
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the ETL stages and the query/upload RPCs on synthetic EV datasets.")
+    parser.add_argument("--rows", type=parse_rows, nargs="+", default=[10_000], help="Dataset sizes, e.g. 10k 1m 10m.")
+    parser.add_argument("--csv", type=Path, help="Benchmark this CSV instead of generated datasets.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="Where generated CSVs are kept between runs.")
+    parser.add_argument("--etl-modes", type=lambda text: text.split(","), default=ETL_MODES, help="Comma-separated: fast,parallel,xml.")
+    parser.add_argument("--etl-repeat", type=int, default=1)
+    parser.add_argument("--db", choices=["stub", "postgres"], default="stub",
+                        help="stub: loaders run against a no-op connection; postgres: the DB_* settings.")
+    parser.add_argument("--backend", choices=["memory-index", "xml", "postgres"], default="memory-index")
+    parser.add_argument("--server", choices=["aio", "sync"], default="aio")
+    parser.add_argument("--result-cache", action="store_true", help="Keep the result cache on (off: every query reaches the backend).")
+    parser.add_argument("--uploads", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8, help="Query client threads.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per query scenario.")
+    parser.add_argument("--queries", type=int, default=0, help="Stop a scenario after this many queries, or at --duration (0: duration only).")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--out", type=Path, default=Path("bench_results.json"))
+    args = parser.parse_args()
+
+    unknown = set(args.etl_modes) - set(ETL_MODES)
+    if unknown:
+        parser.error(f"Unknown ETL mode(s): {', '.join(sorted(unknown))}")
+
+    sys.exit(run(args))
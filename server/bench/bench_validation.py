@@ -0,0 +1,40 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+import logging
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.append(str(SRC_DIR))
+
+import schema_generator
+
+logging.getLogger().setLevel(logging.WARNING)
+
+ENGINES = ["xmlschema", "lxml", "lxml-stream"]
+
+
+def run(xml_path: Path, xsd_path: Path, engines: list[str], repeat: int):
+    print(f"XML: {xml_path} ({xml_path.stat().st_size / 1e6:.1f} MB)")
+    print(f"{'engine':<12} {'valid':<6} {'best (s)':>10} {'MB/s':>10}")
+
+    for engine in engines:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            is_valid = schema_generator.validate_xml_with_xsd(engine, xml_path, xsd_path)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"{engine:<12} {str(is_valid):<6} {best:>10.3f} {xml_path.stat().st_size / 1e6 / best:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare XSD validation engines on a generated dataset.")
+    parser.add_argument("--xml", type=Path, default=schema_generator.XML_PATH)
+    parser.add_argument("--xsd", type=Path, default=schema_generator.XSD_PATH)
+    parser.add_argument("--engine", action="append", choices=ENGINES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.xml, args.xsd, args.engine or ENGINES, args.repeat)
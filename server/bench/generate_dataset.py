@@ -0,0 +1,134 @@
+import argparse
+import csv
+import re
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+
+# Same columns, vocabularies and value formats as data/test.csv (IEA EV outlook), so the type
+# inference, XSD patterns and loaders see the kind of data they see in production.
+HEADER = ["region", "category", "parameter", "mode", "powertrain", "year", "unit", "value", "percentage"]
+
+REGIONS = [
+    "Austria", "Belgium", "Brazil", "Canada", "China", "Denmark", "EU27", "Europe", "France", "Germany", "Iceland",
+    "India", "Israel", "Italy", "Japan", "Korea", "Netherlands", "New Zealand", "Norway", "Poland", "Portugal",
+    "Rest of the world", "Spain", "Sweden", "United Kingdom", "USA", "World", "Australia", "Chile", "Finland",
+    "Mexico", "Switzerland", "Turkiye", "Greece", "South Africa", "Bulgaria", "Colombia", "Costa Rica",
+    "Czech Republic", "Estonia", "Hungary", "Ireland", "Latvia", "Lithuania", "Romania", "Seychelles", "Slovakia",
+    "Slovenia", "Thailand", "United Arab Emirates", "Croatia", "Cyprus", "Luxembourg", "Indonesia",
+]
+PROJECTION_YEARS = [2020, 2021, 2022, 2023, 2025, 2030, 2035]
+CATEGORY_YEARS = {
+    "Historical": list(range(2010, 2024)),
+    "Projection-STEPS": PROJECTION_YEARS,
+    "Projection-APS": PROJECTION_YEARS,
+}
+PARAMETER_UNITS = {
+    "EV stock": "Vehicles",
+    "EV stock share": "percent",
+    "EV sales": "Vehicles",
+    "EV sales share": "percent",
+    "Electricity demand": "GWh",
+    "Oil displacement Mbd": "Milion barrels per day",
+    "Oil displacement, million lge": "Oil displacement, million lge",
+    "EV charging points": "charging points",
+}
+MODES = ["Cars", "Buses", "Vans", "Trucks", "EV"]
+POWERTRAINS = ["BEV", "EV", "PHEV", "FCEV", "Publicly available slow", "Publicly available fast"]
+# Units whose values are plain counts ("2900"); the others are dotted digit groups ("789.999.961.853")
+# or, now and then, a comma exponent ("1,50E+09").
+COUNT_UNITS = {"Vehicles", "charging points", "GWh"}
+EXPONENT_SHARE = 0.02
+
+CHUNK_ROWS = 200_000
+
+
+def parse_rows(text: str) -> int:
+    # "10000", "10k", "1m", "10M".
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([kKmM]?)", text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Not a row count: {text!r}")
+    scale = {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()]
+    return int(float(match.group(1)) * scale)
+
+
+def _grouped(number: int) -> str:
+    return f"{number:,}".replace(",", ".")
+
+
+def generate_rows(rows: int, seed: int = 0, chunk_rows: int = CHUNK_ROWS) -> Iterator[List[list]]:
+    # Yields the rows in chunks; the same seed always gives the same file.
+    rng = np.random.default_rng(seed)
+    categories = list(CATEGORY_YEARS)
+    parameters = list(PARAMETER_UNITS)
+
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        region = rng.integers(len(REGIONS), size=n)
+        category = rng.integers(len(categories), size=n)
+        year_pick = rng.random(n)
+        parameter = rng.integers(len(parameters), size=n)
+        mode = rng.integers(len(MODES), size=n)
+        powertrain = rng.integers(len(POWERTRAINS), size=n)
+        counts = np.round(rng.lognormal(6.0, 2.5, size=n)).astype(np.int64)
+        digits = rng.integers(10 ** 8, 10 ** 17, size=n)
+        exponent = rng.random(n) < EXPONENT_SHARE
+        mantissa = rng.integers(100, 1000, size=n)
+
+        chunk = []
+        for i in range(n):
+            category_name = categories[category[i]]
+            years = CATEGORY_YEARS[category_name]
+            parameter_name = parameters[parameter[i]]
+            unit = PARAMETER_UNITS[parameter_name]
+
+            if unit in COUNT_UNITS:
+                value = str(counts[i])
+                percentage = f"{counts[i]}00,00%"
+            elif exponent[i]:
+                value = f"{mantissa[i] // 100},{mantissa[i] % 100:02d}E+09"
+                percentage = f"{mantissa[i]}000000000,00%"
+            else:
+                value = _grouped(int(digits[i]))
+                percentage = f"{digits[i]}00,00%"
+
+            chunk.append([
+                REGIONS[region[i]], category_name, parameter_name, MODES[mode[i]], POWERTRAINS[powertrain[i]],
+                years[int(year_pick[i] * len(years))], unit, value, percentage,
+            ])
+        yield chunk
+
+
+def write_dataset(path: Path, rows: int, seed: int = 0) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for chunk in generate_rows(rows, seed):
+            writer.writerows(chunk)
+    tmp_path.replace(path)
+    return path
+
+
+def ensure_dataset(directory: Path, rows: int, seed: int = 0) -> Path:
+    # Generated files are reused across runs: generating 10M rows takes longer than some benchmarks.
+    path = directory / f"ev_synthetic_{rows}_{seed}.csv"
+    if not path.exists():
+        write_dataset(path, rows, seed)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate an EV-style CSV shaped like data/test.csv.")
+    parser.add_argument("--rows", type=parse_rows, default="10k", help="Row count: 10000, 10k, 1m, 10m...")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="Output CSV (default: ev_synthetic_<rows>_<seed>.csv in the current directory).")
+    args = parser.parse_args()
+
+    out = args.out or Path(f"ev_synthetic_{args.rows}_{args.seed}.csv")
+    start = time.perf_counter()
+    write_dataset(out, args.rows, args.seed)
+    print(f"{args.rows} rows written to {out} ({out.stat().st_size / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,116 @@
+from typing import Dict, List, Sequence, Tuple
+import logging
+
+import numpy as np
+
+from type_inference import parse_numeric_series
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+AGGREGATE_FUNCTIONS = ("count", "sum", "avg", "min", "max")
+# (function, field); an empty field with "count" counts rows.
+Aggregation = Tuple[str, str]
+
+
+def aggregation_name(aggregation: Aggregation) -> str:
+    function, field = aggregation
+    return f"{function}({field or '*'})"
+
+
+def check_aggregations(aggregations: Sequence[Aggregation], numeric_fields, all_fields):
+    for function, field in aggregations:
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Unsupported aggregate function '{function}'.")
+        if not field:
+            if function != "count":
+                raise ValueError(f"Aggregate '{function}' needs a field.")
+            continue
+        if field not in all_fields:
+            raise ValueError(f"Field '{field}' does not exist.")
+        if function != "count" and field not in numeric_fields:
+            raise ValueError(f"Field '{field}' is not numeric; only count() applies to it.")
+
+
+def group_ids(keys: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    # keys: one array of dictionary codes per group-by column (sorted dictionaries, so code order is value order).
+    # Returns (group id per row, codes of each group as a (groups, columns) array), groups in key order.
+    row_count = len(keys[0])
+    cardinalities = [int(codes.max()) + 1 if row_count else 1 for codes in keys]
+    if np.prod(np.array(cardinalities, dtype=np.float64)) < 2 ** 62:
+        # Mixed radix: one int64 per row, first column most significant.
+        combined = np.zeros(row_count, dtype=np.int64)
+        for codes, cardinality in zip(keys, cardinalities):
+            combined = combined * cardinality + codes
+        unique, inverse = np.unique(combined, return_inverse=True)
+        group_codes = np.empty((len(unique), len(keys)), dtype=np.int64)
+        for i in range(len(keys) - 1, -1, -1):
+            unique, group_codes[:, i] = np.divmod(unique, cardinalities[i])
+        return inverse, group_codes
+    group_codes, inverse = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)
+    return inverse.reshape(-1), group_codes
+
+
+def group_aggregate(keys: Sequence[np.ndarray], row_count: int, aggregations: Sequence[Aggregation],
+                    values: Dict[str, np.ndarray]) -> Tuple[np.ndarray, List[np.ndarray]]:
+    # values: per-row float arrays for every aggregated field, NaN where the cell is empty or not a number.
+    # Without group-by columns every row falls into one group, which exists even when no row matched (like SQL).
+    if keys:
+        groups, group_codes = group_ids(keys)
+        group_count = len(group_codes)
+    else:
+        groups = np.zeros(row_count, dtype=np.int64)
+        group_codes = np.empty((1, 0), dtype=np.int64)
+        group_count = 1
+
+    results = []
+    for function, field in aggregations:
+        if not field:
+            results.append(np.bincount(groups, minlength=group_count).astype(np.float64))
+            continue
+
+        numbers = values[field]
+        valid = ~np.isnan(numbers)
+        counts = np.bincount(groups, weights=valid, minlength=group_count)
+        if function == "count":
+            results.append(counts)
+            continue
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if function in ("sum", "avg"):
+                sums = np.bincount(groups, weights=np.where(valid, numbers, 0.0), minlength=group_count)
+                result = sums if function == "sum" else sums / counts
+            else:
+                # Sort by (group, value): NaN sorts last, so each group's valid values come first.
+                order = np.lexsort((numbers, groups))
+                starts = np.searchsorted(groups[order], np.arange(group_count))
+                positions = starts if function == "min" else starts + counts.astype(np.int64) - 1
+                result = np.full(group_count, np.nan)
+                has_values = counts > 0
+                result[has_values] = numbers[order[positions[has_values]]]
+        # No value in the group: NULL in SQL, NaN here.
+        results.append(np.where(counts > 0, result, np.nan))
+
+    return group_codes, results
+
+
+def factorize(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    # (sorted distinct values, code per row), the same encoding ColumnarIndex keeps per column.
+    labels, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return labels, codes.reshape(-1)
+
+
+def column_values(texts, numeric: bool) -> np.ndarray:
+    # Per-value floats to aggregate: numbers for numeric columns; for text columns only presence matters (count).
+    if numeric:
+        return parse_numeric_series(texts)
+    return np.where(np.asarray(texts, dtype=object).astype(str) == "", np.nan, 0.0)
+
+
+def aggregate_rows(group_codes: np.ndarray, labels: Sequence[np.ndarray], results: List[np.ndarray]) -> List[Tuple[List[str], List[float]]]:
+    keys = [column_labels[group_codes[:, i]].tolist() for i, column_labels in enumerate(labels)]
+    values = [result.tolist() for result in results]
+    return [
+        ([column[g] for column in keys], [column[g] for column in values])
+        for g in range(len(group_codes))
+    ]
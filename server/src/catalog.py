@@ -0,0 +1,361 @@
+import copy
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import logging
+
+from query_index import ColumnarIndex
+from snapshot_store import SNAPSHOT_ENABLED, Snapshot, load_latest_snapshot
+from type_inference import ColumnType
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+DATASETS_DIR = Path(os.getenv("DATASETS_DIR", "/app/data/datasets"))
+# Loaded query indexes beyond this are dropped least-recently-used first and reloaded from their snapshot on demand.
+INDEX_MEMORY_BUDGET_MB = float(os.getenv("INDEX_MEMORY_BUDGET_MB", 1024))
+
+# output.<version>.xml/.xsd, plus the temp files they are written to.
+ARTIFACT_PATTERN = re.compile(r"\.?output\.(\d+)\.(xml|xsd)(\.tmp)?")
+
+
+class DatasetNotFound(Exception):
+    pass
+
+
+def dataset_name(filename: str) -> str:
+    # Same rule the upload path always used for table names; the dataset is named after its table.
+    return filename.replace('.', '_').replace('-', '_').lower()
+
+
+def source_filename(sha256: str) -> str:
+    # Uploads are stored by content hash, so a queued re-upload never overwrites a file being loaded.
+    return f"source-{sha256[:16]}.csv"
+
+
+class LoadQueue:
+    # ETL runs of one dataset, one at a time and in the order they were queued; a plain Lock may let a later
+    # upload in first. Also knows which source CSVs queued runs still need.
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._enqueue_lock = threading.Lock()
+        self._next_ticket = 0
+        self._serving = 0
+        self._done: Set[int] = set()
+        self._sources: Dict[int, Path] = {}
+
+    @contextmanager
+    def enqueue(self, source_path: Path):
+        # Yields the run's ticket for turn(). Submit the run inside the block: runs then reach the ETL pool in ticket
+        # order, so none waits for one queued behind it. A ticket whose block fails is given up.
+        with self._enqueue_lock:
+            with self._changed:
+                ticket = self._next_ticket
+                self._next_ticket += 1
+                self._sources[ticket] = source_path
+            try:
+                yield ticket
+            except BaseException:
+                self._finish(ticket)
+                raise
+
+    @contextmanager
+    def turn(self, source_path: Path, ticket: Optional[int] = None):
+        # Waits for the runs queued before this one. Without a ticket the run is queued now.
+        if ticket is None:
+            with self.enqueue(source_path) as ticket:
+                pass
+        with self._changed:
+            self._changed.wait_for(lambda: self._serving == ticket)
+        try:
+            yield
+        finally:
+            self._finish(ticket)
+
+    def _finish(self, ticket: int):
+        with self._changed:
+            self._sources.pop(ticket, None)
+            self._done.add(ticket)
+            while self._serving in self._done:
+                self._done.discard(self._serving)
+                self._serving += 1
+            self._changed.notify_all()
+
+    def pending_sources(self) -> Set[Path]:
+        with self._changed:
+            return set(self._sources.values())
+
+
+class Dataset:
+    # Where one dataset lives on disk (source CSVs, XML/XSD per version, snapshots) and the locks its writers share.
+    # What queries see is the dataset's current PublishedDataset, never this object.
+
+    def __init__(self, name: str, directory: Path):
+        self.name = name
+        self.table_name = name
+        self.directory = directory
+        self.snapshot_dir = directory / "snapshots"
+
+        # One ETL run per dataset at a time, in upload order; different datasets load in parallel.
+        self.loads = LoadQueue()
+        self.index_lock = threading.Lock()
+        self.xml_lock = threading.Lock()
+
+    def xml_path(self, version: int) -> Path:
+        return self.directory / f"output.{version}.xml"
+
+    def xsd_path(self, version: int) -> Path:
+        return self.directory / f"output.{version}.xsd"
+
+    def remove_artifacts(self, keep: Set[int] = frozenset()):
+        for path in self.directory.iterdir():
+            match = ARTIFACT_PATTERN.fullmatch(path.name)
+            if match and int(match.group(1)) not in keep:
+                path.unlink(missing_ok=True)
+
+
+class PublishedDataset:
+    # One published version of a dataset. Read-only once published: loads, evictions and reloads publish
+    # a new instance and the catalog swaps the reference, so a query that picked one up sees the same
+    # index, table and XML file until it finishes, without taking a lock.
+
+    def __init__(self, dataset: Dataset, version: int, table_name: str, column_names: List[str], row_count: int,
+                 source_path: Optional[Path], source_bytes: int, updated_at: float,
+                 snapshot: Optional[Snapshot] = None, index: Optional[ColumnarIndex] = None,
+                 column_types: Optional[Dict[str, ColumnType]] = None):
+        self.dataset = dataset
+        self.name = dataset.name
+        self.version = version
+        self.table_name = table_name
+        self.column_names = list(column_names)
+        self.column_types = column_types or {}
+        self.row_count = row_count
+        self.source_path = source_path
+        self.source_bytes = source_bytes
+        self.updated_at = updated_at
+        self.snapshot = snapshot
+        self.index = index
+        # Each version has its own XML/XSD file, written completely before anyone can see it.
+        self.xml_path = dataset.xml_path(version)
+        self.xsd_path = dataset.xsd_path(version)
+
+    def with_index(self, index: Optional[ColumnarIndex]) -> "PublishedDataset":
+        published = copy.copy(self)
+        published.index = index
+        return published
+
+    @property
+    def index_bytes(self) -> int:
+        return self.index.nbytes if self.index is not None else 0
+
+    @property
+    def snapshot_bytes(self) -> int:
+        try:
+            return self.snapshot.nbytes if self.snapshot is not None else 0
+        except FileNotFoundError:
+            return 0
+
+
+class DatasetCatalog:
+    def __init__(self, root: Path = DATASETS_DIR, memory_budget_mb: float = INDEX_MEMORY_BUDGET_MB):
+        self.root = root
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._datasets: Dict[str, Dataset] = {}
+        # (published datasets by name, default name). Replaced as a whole under _lock, never mutated,
+        # so readers take one consistent reference without locking.
+        self._state: Tuple[Dict[str, PublishedDataset], Optional[str]] = ({}, None)
+        self._last_used: Dict[str, float] = {}
+        self._last_version = 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def default_name(self) -> Optional[str]:
+        return self._state[1]
+
+    def ensure(self, name: str) -> Dataset:
+        with self._lock:
+            dataset = self._datasets.get(name)
+            if dataset is None:
+                dataset = Dataset(name, self.root / name)
+                dataset.directory.mkdir(parents=True, exist_ok=True)
+                self._datasets[name] = dataset
+            return dataset
+
+    def new_version(self) -> int:
+        # Microsecond timestamps: unique within the process and still increasing across restarts.
+        with self._lock:
+            self._last_version = max(time.time_ns() // 1000, self._last_version + 1)
+            return self._last_version
+
+    def get(self, name: str = "") -> PublishedDataset:
+        # An empty name means the most recently published dataset, as before datasets had names.
+        published, default_name = self._state
+        name = name or default_name or ""
+        dataset = published.get(name)
+        if dataset is None:
+            raise DatasetNotFound(f"Dataset '{name}' not found." if name else "No dataset loaded.")
+        return dataset
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._state[0]
+
+    def list(self) -> List[PublishedDataset]:
+        return list(self._state[0].values())
+
+    def _swap(self, published: PublishedDataset, default: bool = False):
+        # Caller holds _lock.
+        datasets, default_name = self._state
+        self._state = ({**datasets, published.name: published}, published.name if default else default_name)
+
+    def _replace_if_current(self, published: PublishedDataset):
+        # Swaps in another instance of the same version; a newer publication in between wins.
+        with self._lock:
+            current = self._state[0].get(published.name)
+            if current is not None and current.version == published.version:
+                self._swap(published)
+
+    def publish(self, dataset: Dataset, version: int, index: ColumnarIndex, source_path: Path,
+                snapshot: Optional[Snapshot] = None) -> PublishedDataset:
+        published = PublishedDataset(
+            dataset,
+            version,
+            dataset.table_name,
+            index.column_names,
+            index.row_count,
+            source_path,
+            source_path.stat().st_size if source_path.exists() else 0,
+            time.time(),
+            snapshot,
+            index,
+            index.column_types,
+        )
+        with self._lock:
+            previous = self._state[0].get(dataset.name)
+            self._last_used[dataset.name] = time.monotonic()
+            self._swap(published, default=True)
+
+        # The previous version's XML stays: a query may have picked it up just before the swap.
+        dataset.remove_artifacts(keep={version, previous.version} if previous else {version})
+        self._remove_old_sources(published)
+        self._enforce_budget(keep=dataset.name)
+        return published
+
+    def _remove_old_sources(self, published: PublishedDataset):
+        # Keeps the source just published and those of queued runs; the rest belong to versions already
+        # published (or runs that failed). Modification times would not do: a re-upload of the same content
+        # rewrites an existing source file.
+        current = published.source_path
+        directory = published.dataset.directory
+        if current is None or current.parent != directory:
+            return
+        keep = {current} | published.dataset.loads.pending_sources()
+        for path in directory.glob("source-*.csv"):
+            if path not in keep:
+                path.unlink(missing_ok=True)
+
+    def index_for(self, published: PublishedDataset) -> Optional[ColumnarIndex]:
+        self._last_used[published.name] = time.monotonic()
+        if published.index is not None:
+            return published.index
+
+        current = self._state[0].get(published.name)
+        if current is not None and current.version == published.version and current.index is not None:
+            return current.index
+        if published.snapshot is None:
+            return None
+
+        # Only a cold index takes a lock, so concurrent first queries map the snapshot once.
+        with published.dataset.index_lock:
+            current = self._state[0].get(published.name)
+            if current is not None and current.version == published.version and current.index is not None:
+                return current.index
+            index = published.snapshot.load_index()
+            self._replace_if_current(published.with_index(index))
+            logging.info(f"[Info] Dataset '{published.name}' reloaded from its snapshot ({published.row_count} rows).")
+        self._enforce_budget(keep=published.name)
+        return index
+
+    def _enforce_budget(self, keep: str):
+        with self._lock:
+            # Only datasets with a snapshot can be evicted: they can come back without an ETL run.
+            loaded = sorted(
+                (published for published in self._state[0].values() if published.index is not None),
+                key=lambda published: self._last_used.get(published.name, 0.0),
+            )
+            total = sum(published.index_bytes for published in loaded)
+            for published in loaded:
+                if total <= self.memory_budget:
+                    break
+                if published.name == keep or published.snapshot is None:
+                    continue
+                total -= published.index_bytes
+                # Queries still holding the old instance keep its index alive until they finish.
+                self._swap(published.with_index(None))
+                logging.info(f"[Info] Query index of '{published.name}' evicted (memory budget {self.memory_budget // (1024 * 1024)} MB).")
+
+    def restore(self, table_has_rows: Optional[Callable[[str], Optional[bool]]] = None) -> List[Snapshot]:
+        # Startup: register every dataset whose latest snapshot still matches its source CSV and, when
+        # table_has_rows (table name -> whether it has any row, None if missing) is given, its database table.
+        # Indexes are memory-mapped lazily, on the first query that needs them.
+        # Returns the snapshots whose source is unchanged but whose table was lost (an UNLOGGED table
+        # is emptied by a database crash): those datasets are not published and need an ETL run.
+        if not SNAPSHOT_ENABLED or not self.root.exists():
+            return []
+
+        restored = []
+        lost_tables = []
+        for directory in sorted(path for path in self.root.iterdir() if path.is_dir()):
+            snapshot = load_latest_snapshot(directory / "snapshots")
+            if snapshot is None:
+                continue
+            if not snapshot.source_unchanged():
+                logging.info(f"[Info] Source {snapshot.source_path} changed since snapshot {snapshot.path.name[:12]}; '{directory.name}' needs a reload.")
+                continue
+            if table_has_rows is not None and not self._table_matches(snapshot, table_has_rows):
+                lost_tables.append(snapshot)
+                continue
+
+            dataset = self.ensure(directory.name)
+            # Snapshots from before versioned XML files carry no version; their XML is rebuilt on demand.
+            version = snapshot.meta.get("version") or int(snapshot.meta["created_at"] * 1_000_000)
+            dataset.remove_artifacts(keep={version})
+            restored.append(PublishedDataset(
+                dataset,
+                version,
+                snapshot.table_name,
+                snapshot.meta["column_names"],
+                snapshot.row_count,
+                snapshot.source_path,
+                snapshot.meta["source_size"],
+                snapshot.meta["created_at"],
+                snapshot,
+                column_types=snapshot.column_types,
+            ))
+
+        if restored:
+            latest = max(restored, key=lambda published: published.updated_at)
+            with self._lock:
+                self._last_version = max(self._last_version, *(published.version for published in restored))
+                for published in restored:
+                    self._swap(published, default=published is latest)
+            logging.info(f"[Info] Restored {len(restored)} dataset(s) from snapshots: {[p.name for p in restored]}; default '{latest.name}'.")
+        return lost_tables
+
+    def _table_matches(self, snapshot: Snapshot, table_has_rows: Callable[[str], Optional[bool]]) -> bool:
+        # Whether the table has rows is enough: swaps replace a table whole, and a crash empties an UNLOGGED one.
+        try:
+            has_rows = table_has_rows(snapshot.table_name)
+        except Exception as e:
+            logging.warning(f"[Warning] Could not check table '{snapshot.table_name}': {e}")
+            return False
+        if has_rows is None or has_rows != (snapshot.row_count > 0):
+            found = "is missing" if has_rows is None else ("has rows" if has_rows else "is empty")
+            logging.warning(f"[Warning] Table '{snapshot.table_name}' {found}, its snapshot {snapshot.row_count} rows; '{snapshot.table_name}' needs a reload.")
+            return False
+        return True
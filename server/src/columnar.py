@@ -0,0 +1,86 @@
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+import logging
+
+from type_inference import BOOLEAN, INTEGER, ColumnType, parse_number
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+# Distinct cell texts remembered per column with their parsed value; numeric columns repeat values a lot.
+COLUMNAR_PARSE_MEMO = int(os.getenv("COLUMNAR_PARSE_MEMO", 65536))
+
+# Column.Type names in ev.proto.
+STRING = "STRING"
+INT64 = "INT64"
+DOUBLE = "DOUBLE"
+BOOL = "BOOL"
+
+
+def column_format(column_type: Optional[ColumnType]) -> str:
+    # Locale numbers ("1,00E+09", "35,5%") go out parsed, as the database stores them.
+    if column_type is None:
+        return STRING
+    if column_type.kind == INTEGER and column_type.sql_type != "NUMERIC":
+        return INT64
+    if column_type.is_numeric:
+        return DOUBLE
+    if column_type.kind == BOOLEAN:
+        return BOOL
+    return STRING
+
+
+def _parse_int(text: str) -> Optional[int]:
+    try:
+        return int(text)
+    except ValueError:
+        return None
+
+
+def _parse_bool(text: str) -> Optional[bool]:
+    lowered = text.strip().lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    return None
+
+
+PARSERS: Dict[str, Callable[[str], object]] = {INT64: _parse_int, DOUBLE: parse_number, BOOL: _parse_bool}
+VALUE_FIELDS = {INT64: "int_values", DOUBLE: "double_values", BOOL: "bool_values"}
+EMPTY_VALUES = {INT64: 0, DOUBLE: 0.0, BOOL: False}
+
+
+class ColumnarEncoder:
+    # Turns pages of rows (one tuple of cell texts per row) into ev_pb2.Column keyword arguments.
+    # One encoder per query: the pages of a stream share its parse memo.
+
+    def __init__(self, column_names: Sequence[str], column_types: Dict[str, ColumnType]):
+        self.column_names = list(column_names)
+        self.formats = [column_format(column_types.get(name)) for name in self.column_names]
+        self._parsed: List[Dict[str, object]] = [{} for _ in self.column_names]
+
+    def encode(self, rows: Sequence[tuple]) -> List[dict]:
+        columns = zip(*rows) if rows else [() for _ in self.column_names]
+        return [
+            self._encode_column(name, column_format, texts, parsed)
+            for name, column_format, texts, parsed in zip(self.column_names, self.formats, columns, self._parsed)
+        ]
+
+    def _encode_column(self, name: str, column_format: str, texts: Sequence[str], parsed: Dict[str, object]) -> dict:
+        if column_format == STRING:
+            # Per-page dictionary: each distinct text is sent once, rows carry its position.
+            positions: Dict[str, int] = {}
+            codes = [positions.setdefault(text, len(positions)) for text in texts]
+            return {"name": name, "type": column_format, "dictionary": list(positions), "codes": codes}
+
+        if len(parsed) > COLUMNAR_PARSE_MEMO:
+            parsed.clear()
+        parse = PARSERS[column_format]
+        for text in set(texts).difference(parsed):
+            parsed[text] = parse(text)
+
+        values = [parsed[text] for text in texts]
+        null_rows = [row for row, value in enumerate(values) if value is None] if None in parsed.values() else []
+        if null_rows:
+            empty = EMPTY_VALUES[column_format]
+            values = [empty if value is None else value for value in values]
+        return {"name": name, "type": column_format, VALUE_FIELDS[column_format]: values, "null_rows": null_rows}
@@ -1,41 +1,111 @@
+import os
 import pandas as pd
+from lxml import etree
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterable, List, Optional
 import logging
 
+from type_inference import TypeInferencer
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-DATA_DIR = Path("/app/data") 
-XML_PATH = DATA_DIR / "output.xml" 
+DATA_DIR = Path("/app/data")
+XML_PATH = DATA_DIR / "output.xml"
+CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", 50_000))
+
+
+def read_csv_columns(input_csv_path: Path) -> List[str]:
+    return list(pd.read_csv(input_csv_path, nrows=0).columns)
+
+
+def iter_csv_chunks(input_csv_path: Path, chunk_size: int = CSV_CHUNK_SIZE, inferencer: Optional[TypeInferencer] = None):
+    # Every cell is kept as the literal CSV text; types are inferred from that text on the side.
+    with pd.read_csv(
+        input_csv_path,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunk_size,
+    ) as reader:
+        for chunk in reader:
+            if inferencer is not None:
+                inferencer.update(chunk)
+            yield chunk
+
+
+def write_xml_rows(output_path: Path, column_names: List[str], rows: Iterable[Iterable[str]], progress=None) -> int:
+    row_count = 0
+
+    with etree.xmlfile(str(output_path), encoding="utf-8") as xf:
+        xf.write_declaration()
+        with xf.element("dataset"):
+            for values in rows:
+                row = etree.Element("row")
+                for name, value in zip(column_names, values):
+                    etree.SubElement(row, name).text = value
+                xf.write("\n  ")
+                xf.write(row)
+                row_count += 1
+                if progress and row_count % 10_000 == 0:
+                    progress(row_count)
+            xf.write("\n")
+
+    if progress:
+        progress(row_count)
+    return row_count
 
 
-def convert_csv_to_xml(input_csv_path: Path) -> List[str]:
+def convert_csv_to_xml(
+    input_csv_path: Path,
+    chunk_size: int = CSV_CHUNK_SIZE,
+    output_path: Path = XML_PATH,
+    progress: Optional[Callable[[int], None]] = None,
+    inferencer: Optional[TypeInferencer] = None,
+) -> List[str]:
     if not input_csv_path.exists():
         raise FileNotFoundError(f"CSV file not found at: {input_csv_path}")
 
-    df = pd.read_csv(input_csv_path) 
-    
-    column_names = list(df.columns)
-
-    xml_raw = df.to_xml(
-        root_name="dataset",
-        row_name="row",
-        index=False
+    column_names = read_csv_columns(input_csv_path)
+    rows = (
+        values
+        for chunk in iter_csv_chunks(input_csv_path, chunk_size, inferencer)
+        for values in chunk.itertuples(index=False, name=None)
     )
 
     try:
-        with open(XML_PATH, "w", encoding="utf-8") as f:
-            f.write(xml_raw)
-        logging.info(f"XML created: {XML_PATH}")
+        row_count = write_xml_rows(output_path, column_names, rows, progress)
+        logging.info(f"XML created: {output_path} ({row_count} rows)")
     except Exception as e:
         logging.error(f"Error writing XML file: {e}")
         raise
 
     return column_names
 
+
+def read_csv_as_columns(
+    input_csv_path: Path,
+    chunk_size: int = CSV_CHUNK_SIZE,
+    progress: Optional[Callable[[int], None]] = None,
+    inferencer: Optional[TypeInferencer] = None,
+) -> Dict[str, List[str]]:
+    if not input_csv_path.exists():
+        raise FileNotFoundError(f"CSV file not found at: {input_csv_path}")
+
+    columns: Dict[str, List[str]] = {name: [] for name in read_csv_columns(input_csv_path)}
+    row_count = 0
+
+    for chunk in iter_csv_chunks(input_csv_path, chunk_size, inferencer):
+        for name, values in columns.items():
+            values.extend(chunk[name].tolist())
+        row_count += len(chunk)
+        if progress:
+            progress(row_count)
+
+    logging.info(f"CSV parsed: {input_csv_path} ({row_count} rows, {len(columns)} columns)")
+    return columns
+
 if __name__ == "__main__":
-    DEFAULT_CSV_PATH = DATA_DIR / "test.csv" 
+    DEFAULT_CSV_PATH = DATA_DIR / "test.csv"
     try:
         convert_csv_to_xml(DEFAULT_CSV_PATH)
     except FileNotFoundError as e:
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import logging
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+# Connections idle for longer than this are pinged before being handed out.
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", 30))
+DB_READY_TIMEOUT = float(os.getenv("DB_READY_TIMEOUT", 60))
+DB_POOL_WAIT = float(os.getenv("DB_POOL_WAIT", 30))
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+_last_used: dict[int, float] = {}
+
+
+def db_params() -> dict:
+    return {
+        "host": os.getenv("DB_HOST", "db"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "123456789"),
+        "dbname": os.getenv("DB_NAME", "db_TP2B"),
+    }
+
+
+def wait_for_db(params: dict, timeout: float = DB_READY_TIMEOUT, initial_delay: float = 0.1, max_delay: float = 5.0):
+    start = time.time()
+    delay = initial_delay
+    while True:
+        try:
+            conn = psycopg2.connect(**params)
+            conn.close()
+            return
+        except Exception as e:
+            if time.time() - start > timeout:
+                raise TimeoutError("Database did not become available within the timeout.") from e
+            logging.warning(f"Waiting for database... Retrying in {delay:.1f}s. ({e})")
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+def init_pool(minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX):
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            params = db_params()
+            logging.info(f"DB pool: waiting for DB {params['host']}:{params['port']} (db={params['dbname']})")
+            wait_for_db(params)
+            _pool = pool.ThreadedConnectionPool(minconn, maxconn, **params)
+            # ThreadedConnectionPool raises as soon as it is exhausted; callers queue here instead.
+            _slots = threading.BoundedSemaphore(maxconn)
+            logging.info(f"DB pool ready ({minconn}-{maxconn} connections).")
+        return _pool
+
+
+def close_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _slots = None
+            _last_used.clear()
+
+
+def _healthy(conn) -> bool:
+    if conn.closed:
+        return False
+    if conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if time.time() - _last_used.get(id(conn), 0) < DB_POOL_PING_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def borrow():
+    db_pool = _pool or init_pool()
+    if not _slots.acquire(timeout=DB_POOL_WAIT):
+        raise ConnectionError(f"DB pool: no connection available after {DB_POOL_WAIT}s.")
+
+    try:
+        for _ in range(DB_POOL_MAX + 1):
+            conn = db_pool.getconn()
+            if _healthy(conn):
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                return conn
+            logging.warning("DB pool: discarding broken connection.")
+            _last_used.pop(id(conn), None)
+            db_pool.putconn(conn, close=True)
+    except Exception:
+        _slots.release()
+        raise
+    _slots.release()
+    raise ConnectionError("DB pool: could not obtain a healthy connection.")
+
+
+def release(conn, close: bool = False):
+    db_pool = _pool
+    if db_pool is None:
+        conn.close()
+        return
+    if not close and not conn.closed:
+        _last_used[id(conn)] = time.time()
+    else:
+        _last_used.pop(id(conn), None)
+    db_pool.putconn(conn, close=close or bool(conn.closed))
+    _slots.release()
+
+
+@contextmanager
+def connection():
+    # One transaction per borrow: committed when the block succeeds, rolled back otherwise.
+    conn = borrow()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        release(conn)
@@ -0,0 +1,293 @@
+import asyncio
+import os
+import logging
+from concurrent import futures
+from contextlib import aclosing, asynccontextmanager
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
+
+import grpc
+
+# grpc_server puts the generated stubs on sys.path, so it is imported first.
+from grpc_server import ETL_MODE, STREAM_PAGE_SIZE, GenericXMLServicer, QueryFailed, close_rows
+import ev_pb2
+import ev_pb2_grpc
+from catalog import PublishedDataset
+from db_pool import init_pool as init_db_pool
+from parallel_etl import make_executor
+from upload_spool import UploadSpool
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+GRPC_ADDRESS = os.getenv("GRPC_ADDRESS", "0.0.0.0:50051")
+# Blocking work never runs on the event loop: queries (index lookups, XPath, DB cursors) and upload I/O
+# each get their own thread pool, ETL jobs run on the JobManager's threads and parallel ETL on a shared process pool.
+QUERY_THREADS = int(os.getenv("QUERY_THREADS", min(32, (os.cpu_count() or 1) + 4)))
+UPLOAD_THREADS = int(os.getenv("UPLOAD_THREADS", 4))
+# Queries/uploads in progress at once; more wait up to *_QUEUE_TIMEOUT seconds for a slot, then get RESOURCE_EXHAUSTED.
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", 256))
+MAX_CONCURRENT_UPLOADS = int(os.getenv("MAX_CONCURRENT_UPLOADS", 8))
+QUERY_QUEUE_TIMEOUT = float(os.getenv("QUERY_QUEUE_TIMEOUT", 2.0))
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", 10.0))
+# 0: no server-wide limit; otherwise gRPC itself rejects RPCs beyond it.
+MAX_CONCURRENT_RPCS = int(os.getenv("MAX_CONCURRENT_RPCS", 0))
+# Rows gathered per thread hop for unary queries; a disconnect stops the query at the next hop.
+QUERY_PAGE_ROWS = int(os.getenv("QUERY_PAGE_ROWS", 5000))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 0.2))
+SHUTDOWN_GRACE = float(os.getenv("SHUTDOWN_GRACE", 5.0))
+
+
+class AsyncEVSalesServicer(ev_pb2_grpc.EVSalesServicer):
+    # grpc.aio front end for GenericXMLServicer: idle streams and slow uploads hold no thread,
+    # and a client that disconnects cancels its handler, which stops the work behind it.
+
+    def __init__(self, servicer: GenericXMLServicer):
+        self.servicer = servicer
+        self.query_pool = futures.ThreadPoolExecutor(QUERY_THREADS, thread_name_prefix="query")
+        self.upload_pool = futures.ThreadPoolExecutor(UPLOAD_THREADS, thread_name_prefix="upload")
+        self.query_slots = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+        self.upload_slots = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+
+    def shutdown(self):
+        self.query_pool.shutdown(wait=False, cancel_futures=True)
+        self.upload_pool.shutdown(wait=False, cancel_futures=True)
+
+
+    @asynccontextmanager
+    async def _slot(self, slots: asyncio.Semaphore, timeout: float, kind: str, context):
+        acquire = asyncio.ensure_future(slots.acquire())
+        try:
+            done, _ = await asyncio.wait({acquire}, timeout=timeout)
+        except asyncio.CancelledError:
+            if acquire.done() and not acquire.cancelled():
+                slots.release()
+            acquire.cancel()
+            raise
+        if not done:
+            acquire.cancel()
+            logging.warning(f"[Warning] No free slot for {kind} after {timeout}s; request rejected.")
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Too many concurrent {kind}; retry later.")
+
+        try:
+            yield
+        finally:
+            slots.release()
+
+
+    async def _find_rows(self, request, context, dataset: Optional[PublishedDataset] = None) -> Optional[Iterator]:
+        future = self.query_pool.submit(self.servicer.find_rows, request, dataset)
+        try:
+            return await asyncio.wrap_future(future)
+        except QueryFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
+            return None
+        except asyncio.CancelledError:
+            # The lookup cannot be interrupted; close what it returns once it is done.
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or close_rows(f.result()))
+            raise
+
+
+    async def _pages(self, rows: Iterator, page_size: int) -> AsyncIterator[list]:
+        future = None
+        try:
+            while True:
+                future = self.query_pool.submit(lambda: list(islice(rows, page_size)))
+                page = await asyncio.wrap_future(future)
+                if not page:
+                    return
+                yield page
+        finally:
+            # A page still being read in its thread must finish before the generator can be closed.
+            if future is not None:
+                future.add_done_callback(lambda _: close_rows(rows))
+            else:
+                close_rows(rows)
+
+
+    async def GetSalesFiltered(self, request, context):
+        try:
+            dataset = self.servicer.resolve_dataset(request)
+        except QueryFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
+            return ev_pb2.SalesReply()
+
+        # Cache hits are answered on the event loop, without waiting for a query slot.
+        key = self.servicer.result_key(request, dataset)
+        reply = self.servicer.cached_reply(key)
+        if reply is not None:
+            return reply
+
+        async with self._slot(self.query_slots, QUERY_QUEUE_TIMEOUT, "queries", context):
+            rows = await self._find_rows(request, context, dataset)
+            if rows is None:
+                return ev_pb2.SalesReply()
+
+            sales = []
+            async with aclosing(self._pages(rows, QUERY_PAGE_ROWS)) as pages:
+                async for page in pages:
+                    sales.extend(page)
+
+            # Building the reply (encoding columns, copying strings) is CPU work too.
+            reply = await asyncio.get_running_loop().run_in_executor(self.query_pool, self.servicer.sales_reply, request, dataset, rows, sales)
+
+        logging.info(f"[Info] Filters: {dict(request.filters)} -> {len(sales)} records found")
+        self.servicer.cache_reply(key, reply)
+        return reply
+
+
+    async def Aggregate(self, request, context) -> ev_pb2.AggregateReply:
+        try:
+            dataset = self.servicer.resolve_dataset(request)
+        except QueryFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
+            return ev_pb2.AggregateReply()
+
+        key = self.servicer.aggregate_key(request, dataset)
+        reply = self.servicer.cached_reply(key)
+        if reply is not None:
+            return reply
+
+        async with self._slot(self.query_slots, QUERY_QUEUE_TIMEOUT, "queries", context):
+            try:
+                reply = await asyncio.get_running_loop().run_in_executor(self.query_pool, self.servicer.aggregate, request, dataset)
+            except QueryFailed as e:
+                context.set_details(e.details)
+                context.set_code(e.code)
+                return ev_pb2.AggregateReply()
+
+        self.servicer.cache_reply(key, reply)
+        return reply
+
+
+    async def GetSalesFilteredStream(self, request, context):
+        try:
+            dataset = self.servicer.resolve_dataset(request)
+        except QueryFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
+            return
+
+        async with self._slot(self.query_slots, QUERY_QUEUE_TIMEOUT, "queries", context):
+            rows = await self._find_rows(request, context, dataset)
+            if rows is None:
+                return
+
+            sales_page = self.servicer.sales_page(request, dataset)
+            loop = asyncio.get_running_loop()
+            page_size = request.page_size or STREAM_PAGE_SIZE
+            total = 0
+            try:
+                async with aclosing(self._pages(rows, page_size)) as pages:
+                    async for page in pages:
+                        total += len(page)
+                        yield await loop.run_in_executor(self.query_pool, sales_page, page)
+            except asyncio.CancelledError:
+                logging.info(f"[Info] Client cancelled streaming query after {total} records.")
+                raise
+
+            next_cursor = self.servicer.next_cursor(request, dataset, rows)
+            if next_cursor:
+                yield ev_pb2.SalesReply(next_cursor=next_cursor)
+
+        logging.info(f"[Info] Filters: {dict(request.filters)} -> {total} records streamed in pages of {page_size}")
+
+
+    async def UploadDataset(self, request_iterator, context) -> ev_pb2.UploadStatus:
+        async with self._slot(self.upload_slots, UPLOAD_QUEUE_TIMEOUT, "uploads", context):
+            filename = "uploaded_temp.csv"
+            loop = asyncio.get_running_loop()
+
+            try:
+                spool = await loop.run_in_executor(self.upload_pool, UploadSpool, self.servicer.catalog.root)
+            except Exception as e:
+                logging.error(f"Upload failed: could not create spool file: {e}")
+                return ev_pb2.UploadStatus(success=False, message=f"Upload failed on server: {str(e)}")
+
+            # Chunks are written one at a time, so a client sending faster than the disk is slowed down by gRPC flow control.
+            write = None
+            try:
+                async for request in request_iterator:
+                    if request.HasField("info"):
+                        filename = Path(request.info.filename).name or filename
+                    elif request.HasField("chunk_data"):
+                        write = self.upload_pool.submit(spool.write, request.chunk_data)
+                        await asyncio.wrap_future(write)
+
+                return await loop.run_in_executor(self.upload_pool, self.servicer.accept_upload, spool, filename)
+            except asyncio.CancelledError:
+                logging.warning(f"Upload of {filename} cancelled by the client after {spool.size} bytes.")
+                if write is not None:
+                    write.add_done_callback(lambda _: spool.discard())
+                else:
+                    spool.discard()
+                raise
+            except Exception as e:
+                return self.servicer.upload_failed(spool, filename, e, context)
+
+
+    async def GetJobStatus(self, request, context) -> ev_pb2.JobStatus:
+        return self.servicer.GetJobStatus(request, context)
+
+
+    async def WatchJob(self, request, context):
+        # Polls the job instead of parking a thread on it: thousands of idle watchers cost no threads.
+        job = self.servicer.jobs.get(request.job_id)
+        if job is None:
+            context.set_details(f"Job not found: {request.job_id}")
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            return
+
+        seen_version = -1
+        while True:
+            finished = job.finished
+            version = job.version
+            if version != seen_version:
+                seen_version = version
+                yield ev_pb2.JobStatus(**job.snapshot())
+            if finished:
+                return
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+    async def ListDatasets(self, request, context) -> ev_pb2.DatasetList:
+        return await asyncio.get_running_loop().run_in_executor(self.query_pool, self.servicer.ListDatasets, request, context)
+
+
+    async def GetCacheStats(self, request, context) -> ev_pb2.CacheStats:
+        return self.servicer.GetCacheStats(request, context)
+
+
+async def serve_async():
+    init_db_pool()
+    process_pool = make_executor() if ETL_MODE == "parallel" else None
+    # Startup may run the ETL on test.csv; keep it off the event loop.
+    servicer = await asyncio.to_thread(GenericXMLServicer, process_pool)
+    aio_servicer = AsyncEVSalesServicer(servicer)
+
+    server = grpc.aio.server(maximum_concurrent_rpcs=MAX_CONCURRENT_RPCS or None)
+    ev_pb2_grpc.add_EVSalesServicer_to_server(aio_servicer, server)
+    server.add_insecure_port(GRPC_ADDRESS)
+    await server.start()
+    logging.info(f"gRPC aio server running on {GRPC_ADDRESS} ({QUERY_THREADS} query threads, "
+                 f"{MAX_CONCURRENT_QUERIES} concurrent queries, {MAX_CONCURRENT_UPLOADS} concurrent uploads)...")
+
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(SHUTDOWN_GRACE)
+        aio_servicer.shutdown()
+        if process_pool is not None:
+            process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def serve():
+    asyncio.run(serve_async())
+
+
+if __name__ == "__main__":
+    serve()
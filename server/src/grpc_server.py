@@ -1,10 +1,17 @@
+import base64
 import grpc
+import hashlib
+import json
 from concurrent import futures
+from contextlib import nullcontext
 from pathlib import Path
-from lxml import etree
+import os
 import sys
 import logging
-from typing import Iterator
+from itertools import islice
+from typing import Iterator, List, Optional
+
+import numpy as np
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -17,146 +24,656 @@ if str(DOCKER_PROTO_DIR) not in sys.path:
 
 import ev_pb2
 import ev_pb2_grpc
-from csv_to_xml_ev import convert_csv_to_xml 
-from schema_generator import generate_xsd_from_xml, validate_xml_with_xsd
-from import_xml_to_postgres import main as load_xml_to_db
+from csv_to_xml_ev import convert_csv_to_xml, read_csv_as_columns, write_xml_rows
+from schema_generator import generate_xsd, validate_xml_with_xsd, validate_columns
+from import_xml_to_postgres import main as load_xml_to_db, load_columns as load_columns_to_db, load_table_parallel, table_has_rows
+from parallel_etl import iter_copy_shards, make_executor, parse_csv_parallel, plan_shards
+from query_index import ColumnarIndex
+from jobs import Job, JobManager
+from type_inference import TypeInferencer
+from db_pool import init_pool as init_db_pool
+from query_backends import BackendUnavailable, QUERY_BACKEND, make_backend
+from snapshot_store import SNAPSHOT_ENABLED, Snapshot, save_snapshot
+from catalog import Dataset, DatasetCatalog, DatasetNotFound, PublishedDataset, dataset_name, source_filename
+from result_cache import RESULT_CACHE_ENABLED, ResultCache
+from aggregation import aggregation_name
+from columnar import ColumnarEncoder
+from upload_spool import UploadRejected, UploadSpool
+
+
+DATA_DIR = Path("/app/data")
+# "xml": CSV -> XML -> XSD validation -> DB (original pipeline); "fast": CSV -> typed columns -> DB, XML built on demand;
+# "parallel": like "fast", with CSV shards parsed in worker processes and loaded over parallel COPY streams.
+ETL_MODE = os.getenv("ETL_MODE", "xml")
+STREAM_PAGE_SIZE = int(os.getenv("STREAM_PAGE_SIZE", 500))
+# Each dataset has its own directory, so uploads of different datasets are processed in parallel;
+# loads of the same dataset wait for each other.
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", 2))
+JOB_WATCH_INTERVAL = float(os.getenv("JOB_WATCH_INTERVAL", 1.0))
+# "aio": grpc.aio server with separate query/upload pools and concurrency limits (grpc_aio_server.py);
+# "sync": the thread-per-RPC server below.
+SERVER_MODE = os.getenv("SERVER_MODE", "aio")
+
+
+class QueryFailed(Exception):
+    def __init__(self, code: grpc.StatusCode, details: str):
+        super().__init__(details)
+        self.code = code
+        self.details = details
+
+
+def typed_value(value: ev_pb2.TypedValue):
+    kind = value.WhichOneof("kind")
+    return getattr(value, kind) if kind else ""
+
+
+def request_predicates(request) -> list:
+    return [
+        (p.field.replace(' ', '_'), ev_pb2.Predicate.Operator.Name(p.op).lower(), [typed_value(v) for v in p.values])
+        for p in request.predicates
+    ]
+
+
+def request_fields(request, dataset: PublishedDataset) -> Optional[List[str]]:
+    fields = [field.replace(' ', '_') for field in request.fields]
+    for field in fields:
+        if field not in dataset.column_names:
+            raise QueryFailed(grpc.StatusCode.INVALID_ARGUMENT, f"Field '{field}' does not exist.")
+    return fields or None
+
+
+class LimitedRows:
+    # At most `limit` rows of a backend iterator that was asked for one more; once exhausted,
+    # `more` tells whether that extra row existed, i.e. whether there is a next page.
+
+    def __init__(self, rows: Iterator, limit: int):
+        self.rows = rows
+        self.remaining = limit
+        self.more = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.remaining == 0:
+            self.more = next(self.rows, None) is not None
+            self.remaining = -1
+            raise StopIteration
+        if self.remaining < 0:
+            raise StopIteration
+        self.remaining -= 1
+        return next(self.rows)
+
+    def close(self):
+        close = getattr(self.rows, "close", None)
+        if close is not None:
+            close()
+
+
+def close_rows(rows):
+    # Backend row generators may hold resources (a pooled DB connection) until closed.
+    close = getattr(rows, "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception as e:
+        logging.warning(f"[Warning] Could not close a query: {e}")
 
 
 class GenericXMLServicer(ev_pb2_grpc.EVSalesServicer):
-    XML_FILE = Path("/app/data/output.xml")
-    last_table_name = "default_table"
-    xml_valid = False
-    
-    def __init__(self):
-        self.run_etl_pipeline(Path("/app/data/test.csv"), "test_data_default")
+    DEFAULT_DATASET = "test_data_default"
+
+    def __init__(self, process_pool: Optional[futures.Executor] = None):
+        # Parallel ETL uses process_pool when given (the aio server shares one), else spawns workers per load.
+        self.process_pool = process_pool
+        self.catalog = DatasetCatalog()
+        self.backend = make_backend(QUERY_BACKEND, self)
+        self.result_cache = ResultCache() if RESULT_CACHE_ENABLED else None
+        self.jobs = JobManager(max_workers=ETL_WORKERS)
+        lost_tables = {snapshot.table_name: snapshot for snapshot in self.catalog.restore(table_has_rows=table_has_rows)}
+        if self.DEFAULT_DATASET not in self.catalog and self.DEFAULT_DATASET not in lost_tables:
+            self.run_etl_pipeline(DATA_DIR / "test.csv", self.DEFAULT_DATASET)
+        for snapshot in lost_tables.values():
+            self.reload_dataset(snapshot)
+
+
+    def reload_dataset(self, snapshot: Snapshot) -> Job:
+        # The snapshot's source CSV is unchanged but its table is not: load it again in the background.
+        table_name = snapshot.table_name
+        with self.catalog.ensure(table_name).loads.enqueue(snapshot.source_path) as ticket:
+            return self.jobs.submit(
+                snapshot.source_path.name,
+                table_name,
+                lambda job: self.run_etl_pipeline(snapshot.source_path, table_name, job=job, source_sha256=snapshot.meta["source_sha256"], ticket=ticket),
+            )
+
+
+    def _save_snapshot(self, dataset: Dataset, version: int, index: ColumnarIndex, csv_path: Path, source_sha256: Optional[str]) -> Optional[Snapshot]:
+        if not SNAPSHOT_ENABLED:
+            return None
+        try:
+            return save_snapshot(index, csv_path, dataset.table_name, dataset.snapshot_dir, source_sha256, version)
+        except Exception as e:
+            logging.warning(f"[Warning] Could not save snapshot for '{dataset.name}': {e}")
+            return None
 
 
-    def run_etl_pipeline(self, csv_path: Path, table_name: str):
-        self.xml_valid = False
-        
+    def run_etl_pipeline(self, csv_path: Path, table_name: str, job: Optional[Job] = None, source_sha256: Optional[str] = None,
+                         ticket: Optional[int] = None) -> bool:
+        # Runs off the request path; the dataset's published version keeps serving queries until the swap at the end.
+        # ticket: from dataset.loads.enqueue() when the run was queued; without one it queues behind the runs waiting now.
+        job = job or Job(csv_path.name, table_name)
+        dataset = self.catalog.ensure(table_name)
+
         try:
-            column_names = convert_csv_to_xml(csv_path)
-            logging.info(f"XML created from {csv_path.name}. Columns: {column_names}")
-            
-            generate_xsd_from_xml() 
-            self.xml_valid = validate_xml_with_xsd()
-            
-            if not self.xml_valid:
-                logging.error("[Error] XML not valid against XSD. DB load aborted.")
-                return
+            with dataset.loads.turn(csv_path, ticket):
+                version = self.catalog.new_version()
+                try:
+                    if ETL_MODE == "fast":
+                        index = self._run_fast_pipeline(csv_path, dataset, version, job)
+                    elif ETL_MODE == "parallel":
+                        index = self._run_parallel_pipeline(csv_path, dataset, version, job)
+                    else:
+                        index = self._run_xml_pipeline(csv_path, dataset, version, job)
+                except Exception:
+                    dataset.remove_artifacts(keep=self._published_versions(dataset))
+                    raise
+
+                if index is None:
+                    dataset.remove_artifacts(keep=self._published_versions(dataset))
+                    return False
+
+                job.set_stage("snapshot")
+                snapshot = self._save_snapshot(dataset, version, index, csv_path, source_sha256)
+                self.catalog.publish(dataset, version, index, csv_path, snapshot=snapshot)
+                self.backend.invalidate(table_name)
+                if self.result_cache is not None:
+                    dropped = self.result_cache.invalidate(lambda key: key[0] == table_name)
+                    logging.info(f"[Info] Result cache: {dropped} cached replies of '{table_name}' dropped.")
 
-            logging.info(f"[Info] XML is valid, loading into DB '{table_name}'...")
-            
-            load_xml_to_db(column_names, table_name) 
-            
-            self.last_table_name = table_name
             logging.info(f"[Info] Database table '{table_name}' created/updated successfully.")
+            job.set_message(f"Dataset processed. DB table: {table_name}.")
+            return True
 
         except FileNotFoundError:
              logging.warning(f"[Warning] Initialization skipped: File not found at {csv_path}")
+             job.set_message(f"File not found: {csv_path}")
         except Exception as e:
             logging.error(f"[Error] Failed during ETL pipeline: {e}")
-            self.xml_valid = False
+            job.set_message(f"Failed during ETL pipeline: {e}")
+        return False
 
 
-    def GetSalesFiltered(self, request, context):
-        if not self.xml_valid:
-            context.set_details("XML not valid against XSD or DB not loaded.")
-            context.set_code(grpc.StatusCode.INTERNAL)
-            return ev_pb2.SalesReply()
+    def _published_versions(self, dataset: Dataset) -> set:
+        try:
+            return {self.catalog.get(dataset.name).version}
+        except DatasetNotFound:
+            return set()
+
+
+    def _run_xml_pipeline(self, csv_path: Path, dataset: Dataset, version: int, job: Job) -> Optional[ColumnarIndex]:
+        # Writes this version's own XML/XSD files; queries only reach them once the version is published.
+        table_name = dataset.table_name
+        xml_path, xsd_path = dataset.xml_path(version), dataset.xsd_path(version)
+        job.set_stage("csv_to_xml")
+        inferencer = TypeInferencer()
+        column_names = convert_csv_to_xml(csv_path, output_path=xml_path, progress=job.set_progress, inferencer=inferencer)
+        column_types = inferencer.result()
+        logging.info(f"XML created from {csv_path.name}. Columns: {column_names}")
+        
+        job.set_stage("xsd")
+        generate_xsd(column_names, column_types, xsd_path)
 
-        if not self.XML_FILE.exists():
-            context.set_details(f"File not found: {self.XML_FILE}")
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            return ev_pb2.SalesReply()
+        job.set_stage("validate")
+        if not validate_xml_with_xsd(xml_path=xml_path, xsd_path=xsd_path):
+            logging.error("[Error] XML not valid against XSD. DB load aborted.")
+            job.set_message("XML not valid against XSD. DB load aborted.")
+            return None
+
+        logging.info(f"[Info] XML is valid, loading into DB '{table_name}'...")
+        
+        job.set_stage("db_load")
+        load_xml_to_db(column_names, table_name, progress=job.set_progress, column_types=column_types, xml_path=xml_path)
+
+        job.set_stage("index")
+        index = ColumnarIndex.from_xml(xml_path, column_names, column_types)
+        job.set_progress(index.row_count)
+        return index
+
+
+    def _run_fast_pipeline(self, csv_path: Path, dataset: Dataset, version: int, job: Job) -> Optional[ColumnarIndex]:
+        # Single CSV pass; the version's XML/XSD are only written by ensure_xml_artifacts() when needed.
+        table_name = dataset.table_name
+        job.set_stage("parse_csv")
+        inferencer = TypeInferencer()
+        columns = read_csv_as_columns(csv_path, progress=job.set_progress, inferencer=inferencer)
+        column_types = inferencer.result()
+
+        job.set_stage("validate")
+        if not validate_columns(columns):
+            job.set_message("Dataset columns are not valid. DB load aborted.")
+            return None
+
+        logging.info(f"[Info] Columns are valid, loading into DB '{table_name}'...")
+
+        job.set_stage("db_load")
+        load_columns_to_db(columns, table_name, progress=job.set_progress, column_types=column_types)
+
+        job.set_stage("index")
+        index = ColumnarIndex(columns, column_types)
+        job.set_progress(index.row_count)
+        return index
+
+
+    def _run_parallel_pipeline(self, csv_path: Path, dataset: Dataset, version: int, job: Job) -> Optional[ColumnarIndex]:
+        table_name = dataset.table_name
+        if not csv_path.exists():
+            raise FileNotFoundError(f"CSV file not found at: {csv_path}")
+
+        shards = plan_shards(csv_path)
+        if len(shards) < 2:
+            # Too small to split: spawning workers would cost more than it saves.
+            return self._run_fast_pipeline(csv_path, dataset, version, job)
+
+        with nullcontext(self.process_pool) if self.process_pool else make_executor() as executor:
+            job.set_stage("parse_csv")
+            columns, column_types = parse_csv_parallel(csv_path, shards, executor, progress=job.set_progress)
 
+            job.set_stage("validate")
+            if not validate_columns({name: codes for name, (_, codes) in columns.items()}):
+                job.set_message("Dataset columns are not valid. DB load aborted.")
+                return None
+
+            logging.info(f"[Info] Columns are valid, loading into DB '{table_name}' ({len(shards)} shards)...")
+
+            job.set_stage("db_load")
+            copy_shards = iter_copy_shards(shards, column_types, executor)
+            load_table_parallel(table_name, list(columns.keys()), column_types, copy_shards, progress=job.set_progress)
+
+        job.set_stage("index")
+        index = ColumnarIndex.from_encoded(columns, column_types)
+        job.set_progress(index.row_count)
+        return index
+
+
+    def ensure_xml_artifacts(self, published: PublishedDataset) -> bool:
+        # The XML file is renamed into place last, so once it exists both files are complete.
+        if published.xml_path.exists():
+            return True
+
+        with published.dataset.xml_lock:
+            if published.xml_path.exists():
+                return True
+
+            index = self.catalog.index_for(published)
+            if index is None:
+                return False
+
+            tmp_xml = published.xml_path.with_name(f".{published.xml_path.name}.tmp")
+            tmp_xsd = published.xsd_path.with_name(f".{published.xsd_path.name}.tmp")
+            write_xml_rows(tmp_xml, index.column_names, index.iter_rows(np.arange(index.row_count)))
+            generate_xsd(index.column_names, index.column_types, tmp_xsd)
+            os.replace(tmp_xsd, published.xsd_path)
+            os.replace(tmp_xml, published.xml_path)
+            logging.info(f"[Info] XML artifacts materialized lazily: {published.xml_path}")
+            return True
+
+
+    def resolve_dataset(self, request) -> PublishedDataset:
         try:
-            tree = etree.parse(str(self.XML_FILE))
-            root = tree.getroot()
+            return self.catalog.get(request.dataset)
+        except DatasetNotFound as e:
+            raise QueryFailed(grpc.StatusCode.NOT_FOUND, str(e))
+
+
+    def find_rows(self, request, dataset: Optional[PublishedDataset] = None) -> Iterator:
+        # Shared by the sync handlers below and the grpc.aio servicer; errors come back as QueryFailed.
+        # XML strings, or tuples of cell texts for the columnar format; sales_page() turns a page of either into a reply.
+        dataset = dataset or self.resolve_dataset(request)
+        fields = request_fields(request, dataset)
+        offset = self.cursor_offset(request, dataset)
+        find = self.backend.find_records if request.format == ev_pb2.SalesFilterRequest.COLUMNAR else self.backend.find_rows
+        try:
+            # One row past the limit tells whether another page follows.
+            rows = find(dataset, dict(request.filters), request_predicates(request), fields, offset, request.limit + 1 if request.limit else 0)
+            return LimitedRows(rows, request.limit) if request.limit else rows
+        except ValueError as e:
+            raise QueryFailed(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        except BackendUnavailable as e:
+            raise QueryFailed(grpc.StatusCode.NOT_FOUND, str(e))
         except Exception as e:
-            context.set_details(f"Error parsing XML: {e}")
-            context.set_code(grpc.StatusCode.INTERNAL)
+            logging.error(f"[Error] Query failed on backend '{self.backend.name}': {e}")
+            raise QueryFailed(grpc.StatusCode.INTERNAL, f"Query failed: {e}")
+
+
+    def _find_rows(self, request, context, dataset: Optional[PublishedDataset] = None) -> Optional[Iterator]:
+        try:
+            return self.find_rows(request, dataset)
+        except QueryFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
+            return None
+
+
+    def sales_page(self, request, dataset: PublishedDataset):
+        # Returns the function that builds a SalesReply from one page of find_rows(); call once per query.
+        if request.format != ev_pb2.SalesFilterRequest.COLUMNAR:
+            return lambda page: ev_pb2.SalesReply(sales_xml=page)
+
+        encoder = ColumnarEncoder(request_fields(request, dataset) or dataset.column_names, dataset.column_types)
+        return lambda page: ev_pb2.SalesReply(columnar=ev_pb2.ColumnarRows(
+            row_count=len(page),
+            columns=[ev_pb2.Column(**column) for column in encoder.encode(page)],
+        ))
+
+
+    def _query_key(self, request, dataset: PublishedDataset) -> tuple:
+        # Filters and predicates are ANDed, so their order does not change the reply.
+        predicates = sorted(
+            ((p.field, p.op, tuple((v.WhichOneof("kind") or "", typed_value(v)) for v in p.values)) for p in request.predicates),
+            key=repr,
+        )
+        return (dataset.name, dataset.version, tuple(sorted(request.filters.items())), tuple(predicates))
+
+
+    def sales_reply(self, request, dataset: PublishedDataset, rows: Iterator, sales: list) -> ev_pb2.SalesReply:
+        # Unary reply: sales is everything read from rows (find_rows()), plus the cursor to the next page if any.
+        reply = self.sales_page(request, dataset)(sales)
+        reply.next_cursor = self.next_cursor(request, dataset, rows)
+        return reply
+
+
+    def result_key(self, request, dataset: PublishedDataset) -> tuple:
+        return self._query_key(request, dataset) + (request.format, tuple(request.fields), request.limit, request.cursor)
+
+
+    def _query_hash(self, request, dataset: PublishedDataset) -> str:
+        return hashlib.sha256(repr(self._query_key(request, dataset)[2:]).encode()).hexdigest()[:16]
+
+
+    def cursor_offset(self, request, dataset: PublishedDataset) -> int:
+        # Cursors are (dataset, version, query, offset): a page only continues the query it came from, on the same data.
+        if not request.cursor:
+            return 0
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(request.cursor.encode()))
+            name, version, query, offset = cursor["dataset"], cursor["version"], cursor["query"], int(cursor["offset"])
+        except (ValueError, TypeError, KeyError) as e:
+            raise QueryFailed(grpc.StatusCode.INVALID_ARGUMENT, f"Invalid cursor: {e}")
+        if name != dataset.name or query != self._query_hash(request, dataset):
+            raise QueryFailed(grpc.StatusCode.INVALID_ARGUMENT, "Cursor belongs to a different query.")
+        if version != dataset.version:
+            raise QueryFailed(grpc.StatusCode.FAILED_PRECONDITION,
+                              f"Dataset '{dataset.name}' was republished since the cursor was issued; start again without a cursor.")
+        return offset
+
+
+    def next_cursor(self, request, dataset: PublishedDataset, rows: Iterator) -> str:
+        # Only meaningful once rows (from find_rows()) has been read to the end.
+        if not getattr(rows, "more", False):
+            return ""
+        cursor = {
+            "dataset": dataset.name,
+            "version": dataset.version,
+            "query": self._query_hash(request, dataset),
+            "offset": self.cursor_offset(request, dataset) + request.limit,
+        }
+        return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+    def cached_reply(self, key: tuple):
+        if self.result_cache is None:
+            return None
+        reply = self.result_cache.get(key)
+        if reply is not None:
+            logging.info(f"[Info] Filters: {dict(key[2])} on '{key[0]}' answered from the result cache")
+        return reply
+
+
+    def cache_reply(self, key: tuple, reply):
+        # Replies are shared between RPCs once cached and must not be modified afterwards.
+        if self.result_cache is None:
+            return
+        try:
+            current = self.catalog.get(key[0]).version
+        except DatasetNotFound:
+            return
+        # Computed on a version that was replaced meanwhile: no later query can ask for it.
+        if current == key[1]:
+            self.result_cache.put(key, reply, reply.ByteSize())
+
+
+    def GetSalesFiltered(self, request, context):
+        try:
+            dataset = self.resolve_dataset(request)
+        except QueryFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
             return ev_pb2.SalesReply()
 
-        first_row_tag = "row" 
-        
-        xpath_conditions = []
-        warnings = [] 
-        
-        if root.find(first_row_tag) is not None:
-            valid_field_names = [child.tag for child in root.find(first_row_tag)]
-        else:
-             valid_field_names = [] 
-
-        for field, value in request.filters.items():
-            safe_field = field.replace(' ', '_') 
-            safe_value = value.replace("'", "") 
-            
-            if safe_field not in valid_field_names:
-                 warnings.append(f"Field '{field}' does not exist and was ignored.")
-                 continue
-
-            xpath_check = root.xpath(f"./{first_row_tag}/{safe_field}[.='{safe_value}']")
-            if not xpath_check:
-                 warnings.append(f"Value '{value}' for field '{field}' not found and was ignored.")
-                 continue
-            
-            xpath_conditions.append(f"{safe_field}='{safe_value}'")
-
-        if xpath_conditions:
-            xpath_query = f"./{first_row_tag}[" + " and ".join(xpath_conditions) + "]"
-            matched_nodes = root.xpath(xpath_query)
-            sales = [
-                etree.tostring(sale, encoding="unicode")
-                for sale in matched_nodes
-            ]
-        else:
-            matched_nodes = []
-            sales = []
-
-        for w in warnings:
-            logging.warning(f"[Query Warning] {w}")
+        key = self.result_key(request, dataset)
+        reply = self.cached_reply(key)
+        if reply is not None:
+            return reply
+
+        rows = self._find_rows(request, context, dataset)
+        if rows is None:
+            return ev_pb2.SalesReply()
+
+        try:
+            sales = list(rows)
+        finally:
+            close_rows(rows)
 
         logging.info(f"[Info] Filters: {dict(request.filters)} -> {len(sales)} records found")
 
-        if matched_nodes:
-             logging.info(f"[Info] Returning {len(matched_nodes)} filtered records.")
+        if sales:
+             logging.info(f"[Info] Returning {len(sales)} filtered records.")
 
-        return ev_pb2.SalesReply(sales_xml=sales)
+        reply = self.sales_reply(request, dataset, rows, sales)
+        self.cache_reply(key, reply)
+        return reply
 
 
-    def UploadDataset(self, request_iterator: Iterator[ev_pb2.UploadRequest], context) -> ev_pb2.UploadStatus:
-        data = bytearray()
-        filename = "uploaded_temp.csv"
-        
-        for request in request_iterator:
-            if request.HasField("info"):
-                filename = request.info.filename
-            elif request.HasField("chunk_data"):
-                data.extend(request.chunk_data)
+    def aggregate_key(self, request, dataset: PublishedDataset) -> tuple:
+        aggregations = tuple((a.function, a.field) for a in request.aggregations)
+        return self._query_key(request, dataset) + (("aggregate", tuple(request.group_by), aggregations),)
 
-        logging.info(f"File {filename} received. Total size: {len(data)} bytes.")
 
-        temp_csv_path = Path("/app/data/") / filename
-        table_name = filename.replace('.', '_').replace('-', '_').lower() 
-        
+    def aggregate(self, request, dataset: PublishedDataset) -> ev_pb2.AggregateReply:
+        # Shared by both servers, like find_rows(); errors come back as QueryFailed.
+        group_by = [name.replace(' ', '_') for name in request.group_by]
+        aggregations = [
+            (ev_pb2.Aggregation.Function.Name(a.function).lower(), a.field.replace(' ', '_'))
+            for a in request.aggregations
+        ] or [("count", "")]
+
+        try:
+            rows = self.backend.aggregate(dataset, dict(request.filters), request_predicates(request), group_by, aggregations)
+        except ValueError as e:
+            raise QueryFailed(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        except BackendUnavailable as e:
+            raise QueryFailed(grpc.StatusCode.NOT_FOUND, str(e))
+        except Exception as e:
+            logging.error(f"[Error] Aggregation failed on backend '{self.backend.name}': {e}")
+            raise QueryFailed(grpc.StatusCode.INTERNAL, f"Aggregation failed: {e}")
+
+        logging.info(f"[Info] Aggregate {[aggregation_name(a) for a in aggregations]} by {group_by}, "
+                     f"filters {dict(request.filters)} -> {len(rows)} groups")
+        return ev_pb2.AggregateReply(
+            columns=group_by + [aggregation_name(a) for a in aggregations],
+            rows=[ev_pb2.AggregateRow(keys=keys, values=values) for keys, values in rows],
+        )
+
+
+    def Aggregate(self, request, context) -> ev_pb2.AggregateReply:
+        try:
+            dataset = self.resolve_dataset(request)
+            key = self.aggregate_key(request, dataset)
+            reply = self.cached_reply(key)
+            if reply is None:
+                reply = self.aggregate(request, dataset)
+                self.cache_reply(key, reply)
+            return reply
+        except QueryFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
+            return ev_pb2.AggregateReply()
+
+
+    def GetSalesFilteredStream(self, request, context) -> Iterator[ev_pb2.SalesReply]:
         try:
-            with open(temp_csv_path, "wb") as f:
-                f.write(data)
-            
-            self.run_etl_pipeline(csv_path=temp_csv_path, table_name=table_name)
+            dataset = self.resolve_dataset(request)
+        except QueryFailed as e:
+            context.set_details(e.details)
+            context.set_code(e.code)
+            return
 
-            if self.xml_valid:
-                return ev_pb2.UploadStatus(success=True, message=f"Dataset '{filename}' processed. DB table: {table_name}.")
+        rows = self._find_rows(request, context, dataset)
+        if rows is None:
+            return
+        sales_page = self.sales_page(request, dataset)
+
+        page_size = request.page_size or STREAM_PAGE_SIZE
+        total = 0
+
+        try:
+            # gRPC only pulls the next page once the previous one was handed to the transport,
+            # so rows are produced lazily by the backend and a slow client throttles the generator.
+            while context.is_active():
+                page = list(islice(rows, page_size))
+                if not page:
+                    break
+                total += len(page)
+                yield sales_page(page)
             else:
-                return ev_pb2.UploadStatus(success=False, message="Upload successful but validation/DB load failed. Check server logs.")
+                logging.info("[Info] Client cancelled streaming query.")
+
+            next_cursor = self.next_cursor(request, dataset, rows) if context.is_active() else ""
+            if next_cursor:
+                yield ev_pb2.SalesReply(next_cursor=next_cursor)
+        finally:
+            close_rows(rows)
+
+        logging.info(f"[Info] Filters: {dict(request.filters)} -> {total} records streamed in pages of {page_size}")
+
 
+    def UploadDataset(self, request_iterator: Iterator[ev_pb2.UploadRequest], context) -> ev_pb2.UploadStatus:
+        filename = "uploaded_temp.csv"
+        
+        try:
+            spool = UploadSpool(self.catalog.root)
         except Exception as e:
-            logging.error(f"Upload or processing failed for {filename}: {e}")
+            logging.error(f"Upload failed: could not create spool file: {e}")
             return ev_pb2.UploadStatus(success=False, message=f"Upload failed on server: {str(e)}")
 
+        try:
+            for request in request_iterator:
+                if request.HasField("info"):
+                    filename = Path(request.info.filename).name or filename
+                elif request.HasField("chunk_data"):
+                    spool.write(request.chunk_data)
+
+            return self.accept_upload(spool, filename)
+        except Exception as e:
+            return self.upload_failed(spool, filename, e, context)
+
+
+    def upload_failed(self, spool: UploadSpool, filename: str, error: Exception, context) -> ev_pb2.UploadStatus:
+        spool.discard()
+        if isinstance(error, UploadRejected):
+            logging.warning(f"Upload of {filename} rejected: {error}")
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(error))
+            return ev_pb2.UploadStatus(success=False, message=f"Upload rejected: {str(error)}")
+        logging.error(f"Upload failed for {filename}: {error}")
+        return ev_pb2.UploadStatus(success=False, message=f"Upload failed on server: {str(error)}")
+
+
+    def accept_upload(self, spool: UploadSpool, filename: str) -> ev_pb2.UploadStatus:
+        dataset = self.catalog.ensure(dataset_name(filename))
+        table_name = dataset.table_name
+        source_path = dataset.directory / source_filename(spool.sha256)
+
+        # Queued in arrival order: uploads of one dataset are loaded, and get their versions, in that order. The source
+        # is queued before it is renamed into place, so a load publishing meanwhile does not remove it as stale.
+        with dataset.loads.enqueue(source_path) as ticket:
+            spool.commit(source_path)
+            job = self.jobs.submit(
+                filename,
+                table_name,
+                lambda job: self.run_etl_pipeline(csv_path=source_path, table_name=table_name, job=job, source_sha256=spool.sha256, ticket=ticket),
+            )
+        return ev_pb2.UploadStatus(
+            success=True,
+            message=f"Dataset '{filename}' received ({spool.size} bytes, sha256 {spool.sha256[:12]}). Processing as job {job.job_id}.",
+            job_id=job.job_id,
+            dataset=dataset.name,
+        )
+
+
+    def _job_status(self, job: Job) -> ev_pb2.JobStatus:
+        return ev_pb2.JobStatus(**job.snapshot())
+
+
+    def GetJobStatus(self, request, context) -> ev_pb2.JobStatus:
+        job = self.jobs.get(request.job_id)
+        if job is None:
+            context.set_details(f"Job not found: {request.job_id}")
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            return ev_pb2.JobStatus()
+        return self._job_status(job)
+
+
+    def WatchJob(self, request, context) -> Iterator[ev_pb2.JobStatus]:
+        job = self.jobs.get(request.job_id)
+        if job is None:
+            context.set_details(f"Job not found: {request.job_id}")
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            return
+
+        seen_version = -1
+        while context.is_active():
+            version = job.wait_for_change(seen_version, timeout=JOB_WATCH_INTERVAL)
+            finished = job.finished
+            if version != seen_version:
+                seen_version = version
+                yield self._job_status(job)
+            if finished:
+                return
+
+
+    def ListDatasets(self, request, context) -> ev_pb2.DatasetList:
+        datasets = [
+            ev_pb2.DatasetInfo(
+                name=dataset.name,
+                table_name=dataset.table_name,
+                row_count=dataset.row_count,
+                columns=dataset.column_names,
+                source_bytes=dataset.source_bytes,
+                snapshot_bytes=dataset.snapshot_bytes,
+                index_bytes=dataset.index_bytes,
+                index_loaded=dataset.index is not None,
+                updated_at=dataset.updated_at,
+            )
+            for dataset in sorted(self.catalog.list(), key=lambda dataset: dataset.name)
+        ]
+        return ev_pb2.DatasetList(datasets=datasets, default_dataset=self.catalog.default_name or "")
+
+
+    def GetCacheStats(self, request, context) -> ev_pb2.CacheStats:
+        if self.result_cache is None:
+            return ev_pb2.CacheStats(enabled=False)
+        return ev_pb2.CacheStats(enabled=True, **self.result_cache.stats())
+
 
 def serve():
+    if SERVER_MODE == "aio":
+        import grpc_aio_server
+        return grpc_aio_server.serve()
+
+    init_db_pool()
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
     ev_pb2_grpc.add_EVSalesServicer_to_server(GenericXMLServicer(), server)
     server.add_insecure_port("0.0.0.0:50051")
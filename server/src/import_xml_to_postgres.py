@@ -1,130 +1,391 @@
+import io
 import os
 import time
+from concurrent import futures
 from pathlib import Path
-import psycopg2
+from typing import Optional
+from psycopg2 import errors
 from psycopg2.extras import execute_values
 from lxml import etree as ET 
+import numpy as np
+import pandas as pd
 import logging
 
+from db_pool import connection
+from type_inference import ColumnType, TypeInferencer, convert_columns, infer_column_types
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+LOADER_MODE = os.getenv("LOADER_MODE", "copy")
+# Columns with at most this many distinct values get a B-tree index after the load.
+INDEX_MAX_DISTINCT = int(os.getenv("INDEX_MAX_DISTINCT", 1000))
+# Loads go into an UNLOGGED staging table (no WAL). Postgres empties UNLOGGED tables after a crash; on startup
+# DatasetCatalog.restore() finds the table empty while its snapshot has rows and the dataset is reloaded from its
+# source CSV. Set LOADER_SET_LOGGED=true to make tables durable before the swap instead (pays the WAL write then).
+LOADER_UNLOGGED = os.getenv("LOADER_UNLOGGED", "true").lower() == "true"
+LOADER_SET_LOGGED = os.getenv("LOADER_SET_LOGGED", "false").lower() == "true"
+STAGING_SUFFIX = "__staging"
+# The swap needs an ACCESS EXCLUSIVE lock. While it waits for running queries, every new reader of the table queues
+# behind it, so each attempt only waits this long, then backs off (readers proceed) and retries. With the defaults a
+# swap gives up after about 27 s (10 waits of 100 ms plus the backoffs) and the load fails; a reader that keeps its
+# transaction open longer blocks it. Streaming readers are bounded by QUERY_STREAM_IDLE_TIMEOUT_MS (query_backends).
+SWAP_LOCK_TIMEOUT_MS = int(os.getenv("SWAP_LOCK_TIMEOUT_MS", 100))
+SWAP_RETRIES = int(os.getenv("SWAP_RETRIES", 10))
+SWAP_MAX_BACKOFF = float(os.getenv("SWAP_MAX_BACKOFF", 5.0))
+# Concurrent COPY streams (one pooled connection each) used by load_table_parallel.
+LOADER_COPY_STREAMS = int(os.getenv("LOADER_COPY_STREAMS", 4))
+# Rows converted and sent to the database per batch.
+LOADER_BATCH_ROWS = int(os.getenv("LOADER_BATCH_ROWS", 50_000))
+
+
+def iter_xml_rows(xml_path: Path, column_names: list[str]):
+    for _, sale in ET.iterparse(str(xml_path), events=("end",), tag="row"):
+        yield [sale.findtext(col_name) for col_name in column_names]
+        sale.clear()
+        while sale.getprevious() is not None:
+            del sale.getparent()[0]
+
+
+def iter_xml_batches(xml_path: Path, column_names: list[str], batch_size: int = LOADER_BATCH_ROWS):
+    # The XML text of batch_size rows at a time, as a DataFrame of strings.
+    batch = []
+    for values in iter_xml_rows(xml_path, column_names):
+        batch.append(["" if value is None else value for value in values])
+        if len(batch) >= batch_size:
+            yield pd.DataFrame(batch, columns=column_names)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch, columns=column_names)
+
+
+def infer_xml_types(xml_path: Path, column_names: list[str]) -> dict[str, ColumnType]:
+    inferencer = TypeInferencer(column_names)
+    for frame in iter_xml_batches(xml_path, column_names):
+        inferencer.update(frame)
+        if inferencer.done:
+            break
+    return inferencer.result()
+
+
+def iter_xml_frames(xml_path: Path, column_types: dict[str, ColumnType]):
+    for frame in iter_xml_batches(xml_path, list(column_types.keys())):
+        yield convert_columns(frame, column_types)
+
+
+def iter_column_frames(frame: pd.DataFrame, batch_size: int = LOADER_BATCH_ROWS):
+    for start in range(0, len(frame), batch_size):
+        yield frame.iloc[start:start + batch_size]
+
+
+def report_progress(frames, progress):
+    count = 0
+    for frame in frames:
+        yield frame
+        count += len(frame)
+        progress(count)
+    progress(count)
+
+
+def copy_escape(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_field(column: pd.Series) -> list[str]:
+    # Formats each distinct value once and expands by code; NA (code -1) picks the trailing \N.
+    codes, uniques = pd.factorize(column)
+    if pd.api.types.is_bool_dtype(column.dtype):
+        text = ["t" if value else "f" for value in uniques]
+    elif pd.api.types.is_float_dtype(column.dtype):
+        text = [repr(value) for value in uniques.tolist()]
+    else:
+        text = [copy_escape(value) for value in uniques]
+    text.append("\\N")
+    return np.asarray(text, dtype=object)[codes].tolist()
+
+
+def copy_rows(fields: list[list[str]]) -> str:
+    # Joins per-column COPY fields row-wise in one pass.
+    if not fields or not fields[0]:
+        return ""
+    return "\n".join(map("\t".join, zip(*fields))) + "\n"
+
+
+def copy_text(frame: pd.DataFrame) -> str:
+    # COPY text format built a column at a time from typed columns.
+    if frame.empty:
+        return ""
+    return copy_rows([copy_field(frame[name]) for name in frame.columns])
 
-def to_int(x):
-    try: 
-        return int(x)
-    except Exception: 
-        return None
-
-def to_float(x):
-    try: 
-        if isinstance(x, str):
-            x = x.replace(',', '.')
-        return float(x)
-    except Exception: 
-        return None
-
-
-def infer_sql_type(column_name: str) -> str:
-    name_lower = column_name.lower().replace(' ', '_')
-    if 'year' in name_lower or 'id' in name_lower or 'age' in name_lower or 'quantity' in name_lower:
-        return "INTEGER"
-    if 'amount' in name_lower or 'price' in name_lower or 'cost' in name_lower or 'profit' in name_lower or 'revenue' in name_lower or 'distance' in name_lower:
-        return "NUMERIC"
-    return "TEXT"
-
-
-def wait_for_db(host, port, user, password, db, timeout=60):
-    start = time.time()
-    while True:
-        try:
-            conn = psycopg2.connect(host=host, port=port, user=user, password=password, dbname=db)
-            conn.close()
-            return
-        except Exception as e:
-            if time.time() - start > timeout:
-                raise TimeoutError("Database did not become available within the timeout.") from e
-            logging.warning(f"Waiting for database... Retrying in 2s. ({e})")
-            time.sleep(2)
-
-
-
-def main(column_names: list[str], table_name: str):
-    host = os.getenv("DB_HOST", "db")
-    port = int(os.getenv("DB_PORT", 5432))
-    user = os.getenv("DB_USER", "postgres")
-    password = os.getenv("DB_PASSWORD", "123456789")
-    db = os.getenv("DB_NAME", "db_TP2B")
-    
-    xml_path = Path(os.getenv("XML_PATH", "/app/data/output.xml")) 
 
-    logging.info(f"Loader (XML): waiting for DB {host}:{port} (db={db})")
-    wait_for_db(host, port, user, password, db)
+def frame_records(frame: pd.DataFrame):
+    # Row tuples of Python values (NA -> None), for execute_values.
+    values = frame.astype(object)
+    return values.where(frame.notna(), None).itertuples(index=False, name=None)
+
+
+class CopyFeed(io.TextIOBase):
+    # File-like view over COPY text produced one frame at a time.
+    def __init__(self, frames):
+        self._chunks = (copy_text(frame) for frame in self._count(frames))
+        self._buffer = ""
+        self.rows = 0
+
+    def _count(self, frames):
+        for frame in frames:
+            self.rows += len(frame)
+            yield frame
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size is None or size < 0 or length < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            length += len(chunk)
+
+        data = "".join(parts)
+        if size is None or size < 0:
+            self._buffer = ""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def copy_frames(cur, table_name: str, column_names: list[str], frames) -> int:
+    safe_column_list = [f'"{col.replace(" ", "_")}"' for col in column_names]
+    feed = CopyFeed(frames)
+    cur.copy_expert(
+        f'COPY "{table_name}" ({", ".join(safe_column_list)}) FROM STDIN',
+        feed,
+    )
+    return feed.rows
+
+
+def insert_frames(cur, table_name: str, column_names: list[str], frames) -> int:
+    records = [record for frame in frames for record in frame_records(frame)]
+    if records:
+        safe_column_list = [f'"{col.replace(" ", "_")}"' for col in column_names]
+        
+        insert_sql = f"""
+            INSERT INTO "{table_name}" ({', '.join(safe_column_list)})
+            VALUES %s
+        """
+        execute_values(cur, insert_sql, records, page_size=1000)
+    return len(records)
+
+
+def create_filter_indexes(cur, table_name: str, column_names: list[str]):
+    # Runs after the bulk load so COPY does not pay for index maintenance row by row.
+    cur.execute(f'ANALYZE "{table_name}";')
+    cur.execute(
+        "SELECT attname, n_distinct FROM pg_stats WHERE schemaname = current_schema() AND tablename = %s",
+        (table_name,),
+    )
+    n_distinct = dict(cur.fetchall())
+    cur.execute(f'SELECT count(*) FROM "{table_name}";')
+    row_count = cur.fetchone()[0]
+
+    for col_name in column_names:
+        safe_col_name = col_name.replace(' ', '_')
+        estimate = n_distinct.get(safe_col_name)
+        if estimate is None:
+            continue
+        # pg_stats reports negative n_distinct as a fraction of the row count.
+        distinct = -estimate * row_count if estimate < 0 else estimate
+        if distinct > INDEX_MAX_DISTINCT:
+            continue
+        cur.execute(f'CREATE INDEX IF NOT EXISTS "{table_name}_{safe_col_name}_idx" ON "{table_name}" ("{safe_col_name}");')
+        logging.info(f"Index created on '{table_name}.{safe_col_name}' (~{int(distinct)} distinct values).")
 
-    conn = psycopg2.connect(host=host, port=port, user=user, password=password, dbname=db)
-    cur = conn.cursor()
 
+
+def create_table(cur, table_name: str, column_types: dict[str, ColumnType], unlogged: bool = False):
     col_defs = []
     
-    for col_name in column_names:
-        sql_type = infer_sql_type(col_name)
+    for col_name, column_type in column_types.items():
+        sql_type = column_type.sql_type
         safe_col_name = f'"{col_name}"'.replace(' ', '_') 
         col_defs.append(f"{safe_col_name} {sql_type}")
 
     cur.execute(f'DROP TABLE IF EXISTS "{table_name}" CASCADE;')
-    conn.commit()
     
     create_sql = f"""
-        CREATE TABLE "{table_name}" (
+        CREATE {"UNLOGGED " if unlogged else ""}TABLE "{table_name}" (
           id SERIAL PRIMARY KEY,
           {', '.join(col_defs)}
         );
     """
     cur.execute(create_sql)
-    conn.commit()
-    logging.info(f"Table '{table_name}' created/recreated dynamically.")
+    logging.info(f"Table '{table_name}' created/recreated dynamically{' (unlogged)' if unlogged else ''}.")
+
+
+def rename_table_relations(cur, table_name: str, old_prefix: str, new_prefix: str):
+    # Indexes (primary key included) and the id sequence are named after the table; carry them
+    # over so the next staging table can reuse its names.
+    cur.execute(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE i.indrelid = %s::regclass",
+        (f'"{table_name}"',),
+    )
+    for (index_name,) in cur.fetchall():
+        if index_name.startswith(old_prefix):
+            cur.execute(f'ALTER INDEX "{index_name}" RENAME TO "{new_prefix + index_name[len(old_prefix):]}";')
+    cur.execute(f'ALTER SEQUENCE IF EXISTS "{old_prefix}_id_seq" RENAME TO "{new_prefix}_id_seq";')
+
+
+def drop_staging(staging_name: str):
+    # A failed load leaves no staging table behind; it would hold a full copy of the data until the next load.
+    try:
+        with connection() as conn, conn.cursor() as cur:
+            cur.execute(f'DROP TABLE IF EXISTS "{staging_name}" CASCADE;')
+    except Exception as e:
+        logging.warning(f"Could not drop staging table '{staging_name}': {e}")
+
+
+def swap_table(staging_name: str, table_name: str, retries: int = SWAP_RETRIES):
+    try:
+        for attempt in range(1, retries + 1):
+            try:
+                with connection() as conn, conn.cursor() as cur:
+                    cur.execute("SET LOCAL lock_timeout = %s", (f"{SWAP_LOCK_TIMEOUT_MS}ms",))
+                    cur.execute(f'DROP TABLE IF EXISTS "{table_name}" CASCADE;')
+                    cur.execute(f'ALTER TABLE "{staging_name}" RENAME TO "{table_name}";')
+                    rename_table_relations(cur, table_name, staging_name, table_name)
+                logging.info(f"Table '{staging_name}' swapped in as '{table_name}'.")
+                return
+            except errors.LockNotAvailable:
+                if attempt == retries:
+                    logging.error(f"Swap of '{table_name}' gave up after {retries} attempts; readers held the table throughout.")
+                    raise
+                logging.warning(f"Swap of '{table_name}' waited too long for readers (attempt {attempt}/{retries}), retrying...")
+                time.sleep(min(0.1 * 2 ** attempt, SWAP_MAX_BACKOFF))
+    except Exception:
+        drop_staging(staging_name)
+        raise
+
+
+def table_has_rows(table_name: str) -> Optional[bool]:
+    # None when the table does not exist. Reads at most one row: a count(*) per dataset would scan every table at startup.
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", (f'"{table_name}"',))
+        if cur.fetchone()[0] is None:
+            return None
+        cur.execute(f'SELECT EXISTS (SELECT 1 FROM "{table_name}" LIMIT 1);')
+        return cur.fetchone()[0]
+
+
+def write_frames(cur, table_name: str, column_names: list[str], frames, mode: str, progress=None) -> int:
+    if progress:
+        frames = report_progress(frames, progress)
+
+    if mode == "copy":
+        inserted = copy_frames(cur, table_name, column_names, frames)
+    else:
+        inserted = insert_frames(cur, table_name, column_names, frames)
+
+    if inserted:
+        logging.info(f"Inserted {inserted} rows into table '{table_name}'.")
+    else:
+        logging.warning(f"No records to insert into table '{table_name}'")
+    return inserted
+
+
+def load_table(table_name: str, column_names: list[str], column_types: dict[str, ColumnType], frames, mode: str = LOADER_MODE, progress=None):
+    # Readers keep querying the current table while the staging one is filled, indexed and analyzed;
+    # they only see the new data once the swap commits.
+    staging_name = table_name + STAGING_SUFFIX
+
+    with connection() as conn, conn.cursor() as cur:
+        create_table(cur, staging_name, column_types, unlogged=LOADER_UNLOGGED)
+        write_frames(cur, staging_name, column_names, frames, mode, progress)
+        create_filter_indexes(cur, staging_name, column_names)
+        if LOADER_UNLOGGED and LOADER_SET_LOGGED:
+            cur.execute(f'ALTER TABLE "{staging_name}" SET LOGGED;')
+
+    swap_table(staging_name, table_name)
+
+
+def load_table_parallel(table_name: str, column_names: list[str], column_types: dict[str, ColumnType], copy_shards, streams: int = LOADER_COPY_STREAMS, progress=None):
+    # copy_shards yields (copy_text, rows) with an explicit id first; each shard is COPYed on its own
+    # connection, so the staging table is committed empty first and indexed once every stream is done.
+    staging_name = table_name + STAGING_SUFFIX
+    safe_column_list = ['"id"'] + [f'"{col.replace(" ", "_")}"' for col in column_names]
+    copy_sql = f'COPY "{staging_name}" ({", ".join(safe_column_list)}) FROM STDIN'
+
+    with connection() as conn, conn.cursor() as cur:
+        create_table(cur, staging_name, column_types, unlogged=LOADER_UNLOGGED)
+
+    def copy_shard(text: str, rows: int) -> int:
+        with connection() as conn, conn.cursor() as cur:
+            cur.copy_expert(copy_sql, io.StringIO(text))
+        return rows
+
+    try:
+        inserted = 0
+        with futures.ThreadPoolExecutor(max_workers=streams) as executor:
+            pending = set()
+            for text, rows in copy_shards:
+                pending.add(executor.submit(copy_shard, text, rows))
+                # Cap queued COPY text at one shard per stream.
+                while len(pending) >= streams:
+                    done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                    for future in done:
+                        inserted += future.result()
+                        if progress:
+                            progress(inserted)
+            for future in futures.as_completed(pending):
+                inserted += future.result()
+                if progress:
+                    progress(inserted)
+
+        logging.info(f"Inserted {inserted} rows into table '{staging_name}' over {streams} COPY streams.")
+
+        with connection() as conn, conn.cursor() as cur:
+            cur.execute(f"SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(max(id), 1)) FROM \"{staging_name}\";", (f'"{staging_name}"',))
+            create_filter_indexes(cur, staging_name, column_names)
+            if LOADER_UNLOGGED and LOADER_SET_LOGGED:
+                cur.execute(f'ALTER TABLE "{staging_name}" SET LOGGED;')
+    except Exception:
+        # The staging table was committed empty before the COPYs.
+        drop_staging(staging_name)
+        raise
+
+    swap_table(staging_name, table_name)
+
+
+def main(column_names: list[str], table_name: str, mode: str = LOADER_MODE, progress=None, column_types=None, xml_path: Optional[Path] = None):
+    xml_path = xml_path or Path(os.getenv("XML_PATH", "/app/data/output.xml"))
 
-    
     if not xml_path.exists():
         logging.error(f"XML file not found: {xml_path}")
         return 
 
-    logging.info(f"Reading XML from {xml_path}...")
-    tree = ET.parse(str(xml_path))
-    root = tree.getroot() 
-    
-    records = []
-    
-    for sale in root.findall("row"): 
-        row_values = []
-        for col_name in column_names:
-            value = sale.findtext(col_name)
-            
-            sql_type = infer_sql_type(col_name)
-
-            if sql_type == "INTEGER":
-                row_values.append(to_int(value))
-            elif sql_type == "NUMERIC":
-                row_values.append(to_float(value))
-            else:
-                row_values.append(value or "")
-                
-        records.append(tuple(row_values))
+    if column_types is None:
+        column_types = infer_xml_types(xml_path, column_names)
 
-    if records:
-        safe_column_list = [f'"{col.replace(" ", "_")}"' for col in column_names]
-        
-        insert_sql = f"""
-            INSERT INTO "{table_name}" ({', '.join(safe_column_list)})
-            VALUES %s
-        """
-        execute_values(cur, insert_sql, records, page_size=1000)
-        conn.commit()
-        logging.info(f"Inserted {len(records)} rows into table '{table_name}'.")
-    else:
-        logging.warning("No records to insert from XML")
+    logging.info(f"Reading XML from {xml_path} (mode={mode})...")
+    frames = iter_xml_frames(xml_path, column_types)
+    load_table(table_name, column_names, column_types, frames, mode, progress)
+
+
+def load_columns(columns: dict[str, list], table_name: str, mode: str = LOADER_MODE, progress=None, column_types=None):
+    column_names = list(columns.keys())
+    if column_types is None:
+        column_types = infer_column_types(columns)
 
-    cur.close()
-    conn.close()
+    # One vectorized conversion per column; the loader gets typed arrays, not per-cell Python values.
+    typed = convert_columns(columns, column_types)
+    load_table(table_name, column_names, column_types, iter_column_frames(typed), mode, progress)
 
 
 if __name__ == "__main__":
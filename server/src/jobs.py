@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent import futures
+from typing import Callable, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+SUCCEEDED = "SUCCEEDED"
+FAILED = "FAILED"
+
+
+class Job:
+    def __init__(self, filename: str, table_name: str):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.table_name = table_name
+        self.state = QUEUED
+        self.stage = ""
+        self.message = ""
+        self.rows_processed = 0
+        self.created_at = time.time()
+        self.stage_started_at = self.created_at
+        self.finished_at: Optional[float] = None
+        self.version = 0
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (SUCCEEDED, FAILED)
+
+    def _touch(self):
+        self.version += 1
+        self._changed.notify_all()
+
+    def set_stage(self, stage: str):
+        with self._changed:
+            self.state = RUNNING
+            self.stage = stage
+            self.rows_processed = 0
+            self.stage_started_at = time.time()
+            self._touch()
+
+    def set_progress(self, rows_processed: int):
+        with self._changed:
+            self.rows_processed = rows_processed
+            self._touch()
+
+    def finish(self, success: bool, message: str = ""):
+        with self._changed:
+            self.state = SUCCEEDED if success else FAILED
+            self.message = message or self.message
+            self.finished_at = time.time()
+            self._touch()
+
+    def set_message(self, message: str):
+        with self._changed:
+            self.message = message
+            self._touch()
+
+    def wait_for_change(self, seen_version: int, timeout: float) -> int:
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != seen_version or self.finished, timeout)
+            return self.version
+
+    def snapshot(self) -> dict:
+        with self._changed:
+            now = self.finished_at or time.time()
+            stage_elapsed = now - self.stage_started_at
+            return {
+                "job_id": self.job_id,
+                "state": self.state,
+                "stage": self.stage,
+                "rows_processed": self.rows_processed,
+                "rows_per_second": self.rows_processed / stage_elapsed if stage_elapsed > 0 else 0.0,
+                "elapsed_seconds": now - self.created_at,
+                "message": self.message,
+            }
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 1, history: int = 100):
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="etl")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._history = history
+
+    def submit(self, filename: str, table_name: str, work: Callable[[Job], bool]) -> Job:
+        job = Job(filename, table_name)
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict_finished()
+
+        self._executor.submit(self._run, job, work)
+        logging.info(f"[Info] Job {job.job_id} queued for '{filename}' -> table '{table_name}'.")
+        return job
+
+    def _run(self, job: Job, work: Callable[[Job], bool]):
+        try:
+            success = work(job)
+            job.finish(success)
+        except Exception as e:
+            logging.error(f"[Error] Job {job.job_id} crashed: {e}")
+            job.finish(False, str(e))
+        logging.info(f"[Info] Job {job.job_id} finished: {job.state}.")
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self._jobs) - self._history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
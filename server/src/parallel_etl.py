@@ -0,0 +1,168 @@
+import io
+import multiprocessing
+import os
+from concurrent import futures
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from csv_to_xml_ev import read_csv_columns
+from import_xml_to_postgres import copy_field, copy_rows
+from query_index import encode_column, merge_encoded
+from type_inference import ColumnType, TypeInferencer, convert_column
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+ETL_PARALLEL_WORKERS = int(os.getenv("ETL_PARALLEL_WORKERS", os.cpu_count() or 1))
+# Shards smaller than this are not worth a process round-trip.
+ETL_SHARD_MIN_BYTES = int(os.getenv("ETL_SHARD_MIN_BYTES", 4 * 1024 * 1024))
+# Several shards per worker keep every core busy when shards parse at different speeds.
+ETL_SHARDS_PER_WORKER = int(os.getenv("ETL_SHARDS_PER_WORKER", 4))
+
+# Column name -> (sorted dictionary, int32 code per row), as query_index.encode_column() returns.
+EncodedColumns = Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+
+class Shard:
+    # Byte range [start, end) of the CSV body, always cut on a line boundary.
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+        self.first_row = 0
+        self.row_count = 0
+        # The shard's own encoded columns, from parsing until its COPY text is submitted.
+        self.columns: Optional[EncodedColumns] = None
+
+
+def plan_shards(csv_path: Path, workers: int = ETL_PARALLEL_WORKERS) -> List[Shard]:
+    # Splitting on newlines assumes no quoted field spans several lines, which holds for our datasets;
+    # a shard that breaks a record makes pandas report a column-count error and the job fails.
+    size = csv_path.stat().st_size
+    with open(csv_path, "rb") as f:
+        f.readline()
+        body_start = f.tell()
+        body = size - body_start
+        count = max(1, min(workers * ETL_SHARDS_PER_WORKER, body // ETL_SHARD_MIN_BYTES))
+
+        cuts = [body_start]
+        for i in range(1, count):
+            target = body_start + body * i // count
+            if target <= cuts[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()
+            if f.tell() >= size:
+                break
+            if f.tell() > cuts[-1]:
+                cuts.append(f.tell())
+        cuts.append(size)
+
+    return [Shard(start, end) for start, end in zip(cuts, cuts[1:]) if end > start]
+
+
+def _read_shard(csv_path: Path, start: int, end: int, column_names: List[str]) -> pd.DataFrame:
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(
+        io.BytesIO(data),
+        header=None,
+        names=column_names,
+        dtype=str,
+        keep_default_na=False,
+    )
+
+
+def _parse_shard(csv_path: Path, start: int, end: int, column_names: List[str]) -> Tuple[EncodedColumns, TypeInferencer]:
+    # The shard's only CSV read: type evidence plus every column dictionary-encoded, so the parent receives
+    # each shard's distinct strings and int32 codes instead of one Python string per cell.
+    frame = _read_shard(csv_path, start, end, column_names)
+    inferencer = TypeInferencer(column_names)
+    inferencer.update(frame)
+    return {name: encode_column(frame[name].to_numpy(dtype=object)) for name in column_names}, inferencer
+
+
+def _encode_shard(columns: EncodedColumns, first_row: int, column_types: Dict[str, ColumnType]) -> Tuple[str, int]:
+    # COPY text for one shard from its encoded columns: each distinct value is converted and formatted once,
+    # then expanded by code. Explicit ids keep the table in CSV order whatever order shards land in.
+    row_count = len(next(iter(columns.values()))[1])
+    fields = [list(map(str, range(first_row + 1, first_row + 1 + row_count)))]
+    for name, column_type in column_types.items():
+        dictionary, codes = columns[name]
+        fields.append(np.asarray(copy_field(convert_column(dictionary, column_type)), dtype=object)[codes].tolist())
+    return copy_rows(fields), row_count
+
+
+def make_executor(workers: int = ETL_PARALLEL_WORKERS) -> futures.ProcessPoolExecutor:
+    # "spawn": forking a process that already runs gRPC threads is not safe.
+    return futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def parse_csv_parallel(
+    csv_path: Path,
+    shards: List[Shard],
+    executor: futures.Executor,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Tuple[EncodedColumns, Dict[str, ColumnType]]:
+    # Merges the shards' dictionaries per column; the result feeds ColumnarIndex.from_encoded().
+    if not csv_path.exists():
+        raise FileNotFoundError(f"CSV file not found at: {csv_path}")
+
+    column_names = read_csv_columns(csv_path)
+    pending = {
+        executor.submit(_parse_shard, csv_path, shard.start, shard.end, column_names): i
+        for i, shard in enumerate(shards)
+    }
+    inferencer = TypeInferencer(column_names)
+    row_count = 0
+
+    for future in futures.as_completed(pending):
+        shard = shards[pending[future]]
+        shard.columns, shard_inferencer = future.result()
+        inferencer.merge(shard_inferencer)
+        shard.row_count = len(shard.columns[column_names[0]][1])
+        row_count += shard.row_count
+        if progress:
+            progress(row_count)
+
+    first_row = 0
+    for shard in shards:
+        shard.first_row = first_row
+        first_row += shard.row_count
+    columns = {name: merge_encoded([shard.columns[name] for shard in shards]) for name in column_names}
+
+    logging.info(f"CSV parsed in parallel: {csv_path} ({row_count} rows, {len(shards)} shards)")
+    return columns, inferencer.result()
+
+
+def iter_copy_shards(
+    shards: List[Shard],
+    column_types: Dict[str, ColumnType],
+    executor: futures.Executor,
+    max_pending: int = ETL_PARALLEL_WORKERS * 2,
+) -> Iterator[Tuple[str, int]]:
+    # Yields (copy_text, rows) as shards finish; only max_pending encoded shards are held at once.
+    queue = iter(shards)
+    pending = set()
+
+    def submit_next() -> bool:
+        shard = next(queue, None)
+        if shard is None:
+            return False
+        pending.add(executor.submit(_encode_shard, shard.columns, shard.first_row, column_types))
+        shard.columns = None
+        return True
+
+    while len(pending) < max_pending and submit_next():
+        pass
+
+    while pending:
+        done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            yield future.result()
+            submit_next()
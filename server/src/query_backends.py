@@ -0,0 +1,535 @@
+import os
+import threading
+from collections import OrderedDict
+from itertools import count
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+import logging
+
+import numpy as np
+from lxml import etree
+
+import db_pool
+from catalog import PublishedDataset
+from aggregation import Aggregation, aggregate_rows, check_aggregations, column_values, factorize, group_aggregate
+from query_index import ColumnarIndex, PREDICATE_ARITY, ROW_TAG
+from type_inference import parse_number
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+QUERY_BACKEND = os.getenv("QUERY_BACKEND", "memory-index")
+QUERY_FETCH_SIZE = int(os.getenv("QUERY_FETCH_SIZE", 2000))
+# A streamed Postgres query holds its table open between fetches; a client that stops reading for this long loses
+# its stream, so a table swap (see SWAP_LOCK_TIMEOUT_MS) is not blocked by it. 0 disables the limit.
+QUERY_STREAM_IDLE_TIMEOUT_MS = int(os.getenv("QUERY_STREAM_IDLE_TIMEOUT_MS", 10_000))
+# Compiled XPath expressions kept by the XML backend, one per filter shape.
+XPATH_CACHE_SIZE = int(os.getenv("XPATH_CACHE_SIZE", 256))
+NUMERIC_TYPES = ("integer", "bigint", "numeric", "double precision", "real", "smallint")
+# Namespace of the functions the XML backend adds to its XPath expressions.
+XPATH_NAMESPACE = "urn:ev-sales:xpath"
+
+Predicate = Tuple[str, str, list]
+# One result row of an aggregation: (group-by values, one number per aggregate).
+AggregateRow = Tuple[List[str], List[float]]
+
+
+class BackendUnavailable(Exception):
+    pass
+
+
+def row_texts(column_names: List[str], values) -> Tuple[str, ...]:
+    return tuple("" if value is None else str(value) for value in values)
+
+
+def row_xml(column_names: List[str], values) -> str:
+    parts = [f"<{ROW_TAG}>"]
+    for name, value in zip(column_names, values):
+        text = "" if value is None else str(value)
+        parts.append(f"<{name}>{escape(text)}</{name}>" if text else f"<{name}/>")
+    parts.append(f"</{ROW_TAG}>")
+    return "".join(parts)
+
+
+class QueryBackend:
+    name = ""
+
+    def __init__(self, servicer):
+        self.servicer = servicer
+
+    # fields: columns to return, in that order (None: all); offset/limit: window over the matches in row order (limit 0: no limit).
+
+    def find_rows(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                  fields: Optional[List[str]] = None, offset: int = 0, limit: int = 0) -> Iterator[str]:
+        # Filters on an unknown field or on a value the column does not have are ignored with a warning.
+        raise NotImplementedError
+
+    def find_records(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                     fields: Optional[List[str]] = None, offset: int = 0, limit: int = 0) -> Iterator[Tuple[str, ...]]:
+        # Same rows as find_rows(), as one tuple of cell texts per row (in fields or dataset.column_names order).
+        raise NotImplementedError
+
+    def aggregate(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                  group_by: List[str], aggregations: List[Aggregation]) -> List[AggregateRow]:
+        # Unlike find_rows(), a request with no filters and no predicates selects every row, and a filter value the
+        # column does not have matches no rows instead of being ignored. Filters that were all ignored (unknown
+        # fields) select none.
+        raise NotImplementedError
+
+    def invalidate(self, table_name: str):
+        pass
+
+
+class MemoryIndexBackend(QueryBackend):
+    name = "memory-index"
+
+    def find_rows(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                  fields: Optional[List[str]] = None, offset: int = 0, limit: int = 0) -> Iterator[str]:
+        index = self._index(dataset)
+        return index.iter_rows_xml(self._window(self.match_rows(index, filters, predicates), offset, limit), fields)
+
+    def find_records(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                     fields: Optional[List[str]] = None, offset: int = 0, limit: int = 0) -> Iterator[Tuple[str, ...]]:
+        index = self._index(dataset)
+        return index.iter_rows(self._window(self.match_rows(index, filters, predicates), offset, limit), fields)
+
+    def _index(self, dataset: PublishedDataset) -> ColumnarIndex:
+        index: Optional[ColumnarIndex] = self.servicer.catalog.index_for(dataset)
+        if index is None:
+            raise BackendUnavailable("Query index not loaded.")
+        return index
+
+    def _window(self, row_ids: np.ndarray, offset: int, limit: int) -> np.ndarray:
+        # Matches are sorted row ids: a page is a slice, and only its rows are ever decoded.
+        return row_ids[offset:offset + limit] if limit else row_ids[offset:]
+
+    def aggregate(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                  group_by: List[str], aggregations: List[Aggregation]) -> List[AggregateRow]:
+        index = self._index(dataset)
+        return index.aggregate(self.match_rows(index, filters, predicates, match_all=True), group_by, aggregations)
+
+    def match_rows(self, index: ColumnarIndex, filters: Dict[str, str], predicates: List[Predicate], match_all: bool = False) -> np.ndarray:
+        conditions = []
+        warnings = []
+
+        for field, value in filters.items():
+            safe_field = field.replace(' ', '_')
+
+            if not index.has_column(safe_field):
+                 warnings.append(f"Field '{field}' does not exist and was ignored.")
+                 continue
+
+            if not index.has_value(safe_field, value):
+                 if not match_all:
+                     warnings.append(f"Value '{value}' for field '{field}' not found and was ignored.")
+                     continue
+                 # Aggregates keep it as a condition: its posting list is empty, so nothing matches.
+                 warnings.append(f"Value '{value}' for field '{field}' not found; no rows match.")
+
+            conditions.append((safe_field, value))
+
+        for w in warnings:
+            logging.warning(f"[Query Warning] {w}")
+
+        if predicates:
+            return index.select(predicates, index.lookup(conditions) if conditions else None)
+        if not conditions:
+            return np.arange(index.row_count, dtype=np.int32) if match_all and not filters else np.empty(0, dtype=np.int32)
+        return index.lookup(conditions)
+
+
+def _xpath_number(context, cells) -> float:
+    # ev:number(): XPath's number() only reads "1234.5"; cells hold locale numbers ("1.234,5", "50,3%"),
+    # parsed here as the query index parses them. NaN (empty or not a number) fails every comparison.
+    number = parse_number(cells[0].text) if cells else None
+    return float("nan") if number is None else number
+
+
+def _xpath_compare(context, cells, value: str) -> float:
+    # ev:compare(): XPath 1.0 turns both sides of < and > into numbers; text columns are ordered as the query index
+    # orders them, by code point. -1, 0 or 1; NaN (no cell) fails every comparison.
+    if not cells:
+        return float("nan")
+    text = cells[0].text or ""
+    return float((text > value) - (text < value))
+
+
+class XMLBackend(QueryBackend):
+    name = "xml"
+
+    def __init__(self, servicer):
+        super().__init__(servicer)
+        # (field, operator, numeric, value count) per condition -> compiled XPath, least recently used first.
+        self._xpaths: "OrderedDict[tuple, etree.XPath]" = OrderedDict()
+        self._xpaths_lock = threading.Lock()
+
+    def find_rows(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                  fields: Optional[List[str]] = None, offset: int = 0, limit: int = 0) -> Iterator[str]:
+        sales = self._window(self._matching_rows(dataset, filters, predicates), offset, limit)
+        if fields:
+            return (row_xml(fields, values) for values in self._records(fields, sales))
+        return (etree.tostring(sale, encoding="unicode") for sale in sales)
+
+    def find_records(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                     fields: Optional[List[str]] = None, offset: int = 0, limit: int = 0) -> Iterator[Tuple[str, ...]]:
+        sales = self._window(self._matching_rows(dataset, filters, predicates), offset, limit)
+        return self._records(fields or dataset.column_names, sales)
+
+    def _window(self, sales: list, offset: int, limit: int) -> list:
+        return sales[offset:offset + limit] if limit else sales[offset:]
+
+    def _records(self, column_names: List[str], sales: list) -> Iterator[Tuple[str, ...]]:
+        for sale in sales:
+            # One pass over the children; findtext() per column would search the row again each time.
+            texts = {child.tag: child.text for child in sale}
+            yield tuple(texts.get(name) or "" for name in column_names)
+
+    def aggregate(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                  group_by: List[str], aggregations: List[Aggregation]) -> List[AggregateRow]:
+        for name in group_by:
+            if name not in dataset.column_names:
+                raise ValueError(f"Field '{name}' does not exist.")
+        numeric = {name for name, column_type in dataset.column_types.items() if column_type.is_numeric}
+        check_aggregations(aggregations, numeric, dataset.column_names)
+
+        rows = self._matching_rows(dataset, filters, predicates, match_all=True)
+        labels, keys = [], []
+        for name in group_by:
+            column_labels, codes = factorize([row.findtext(name) or "" for row in rows])
+            labels.append(column_labels)
+            keys.append(codes)
+        values = {
+            field: column_values([row.findtext(field) or "" for row in rows], field in numeric)
+            for _, field in aggregations if field
+        }
+        group_codes, results = group_aggregate(keys, len(rows), aggregations, values)
+        return aggregate_rows(group_codes, labels, results)
+
+    def _matching_rows(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate], match_all: bool = False) -> list:
+        if not self.servicer.ensure_xml_artifacts(dataset):
+            raise BackendUnavailable(f"File not found: {dataset.xml_path}")
+
+        try:
+            tree = etree.parse(str(dataset.xml_path))
+        except OSError as e:
+            # Only if two newer versions were published since this query started.
+            raise BackendUnavailable(f"Dataset '{dataset.name}' was replaced during the query: {e}") from e
+        root = tree.getroot()
+
+        conditions, matchable = self._filter_conditions(dataset, root, filters, match_all)
+        for field, op, values in predicates:
+            if field not in dataset.column_names:
+                raise ValueError(f"Field '{field}' does not exist.")
+            # Like the query index, predicates on numeric columns compare numbers, except prefix.
+            column_type = dataset.column_types.get(field)
+            numeric = column_type is not None and column_type.is_numeric and op != "prefix"
+            conditions.append((field, op, numeric, self._xpath_values(field, op, values, numeric)))
+
+        if not matchable:
+            return []
+        if not conditions:
+            return root.findall(ROW_TAG) if match_all and not filters else []
+
+        # All conditions in one expression: a single pass over the rows, however many filters there are.
+        shape = tuple((field, op, numeric, len(values)) for field, op, numeric, values in conditions)
+        values = [value for _, _, _, condition_values in conditions for value in condition_values]
+        return self._compiled(shape)(root, **{f"v{i}": value for i, value in enumerate(values)})
+
+    def _filter_conditions(self, dataset: PublishedDataset, root, filters: Dict[str, str], match_all: bool = False) -> Tuple[list, bool]:
+        # (conditions, whether any row can match). Filters on unknown fields are ignored with a warning; a value the
+        # column does not have is ignored too, except in aggregates (match_all), where it matches no row. Values are
+        # looked up in the dataset's query index (a binary search in its dictionary) instead of scanning the document.
+        index: Optional[ColumnarIndex] = self.servicer.catalog.index_for(dataset)
+        conditions = []
+        warnings = []
+        matchable = True
+
+        for field, value in filters.items():
+            safe_field = field.replace(' ', '_')
+
+            if safe_field not in dataset.column_names:
+                 warnings.append(f"Field '{field}' does not exist and was ignored.")
+                 continue
+
+            # The raw value is bound as an XPath variable, so quotes in it need no escaping.
+            if index is not None:
+                found = index.has_value(safe_field, value)
+            else:
+                found = bool(self._compiled(((safe_field, "eq", False, 1),))(root, v0=value))
+            if not found:
+                 if match_all:
+                     warnings.append(f"Value '{value}' for field '{field}' not found; no rows match.")
+                     matchable = False
+                 else:
+                     warnings.append(f"Value '{value}' for field '{field}' not found and was ignored.")
+                 continue
+
+            conditions.append((safe_field, "eq", False, [value]))
+
+        for w in warnings:
+            logging.warning(f"[Query Warning] {w}")
+        return conditions, matchable
+
+    def _compiled(self, shape: tuple) -> etree.XPath:
+        # shape: (field, operator, numeric, number of values) per condition; values are bound to $v0, $v1, ... when evaluated.
+        with self._xpaths_lock:
+            xpath = self._xpaths.get(shape)
+            if xpath is not None:
+                self._xpaths.move_to_end(shape)
+                return xpath
+
+        names = (f"$v{i}" for i in count())
+        conditions = [
+            self._condition_xpath(field, op, numeric, [next(names) for _ in range(arity)])
+            for field, op, numeric, arity in shape
+        ]
+        xpath = etree.XPath(
+            f"./{ROW_TAG}[" + " and ".join(conditions) + "]",
+            namespaces={"ev": XPATH_NAMESPACE},
+            extensions={(XPATH_NAMESPACE, "number"): _xpath_number, (XPATH_NAMESPACE, "compare"): _xpath_compare},
+        )
+
+        with self._xpaths_lock:
+            self._xpaths[shape] = xpath
+            while len(self._xpaths) > XPATH_CACHE_SIZE:
+                self._xpaths.popitem(last=False)
+        return xpath
+
+    def _xpath_values(self, field: str, op: str, values: list, numeric: bool) -> list:
+        arity = PREDICATE_ARITY.get(op, 0)
+        if (arity is None and not values) or (arity is not None and len(values) != arity):
+            raise ValueError(f"Operator '{op}' on field '{field}' got {len(values)} values.")
+
+        if op not in PREDICATE_ARITY:
+            raise ValueError(f"Unsupported operator '{op}'.")
+        if numeric:
+            numbers = [parse_number(value) if isinstance(value, str) else float(value) for value in values]
+            for value, number in zip(values, numbers):
+                if number is None:
+                    raise ValueError(f"Value '{value}' is not a number for field '{field}'.")
+            return numbers
+        return [("true" if value else "false") if isinstance(value, bool) else str(value) for value in values]
+
+    def _condition_xpath(self, field: str, op: str, numeric: bool, names: List[str]) -> str:
+        # field is a known column name; values are only ever XPath variables, never interpolated.
+        comparisons = {"lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+        cell = f"ev:number({field})" if numeric else field
+        if op == "eq":
+            return f"{cell}={names[0]}"
+        if op == "ne":
+            return f"{cell}!={names[0]}"
+        if op == "in":
+            return "(" + " or ".join(f"{cell}={name}" for name in names) + ")"
+        if op == "prefix":
+            return f"starts-with({field}, {names[0]})"
+        if op in comparisons:
+            if not numeric:
+                return f"ev:compare({field}, {names[0]}){comparisons[op]}0"
+            return f"{cell}{comparisons[op]}{names[0]}"
+        if op == "between":
+            if not numeric:
+                return f"ev:compare({field}, {names[0]})>=0 and ev:compare({field}, {names[1]})<=0"
+            return f"{cell}>={names[0]} and {cell}<={names[1]}"
+        raise ValueError(f"Unsupported operator '{op}'.")
+
+class PostgresBackend(QueryBackend):
+    name = "postgres"
+
+    def __init__(self, servicer):
+        super().__init__(servicer)
+        # table -> (published version the columns were read for, columns)
+        self._columns: Dict[str, Tuple[int, List[Tuple[str, str]]]] = {}
+
+    def _table_columns(self, conn, dataset: PublishedDataset) -> List[Tuple[str, str]]:
+        table_name = dataset.table_name
+        cached = self._columns.get(table_name)
+        if cached is None or cached[0] != dataset.version:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT column_name, data_type FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = %s AND column_name <> 'id' "
+                    "ORDER BY ordinal_position",
+                    (table_name,),
+                )
+                columns = cur.fetchall()
+            if not columns:
+                raise BackendUnavailable(f"Table '{table_name}' not found.")
+            self._columns[table_name] = (dataset.version, columns)
+            return columns
+        return cached[1]
+
+    def find_rows(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                  fields: Optional[List[str]] = None, offset: int = 0, limit: int = 0) -> Iterator[str]:
+        return self._select(dataset, filters, predicates, fields, offset, limit, row_xml)
+
+    def find_records(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                     fields: Optional[List[str]] = None, offset: int = 0, limit: int = 0) -> Iterator[Tuple[str, ...]]:
+        return self._select(dataset, filters, predicates, fields, offset, limit, row_texts)
+
+    def _select(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                fields: Optional[List[str]], offset: int, limit: int, make_row) -> Iterator:
+        table_name = dataset.table_name
+        with db_pool.connection() as conn:
+            columns = self._table_columns(conn, dataset)
+        column_types = dict(columns)
+        for name in fields or []:
+            if name not in column_types:
+                raise ValueError(f"Field '{name}' does not exist.")
+        where, params = self._where_clause(table_name, column_types, filters, predicates)
+
+        if not where:
+            return iter(())
+
+        column_names = fields or [name for name, _ in columns]
+        select_list = ", ".join(f'"{name}"' for name in column_names)
+        sql = f'SELECT {select_list} FROM "{table_name}" WHERE {" AND ".join(where)} ORDER BY id'
+        # The database stops after the page instead of sending every match.
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+        if offset:
+            sql += " OFFSET %s"
+            params.append(offset)
+        return self._stream(sql, params, column_names, make_row)
+
+    def aggregate(self, dataset: PublishedDataset, filters: Dict[str, str], predicates: List[Predicate],
+                  group_by: List[str], aggregations: List[Aggregation]) -> List[AggregateRow]:
+        # Pushed down: only one row per group leaves the database.
+        table_name = dataset.table_name
+        with db_pool.connection() as conn:
+            column_types = dict(self._table_columns(conn, dataset))
+            for name in group_by:
+                if name not in column_types:
+                    raise ValueError(f"Field '{name}' does not exist.")
+            numeric = {name for name, data_type in column_types.items() if data_type in NUMERIC_TYPES}
+            check_aggregations(aggregations, numeric, column_types)
+            where, params = self._where_clause(table_name, column_types, filters, predicates, match_all=True)
+            if filters and not where:
+                # Every filter named an unknown field: no rows match, as in the other backends.
+                where = ["FALSE"]
+
+            select_list = [f'COALESCE("{name}"::text, \'\')' for name in group_by]
+            for function, field in aggregations:
+                if not field:
+                    select_list.append("COUNT(*)")
+                elif function == "count":
+                    # Empty text cells are stored as '', which the in-memory backends do not count either.
+                    select_list.append(f'COUNT(NULLIF("{field}"::text, \'\'))')
+                else:
+                    select_list.append(f'{function.upper()}("{field}")::float8')
+
+            sql = f'SELECT {", ".join(select_list)} FROM "{table_name}"'
+            if where:
+                sql += f' WHERE {" AND ".join(where)}'
+            if group_by:
+                positions = ", ".join(str(i + 1) for i in range(len(group_by)))
+                sql += f" GROUP BY {positions} ORDER BY {positions}"
+
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                result = cur.fetchall()
+
+        width = len(group_by)
+        return [
+            (list(row[:width]), [float("nan") if value is None else float(value) for value in row[width:]])
+            for row in result
+        ]
+
+    def _stream(self, sql: str, params: list, column_names: List[str], make_row) -> Iterator:
+        # Named cursor: rows stay on the server and arrive QUERY_FETCH_SIZE at a time. The connection is
+        # borrowed in here: closing a generator that never started runs none of its code, so one borrowed
+        # by the caller would never be released.
+        conn = db_pool.borrow()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL idle_in_transaction_session_timeout = %s", (f"{QUERY_STREAM_IDLE_TIMEOUT_MS}ms",))
+            with conn.cursor(name="sales_query") as cur:
+                cur.itersize = QUERY_FETCH_SIZE
+                cur.execute(sql, params)
+                for values in cur:
+                    yield make_row(column_names, values)
+            conn.commit()
+        finally:
+            if not conn.closed:
+                conn.rollback()
+            db_pool.release(conn)
+
+    def _where_clause(self, table_name: str, column_types: Dict[str, str], filters: Dict[str, str], predicates: List[Predicate],
+                      match_all: bool = False):
+        where = []
+        params = []
+        warnings = []
+
+        for field, value in filters.items():
+            safe_field = field.replace(' ', '_')
+            if safe_field not in column_types:
+                warnings.append(f"Field '{field}' does not exist and was ignored.")
+                continue
+
+            key = self._coerce(safe_field, column_types[safe_field], value)
+            if match_all:
+                where.append(f'"{safe_field}" = %s')
+                params.append(key)
+            else:
+                # Ignored when the column does not have the value, as in the other backends. The subquery is
+                # uncorrelated, so Postgres runs it once per query, not once per row.
+                where.append(f'("{safe_field}" = %s OR NOT EXISTS (SELECT 1 FROM "{table_name}" WHERE "{safe_field}" = %s))')
+                params.extend([key, key])
+
+        for w in warnings:
+            logging.warning(f"[Query Warning] {w}")
+
+        comparisons = {"eq": "=", "ne": "<>", "lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+        for field, op, values in predicates:
+            if field not in column_types:
+                raise ValueError(f"Field '{field}' does not exist.")
+            arity = PREDICATE_ARITY.get(op, 0)
+            if (arity is None and not values) or (arity is not None and len(values) != arity):
+                raise ValueError(f"Operator '{op}' on field '{field}' got {len(values)} values.")
+
+            if op == "prefix":
+                prefix = str(values[0]).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                where.append(f'"{field}"::text LIKE %s')
+                params.append(prefix + "%")
+                continue
+
+            keys = [self._coerce(field, column_types[field], value) for value in values]
+            if op in comparisons:
+                where.append(f'"{field}" {comparisons[op]} %s')
+                params.append(keys[0])
+            elif op == "between":
+                where.append(f'"{field}" BETWEEN %s AND %s')
+                params.extend(keys)
+            elif op == "in":
+                where.append(f'"{field}" = ANY(%s)')
+                params.append(keys)
+            else:
+                raise ValueError(f"Unsupported operator '{op}'.")
+
+        return where, params
+
+    def _coerce(self, field: str, data_type: str, value):
+        if data_type in NUMERIC_TYPES:
+            number = parse_number(value) if isinstance(value, str) else value
+            if number is None:
+                raise ValueError(f"Value '{value}' is not a number for numeric field '{field}'.")
+            return number
+        if data_type == "boolean":
+            return value if isinstance(value, bool) else str(value).lower() == "true"
+        return str(value)
+
+    def invalidate(self, table_name: str):
+        self._columns.pop(table_name, None)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (MemoryIndexBackend, XMLBackend, PostgresBackend)
+}
+
+
+def make_backend(name: str, servicer):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown query backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    logging.info(f"[Info] Query backend: {name}")
+    return BACKENDS[name](servicer)
@@ -0,0 +1,345 @@
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+import logging
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+from aggregation import Aggregation, aggregate_rows, check_aggregations, column_values, group_aggregate
+from type_inference import ColumnType, parse_number, parse_numeric_series
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+ROW_TAG = "row"
+# Rows decoded per vectorized lookup when iterating rows.
+ROW_BLOCK = 4096
+# Number of values each operator takes; None means one or more.
+PREDICATE_ARITY = {
+    "eq": 1, "ne": 1, "lt": 1, "le": 1, "gt": 1, "ge": 1,
+    "between": 2, "in": None, "prefix": 1,
+}
+
+
+def encode_strings(values) -> Tuple[np.ndarray, np.ndarray]:
+    # (offsets, utf-8 bytes): entry i is data[offsets[i]:offsets[i + 1]]. Unlike a fixed-width "<U" array,
+    # one long value does not widen every other entry.
+    encoded = [str(value).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def encode_column(values) -> Tuple[np.ndarray, np.ndarray]:
+    # (sorted distinct values, int32 code per value), as np.unique(return_inverse=True) but hashing first,
+    # so only the distinct values are sorted rather than every row.
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    # sorted() compares str directly; np.argsort on an object array goes through generic comparisons.
+    order = np.fromiter(sorted(range(len(uniques)), key=uniques.__getitem__), dtype=np.int64, count=len(uniques))
+    ranks = np.empty(len(order), dtype=np.int32)
+    ranks[order] = np.arange(len(order), dtype=np.int32)
+    return uniques[order], ranks[codes]
+
+
+def merge_encoded(parts: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    # Concatenates encoded pieces of one column (e.g. CSV shards). Encoding the pieces' dictionaries back
+    # to back gives the merged dictionary plus, per piece, the new code of each old code.
+    dictionary, remap = encode_column(np.concatenate([part_dictionary for part_dictionary, _ in parts]))
+    codes, start = [], 0
+    for part_dictionary, part_codes in parts:
+        codes.append(remap[start:start + len(part_dictionary)][part_codes])
+        start += len(part_dictionary)
+    return dictionary, np.concatenate(codes)
+
+
+def decode_strings(offsets: np.ndarray, data: np.ndarray) -> np.ndarray:
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    return np.array([raw[start:end].decode("utf-8") for start, end in zip(bounds[:-1], bounds[1:])], dtype=object)
+
+
+class ColumnarIndex:
+    # Read-only once built: the servicer swaps whole instances, never mutates one.
+
+    def __init__(self, columns: Dict[str, List[str]], column_types: Optional[Dict[str, ColumnType]] = None):
+        self.column_names = list(columns.keys())
+        self.column_types = column_types or {}
+        self.row_count = len(next(iter(columns.values()))) if columns else 0
+
+        self._dictionaries: Dict[str, np.ndarray] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        self._order: Dict[str, np.ndarray] = {}
+        self._bounds: Dict[str, np.ndarray] = {}
+        self._sorted_numbers: Dict[str, np.ndarray] = {}
+        self._sorted_number_rows: Dict[str, np.ndarray] = {}
+        # Derived lazily for aggregation, one float per dictionary entry; not part of snapshots.
+        self._code_values: Dict[str, np.ndarray] = {}
+        self._string_bytes: Optional[int] = None
+
+        for name, values in columns.items():
+            if len(values) != self.row_count:
+                raise ValueError(f"Column '{name}' has {len(values)} values, expected {self.row_count}.")
+            self._add_column(name, *encode_column(values))
+
+    def _add_column(self, name: str, dictionary: np.ndarray, codes: np.ndarray):
+        order = np.argsort(codes, kind="stable").astype(np.int32)
+        counts = np.bincount(codes, minlength=len(dictionary))
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+
+        self._dictionaries[name] = dictionary
+        self._codes[name] = codes
+        self._order[name] = order
+        self._bounds[name] = bounds
+        if self.is_numeric(name):
+            # Each distinct text is parsed once; rows take their number by code.
+            self._sort_numeric_column(name, parse_numeric_series(dictionary)[codes])
+
+    def _sort_numeric_column(self, name: str, numbers: np.ndarray):
+        order = np.argsort(numbers, kind="stable").astype(np.int32)
+        valid = int(np.count_nonzero(~np.isnan(numbers)))
+        # NaN (empty/unparseable) sorts last; keep only the comparable prefix.
+        self._sorted_numbers[name] = numbers[order[:valid]]
+        self._sorted_number_rows[name] = order[:valid]
+
+    @classmethod
+    def from_xml(cls, xml_path: Path, column_names: List[str], column_types: Optional[Dict[str, ColumnType]] = None) -> "ColumnarIndex":
+        columns: Dict[str, List[str]] = {name: [] for name in column_names}
+
+        for _, row in etree.iterparse(str(xml_path), events=("end",), tag=ROW_TAG):
+            for name in column_names:
+                columns[name].append(row.findtext(name) or "")
+            row.clear()
+            while row.getprevious() is not None:
+                del row.getparent()[0]
+
+        index = cls(columns, column_types)
+        logging.info(f"[Info] Query index built: {index.row_count} rows, {len(column_names)} columns.")
+        return index
+
+    @classmethod
+    def from_encoded(cls, columns: Dict[str, Tuple[np.ndarray, np.ndarray]], column_types: Optional[Dict[str, ColumnType]] = None) -> "ColumnarIndex":
+        # Columns already dictionary-encoded as (sorted dictionary, codes), e.g. by encode_column() or merge_encoded().
+        index = cls({}, column_types)
+        index.column_names = list(columns.keys())
+        index.row_count = len(next(iter(columns.values()))[1]) if columns else 0
+        for name, (dictionary, codes) in columns.items():
+            if len(codes) != index.row_count:
+                raise ValueError(f"Column '{name}' has {len(codes)} values, expected {index.row_count}.")
+            index._add_column(name, dictionary, codes)
+        return index
+
+    # Arrays that make up one column; to_arrays()/from_arrays() round-trip them for snapshots.
+    ARRAY_KINDS = ("dictionary_offsets", "dictionary_bytes", "codes", "order", "bounds", "sorted_numbers", "sorted_number_rows")
+
+    def to_arrays(self) -> Dict[str, Dict[str, np.ndarray]]:
+        arrays = {}
+        for name in self.column_names:
+            offsets, data = encode_strings(self._dictionaries[name])
+            arrays[name] = {
+                "dictionary_offsets": offsets,
+                "dictionary_bytes": data,
+                "codes": self._codes[name],
+                "order": self._order[name],
+                "bounds": self._bounds[name],
+            }
+            if name in self._sorted_numbers:
+                arrays[name]["sorted_numbers"] = self._sorted_numbers[name]
+                arrays[name]["sorted_number_rows"] = self._sorted_number_rows[name]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, column_names: List[str], column_types: Dict[str, ColumnType], row_count: int,
+                    arrays: Dict[str, Dict[str, np.ndarray]]) -> "ColumnarIndex":
+        # No re-encoding: the arrays (possibly memory-mapped) are used as they are; only dictionaries are decoded.
+        index = cls({}, column_types)
+        index.column_names = list(column_names)
+        index.row_count = row_count
+        for name in column_names:
+            column = arrays[name]
+            index._dictionaries[name] = decode_strings(column["dictionary_offsets"], column["dictionary_bytes"])
+            index._codes[name] = column["codes"]
+            index._order[name] = column["order"]
+            index._bounds[name] = column["bounds"]
+            if "sorted_numbers" in column:
+                index._sorted_numbers[name] = column["sorted_numbers"]
+                index._sorted_number_rows[name] = column["sorted_number_rows"]
+        return index
+
+    @property
+    def nbytes(self) -> int:
+        # Dictionaries are object arrays: their nbytes only counts the pointers, so the str objects are added.
+        if self._string_bytes is None:
+            self._string_bytes = sum(sys.getsizeof(value) for dictionary in self._dictionaries.values() for value in dictionary)
+        arrays = (self._dictionaries, self._codes, self._order, self._bounds, self._sorted_numbers, self._sorted_number_rows, self._code_values)
+        return self._string_bytes + sum(array.nbytes for group in arrays for array in group.values())
+
+    def has_column(self, name: str) -> bool:
+        return name in self._dictionaries
+
+    def _code(self, name: str, value: str) -> Optional[int]:
+        # The dictionary is sorted, so a value is found by binary search.
+        dictionary = self._dictionaries[name]
+        i = int(np.searchsorted(dictionary, value))
+        if i < len(dictionary) and dictionary[i] == value:
+            return i
+        return None
+
+    def _posting(self, name: str, value: str) -> np.ndarray:
+        code = self._code(name, value)
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        bounds = self._bounds[name]
+        return self._order[name][bounds[code]:bounds[code + 1]]
+
+    def has_value(self, name: str, value: str) -> bool:
+        return self.has_column(name) and self._code(name, value) is not None
+
+    def is_numeric(self, name: str) -> bool:
+        column_type = self.column_types.get(name)
+        return column_type is not None and column_type.is_numeric
+
+    def cardinality(self, name: str) -> int:
+        return len(self._dictionaries[name])
+
+    def lookup(self, conditions: Iterable[Tuple[str, str]]) -> np.ndarray:
+        postings = sorted((self._posting(name, value) for name, value in conditions), key=len)
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+
+        result = postings[0]
+        for other in postings[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def _coerce(self, name: str, value):
+        if self.is_numeric(name):
+            if isinstance(value, str):
+                number = parse_number(value)
+                if number is None:
+                    raise ValueError(f"Value '{value}' is not a number for numeric field '{name}'.")
+                return number
+            return float(value)
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return str(value)
+
+    def _rows_between(self, name: str, low, high, low_inclusive: bool = True, high_inclusive: bool = True) -> np.ndarray:
+        # Rows whose value lies in [low, high] (either bound may be None) in O(log n + k).
+        if self.is_numeric(name):
+            keys, rows = self._sorted_numbers[name], self._sorted_number_rows[name]
+        else:
+            keys, bounds = self._dictionaries[name], self._bounds[name]
+
+        start = 0 if low is None else np.searchsorted(keys, low, side="left" if low_inclusive else "right")
+        end = len(keys) if high is None else np.searchsorted(keys, high, side="right" if high_inclusive else "left")
+        if start >= end:
+            return np.empty(0, dtype=np.int32)
+
+        if self.is_numeric(name):
+            return np.sort(rows[start:end])
+        return np.sort(self._order[name][bounds[start]:bounds[end]])
+
+    def _rows_with_prefix(self, name: str, prefix: str) -> np.ndarray:
+        dictionary, bounds = self._dictionaries[name], self._bounds[name]
+        start = np.searchsorted(dictionary, prefix, side="left")
+        end = np.searchsorted(dictionary, prefix + "\U0010ffff", side="left")
+        if start >= end:
+            return np.empty(0, dtype=np.int32)
+        return np.sort(self._order[name][bounds[start]:bounds[end]])
+
+    def evaluate(self, name: str, op: str, values: list) -> np.ndarray:
+        if not self.has_column(name):
+            raise ValueError(f"Field '{name}' does not exist.")
+        if op not in PREDICATE_ARITY:
+            raise ValueError(f"Unsupported operator '{op}'.")
+        arity = PREDICATE_ARITY[op]
+        if (arity is None and not values) or (arity is not None and len(values) != arity):
+            raise ValueError(f"Operator '{op}' on field '{name}' got {len(values)} values.")
+
+        if op == "prefix":
+            return self._rows_with_prefix(name, str(values[0]))
+
+        keys = [self._coerce(name, value) for value in values]
+
+        if op == "eq":
+            return self._rows_between(name, keys[0], keys[0])
+        if op == "ne":
+            return np.setdiff1d(np.arange(self.row_count, dtype=np.int32), self._rows_between(name, keys[0], keys[0]), assume_unique=True)
+        if op == "lt":
+            return self._rows_between(name, None, keys[0], high_inclusive=False)
+        if op == "le":
+            return self._rows_between(name, None, keys[0])
+        if op == "gt":
+            return self._rows_between(name, keys[0], None, low_inclusive=False)
+        if op == "ge":
+            return self._rows_between(name, keys[0], None)
+        if op == "between":
+            return self._rows_between(name, keys[0], keys[1])
+        return np.unique(np.concatenate([self._rows_between(name, key, key) for key in keys]))
+
+    def select(self, predicates: Iterable[Tuple[str, str, list]], row_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        # AND of all predicates, optionally narrowed further by an existing row-id set.
+        results = [self.evaluate(name, op, values) for name, op, values in predicates]
+        if row_ids is not None:
+            results.append(row_ids)
+        if not results:
+            return np.empty(0, dtype=np.int32)
+
+        results.sort(key=len)
+        result = results[0]
+        for other in results[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def _values(self, name: str, row_ids: np.ndarray) -> np.ndarray:
+        code_values = self._code_values.get(name)
+        if code_values is None:
+            code_values = column_values(self._dictionaries[name], self.is_numeric(name))
+            self._code_values[name] = code_values
+        return code_values[self._codes[name][row_ids]]
+
+    def aggregate(self, row_ids: np.ndarray, group_by: List[str], aggregations: List[Aggregation]) -> List[Tuple[List[str], List[float]]]:
+        # Group-by straight on the dictionary codes: no row is decoded, only each group's labels.
+        for name in group_by:
+            if not self.has_column(name):
+                raise ValueError(f"Field '{name}' does not exist.")
+        numeric = {name for name in self.column_names if self.is_numeric(name)}
+        check_aggregations(aggregations, numeric, self.column_names)
+
+        keys = [self._codes[name][row_ids] for name in group_by]
+        values = {field: self._values(field, row_ids) for _, field in aggregations if field}
+        group_codes, results = group_aggregate(keys, len(row_ids), aggregations, values)
+        return aggregate_rows(group_codes, [self._dictionaries[name] for name in group_by], results)
+
+    def value(self, name: str, row_id: int) -> str:
+        return self._dictionaries[name][self._codes[name][row_id]]
+
+    def iter_rows(self, row_ids: np.ndarray, column_names: Optional[List[str]] = None) -> Iterator[Tuple[str, ...]]:
+        # One tuple of cell texts per row, decoded a block at a time; rows are still produced lazily.
+        column_names = column_names or self.column_names
+        for start in range(0, len(row_ids), ROW_BLOCK):
+            block = row_ids[start:start + ROW_BLOCK]
+            columns = [self._dictionaries[name][self._codes[name][block]].tolist() for name in column_names]
+            yield from zip(*columns)
+
+    def row_to_xml(self, row_id: int, column_names: Optional[List[str]] = None) -> str:
+        parts = [f"<{ROW_TAG}>"]
+        for name in column_names or self.column_names:
+            text = self.value(name, row_id)
+            if text:
+                parts.append(f"<{name}>{escape(text)}</{name}>")
+            else:
+                parts.append(f"<{name}/>")
+        parts.append(f"</{ROW_TAG}>")
+        return "".join(parts)
+
+    def iter_rows_xml(self, row_ids: Iterable[int], column_names: Optional[List[str]] = None) -> Iterator[str]:
+        for row_id in row_ids:
+            yield self.row_to_xml(row_id, column_names)
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", 64))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 1024))
+# Seconds an entry may be served; 0 keeps entries until evicted or invalidated.
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 300))
+# A single reply larger than this share of the budget is not cached: it would evict everything else.
+RESULT_CACHE_MAX_ITEM_FRACTION = float(os.getenv("RESULT_CACHE_MAX_ITEM_FRACTION", 0.25))
+
+
+class ResultCache:
+    # LRU of finished replies, bounded by total bytes and by entry count, with an optional TTL.
+
+    def __init__(self, max_bytes: int = int(RESULT_CACHE_MAX_MB * 1024 * 1024), max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 ttl: float = RESULT_CACHE_TTL, max_item_fraction: float = RESULT_CACHE_MAX_ITEM_FRACTION):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_item_bytes = int(max_bytes * max_item_fraction)
+        self.bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "too_large": 0}
+        # key -> (expires_at, value, size)
+        self._entries: "OrderedDict[Hashable, Tuple[float, object, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[object]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            expires_at, value, size = entry
+            if expires_at and expires_at < time.monotonic():
+                self._drop(key, size)
+                self.counters["expirations"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: object, size: int):
+        if size > self.max_item_bytes:
+            with self._lock:
+                self.counters["too_large"] += 1
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0.0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._entries[key] = (expires_at, value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                old_key, (_, _, old_size) = next(iter(self._entries.items()))
+                self._drop(old_key, old_size)
+                self.counters["evictions"] += 1
+
+    def _drop(self, key: Hashable, size: int):
+        del self._entries[key]
+        self.bytes -= size
+
+    def invalidate(self, match: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if match(key)]
+            for key in keys:
+                self._drop(key, self._entries[key][2])
+            self.counters["invalidations"] += len(keys)
+        return len(keys)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hit_ratio": self.counters["hits"] / lookups if lookups else 0.0,
+            }
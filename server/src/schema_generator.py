@@ -1,5 +1,12 @@
+import copy
+import hashlib
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Dict, List, Optional
 import xml.etree.ElementTree as ET
+from lxml import etree
 import xmlschema
 import logging
 
@@ -8,6 +15,18 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 DATA_DIR = Path("/app/data")
 XML_PATH = DATA_DIR / "output.xml"
 XSD_PATH = DATA_DIR / "output.xsd"
+XS_NS = "http://www.w3.org/2001/XMLSchema"
+ROOT_TAG = "dataset"
+ROW_TAG = "row"
+
+# "xmlschema" (pure Python, original), "lxml" (compiled, whole document) or "lxml-stream" (compiled, row by row).
+VALIDATION_ENGINE = os.getenv("VALIDATION_ENGINE", "lxml-stream")
+VALIDATION_MAX_ERRORS = int(os.getenv("VALIDATION_MAX_ERRORS", 10))
+# Compiled schemas kept, keyed by the XSD's sha256 only (not its bytes), least recently used first.
+SCHEMA_CACHE_SIZE = int(os.getenv("SCHEMA_CACHE_SIZE", 8))
+
+_schemas: "OrderedDict[str, tuple]" = OrderedDict()
+_schemas_lock = threading.Lock()
 
 
 def indent(elem, level=0):
@@ -23,20 +42,39 @@ def indent(elem, level=0):
         if level and (not elem.tail or not elem.tail.strip()):
             elem.tail = i
 
-def generate_xsd_from_xml():
-    try:
-        if not XML_PATH.exists():
-            logging.error(f"Cannot generate XSD: XML file not found at {XML_PATH}")
-            return False
-            
-        tree = ET.parse(str(XML_PATH))
-        root = tree.getroot() 
-        row = root.find("row") 
-        
-        if row is None:
-            logging.error("XML does not contain generic <row> elements. Cannot generate XSD.")
-            return False
+def add_typed_element(parent, name: str, column_type=None):
+    if column_type is None:
+        return ET.SubElement(parent, "xs:element", name=name, type="xs:string")
+
+    # Empty cells need a union when the type rejects "": any non-string type, and patterned strings
+    # (locale numbers, booleans), whose pattern does not match "".
+    nullable = column_type.nullable and (column_type.xsd_type != "xs:string" or column_type.xsd_pattern is not None)
+    if column_type.xsd_pattern is None and not nullable:
+        return ET.SubElement(parent, "xs:element", name=name, type=column_type.xsd_type)
+
+    element = ET.SubElement(parent, "xs:element", name=name)
+    simple_type = ET.SubElement(element, "xs:simpleType")
+
+    if nullable:
+        union = ET.SubElement(simple_type, "xs:union")
+        value_type = ET.SubElement(union, "xs:simpleType")
+        empty_type = ET.SubElement(union, "xs:simpleType")
+        empty_restriction = ET.SubElement(empty_type, "xs:restriction", base="xs:string")
+        ET.SubElement(empty_restriction, "xs:length", value="0")
+    else:
+        value_type = simple_type
+
+    if column_type.xsd_pattern is not None:
+        restriction = ET.SubElement(value_type, "xs:restriction", base="xs:token")
+        ET.SubElement(restriction, "xs:pattern", value=column_type.xsd_pattern)
+    else:
+        ET.SubElement(value_type, "xs:restriction", base=column_type.xsd_type)
+    return element
+
 
+def generate_xsd(column_names: List[str], column_types: Optional[Dict] = None, xsd_path: Path = XSD_PATH):
+    # The schema only needs the column names, in row order, and their types; no XML has to be read.
+    try:
         xs = "http://www.w3.org/2001/XMLSchema"
 
         schema = ET.Element("xs:schema", attrib={
@@ -58,17 +96,15 @@ def generate_xsd_from_xml():
         row_complex = ET.SubElement(row_element, "xs:complexType")
         row_sequence = ET.SubElement(row_complex, "xs:sequence")
 
-        for child in row:
-            name = child.tag
-            xsd_type = "xs:string" 
-            ET.SubElement(row_sequence, "xs:element", name=name, type=xsd_type)
+        for name in column_names:
+            add_typed_element(row_sequence, name, (column_types or {}).get(name))
 
         indent(schema)
         
         tree_xsd = ET.ElementTree(schema)
-        tree_xsd.write(str(XSD_PATH), encoding="utf-8", xml_declaration=True)
+        tree_xsd.write(str(xsd_path), encoding="utf-8", xml_declaration=True)
         
-        logging.info(f"XSD created dynamically: {XSD_PATH}")
+        logging.info(f"XSD created dynamically: {xsd_path}")
         return True
         
     except Exception as e:
@@ -76,21 +112,162 @@ def generate_xsd_from_xml():
         return False
 
 
-def validate_xml_with_xsd() -> bool:
-    if not XSD_PATH.exists():
+def first_row_columns(xml_path: Path = XML_PATH) -> Optional[List[str]]:
+    # Child tags of the first <row>; iterparse stops there, so only the start of the document is read.
+    with open(xml_path, "rb") as f:
+        for _, row in etree.iterparse(f, events=("end",), tag=ROW_TAG):
+            return [child.tag for child in row]
+    return None
+
+
+def generate_xsd_from_xml(column_types: Optional[Dict] = None, xml_path: Path = XML_PATH, xsd_path: Path = XSD_PATH):
+    try:
+        if not xml_path.exists():
+            logging.error(f"Cannot generate XSD: XML file not found at {xml_path}")
+            return False
+
+        column_names = first_row_columns(xml_path)
+        if column_names is None:
+            logging.error("XML does not contain generic <row> elements. Cannot generate XSD.")
+            return False
+    except Exception as e:
+        logging.error(f"Error during XSD generation: {e}")
+        return False
+
+    return generate_xsd(column_names, column_types, xsd_path)
+
+
+def _compile_schemas(xsd_hash: str, xsd_bytes: bytes):
+    xsd_doc = etree.fromstring(xsd_bytes)
+    full_schema = etree.XMLSchema(xsd_doc)
+
+    row_decl = xsd_doc.find(f".//{{{XS_NS}}}element[@name='{ROW_TAG}']")
+    row_schema = None
+    if row_decl is not None:
+        row_doc = etree.Element(xsd_doc.tag, nsmap=xsd_doc.nsmap, attrib=dict(xsd_doc.attrib))
+        row_copy = copy.deepcopy(row_decl)
+        for attr in ("minOccurs", "maxOccurs"):
+            row_copy.attrib.pop(attr, None)
+        row_doc.append(row_copy)
+        row_schema = etree.XMLSchema(row_doc)
+
+    logging.info(f"XSD compiled with lxml (sha256={xsd_hash[:12]})")
+    return full_schema, row_schema
+
+
+def load_compiled_schema(xsd_path: Path = XSD_PATH):
+    xsd_bytes = xsd_path.read_bytes()
+    xsd_hash = hashlib.sha256(xsd_bytes).hexdigest()
+    with _schemas_lock:
+        schemas = _schemas.get(xsd_hash)
+        if schemas is not None:
+            _schemas.move_to_end(xsd_hash)
+            return schemas
+
+    schemas = _compile_schemas(xsd_hash, xsd_bytes)
+    with _schemas_lock:
+        _schemas[xsd_hash] = schemas
+        while len(_schemas) > SCHEMA_CACHE_SIZE:
+            _schemas.popitem(last=False)
+    return schemas
+
+
+def validate_xml_rows(xml_path: Path = XML_PATH, xsd_path: Path = XSD_PATH, max_errors: int = VALIDATION_MAX_ERRORS) -> List[str]:
+    full_schema, row_schema = load_compiled_schema(xsd_path)
+    if row_schema is None:
+        return [error.message for error in _full_validation_errors(full_schema, xml_path)][:max_errors]
+
+    errors = []
+    row_number = 0
+    root_checked = False
+
+    for event, elem in etree.iterparse(str(xml_path), events=("start", "end")):
+        if event == "start":
+            if not root_checked:
+                root_checked = True
+                if elem.tag != ROOT_TAG:
+                    errors.append(f"Root element is <{elem.tag}>, expected <{ROOT_TAG}>.")
+            continue
+
+        if elem.tag == ROOT_TAG:
+            continue
+        if elem.getparent() is None or elem.getparent().tag != ROOT_TAG:
+            continue
+
+        row_number += 1
+        if elem.tag != ROW_TAG:
+            errors.append(f"Row {row_number}: unexpected element <{elem.tag}>.")
+        elif not row_schema.validate(elem):
+            error = row_schema.error_log.last_error
+            errors.append(f"Row {row_number} (line {error.line}): {error.message}")
+
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+        if len(errors) >= max_errors:
+            break
+
+    return errors
+
+
+def _full_validation_errors(schema, xml_path: Path):
+    if schema.validate(etree.parse(str(xml_path))):
+        return []
+    return list(schema.error_log)
+
+
+def validate_xml_with_xsd(engine: str = VALIDATION_ENGINE, xml_path: Path = XML_PATH, xsd_path: Path = XSD_PATH) -> bool:
+    if not xsd_path.exists():
         logging.error("[Error] XSD not found for validation. Skipping validation.")
         return False
         
     try:
-        schema = xmlschema.XMLSchema(str(XSD_PATH))
-        is_valid = schema.is_valid(str(XML_PATH))
-        logging.info(f"XML is validated : {is_valid}")
+        if engine == "xmlschema":
+            schema = xmlschema.XMLSchema(str(xsd_path))
+            is_valid = schema.is_valid(str(xml_path))
+        elif engine == "lxml":
+            full_schema, _ = load_compiled_schema(xsd_path)
+            errors = [f"line {e.line}: {e.message}" for e in _full_validation_errors(full_schema, xml_path)]
+            is_valid = not errors
+        else:
+            errors = validate_xml_rows(xml_path, xsd_path)
+            is_valid = not errors
+
+        if engine != "xmlschema":
+            for error in errors[:VALIDATION_MAX_ERRORS]:
+                logging.error(f"[Validation] {error}")
+
+        logging.info(f"XML is validated : {is_valid} (engine={engine})")
         return is_valid
     except Exception as e:
         logging.error(f"Validation failed: {e}")
         return False
 
 
+def validate_columns(columns: dict) -> bool:
+    # Same structural guarantees the generated XSD gives the XML path: every column becomes
+    # a well-formed <row> child element and every row has a value for every column.
+    if not columns:
+        logging.error("[Error] Dataset has no columns.")
+        return False
+
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) != 1:
+        logging.error(f"[Error] Columns have different lengths: {sorted(lengths)}")
+        return False
+
+    for name in columns:
+        try:
+            ET.fromstring(f"<{name}/>")
+        except ET.ParseError:
+            logging.error(f"[Error] Column name '{name}' is not a valid XML element name.")
+            return False
+
+    logging.info(f"Columns are validated : True ({lengths.pop()} rows)")
+    return True
+
+
 if __name__ == "__main__":
     generate_xsd_from_xml() 
     validate_xml_with_xsd()
\ No newline at end of file
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional
+import logging
+
+import numpy as np
+
+from query_index import ColumnarIndex
+from type_inference import ColumnType
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true"
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", 3))
+# Bumped whenever the on-disk layout or the way the index is built changes.
+SNAPSHOT_FORMAT = 2
+LATEST_FILE = "LATEST"
+
+
+def file_sha256(path: Path, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Snapshot:
+    # One loaded dataset on disk: meta.json plus one .npy file per column array,
+    # in a directory named after the source CSV's sha256.
+
+    def __init__(self, path: Path, meta: dict):
+        self.path = path
+        self.meta = meta
+
+    @property
+    def table_name(self) -> str:
+        return self.meta["table_name"]
+
+    @property
+    def row_count(self) -> int:
+        return self.meta["row_count"]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(path.stat().st_size for path in self.path.iterdir())
+
+    @property
+    def source_path(self) -> Path:
+        return Path(self.meta["source_path"])
+
+    def source_unchanged(self) -> bool:
+        # Size + mtime match: trust it without reading the file; otherwise fall back to the hash.
+        try:
+            stat = self.source_path.stat()
+        except FileNotFoundError:
+            return False
+        if stat.st_size == self.meta["source_size"] and stat.st_mtime_ns == self.meta["source_mtime_ns"]:
+            return True
+        return stat.st_size == self.meta["source_size"] and file_sha256(self.source_path) == self.meta["source_sha256"]
+
+    @property
+    def column_types(self) -> Dict[str, ColumnType]:
+        return {name: ColumnType.from_dict(data) for name, data in self.meta["column_types"].items()}
+
+    def load_index(self) -> ColumnarIndex:
+        column_names = self.meta["column_names"]
+        column_types = self.column_types
+        arrays = {}
+        for i, name in enumerate(column_names):
+            arrays[name] = {
+                kind: np.load(self.path / f"{i}.{kind}.npy", mmap_mode="r")
+                for kind in ColumnarIndex.ARRAY_KINDS
+                if (self.path / f"{i}.{kind}.npy").exists()
+            }
+        return ColumnarIndex.from_arrays(column_names, column_types, self.meta["row_count"], arrays)
+
+
+def save_snapshot(index: ColumnarIndex, source_path: Path, table_name: str, snapshot_dir: Path,
+                  source_sha256: Optional[str] = None, version: Optional[int] = None) -> Snapshot:
+    source_sha256 = source_sha256 or file_sha256(source_path)
+    stat = source_path.stat()
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+    final_path = snapshot_dir / source_sha256
+    tmp_path = snapshot_dir / f".{source_sha256}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir()
+
+    # Files are named by column position: column names need not be valid file names.
+    for i, (name, column) in enumerate(index.to_arrays().items()):
+        for kind, array in column.items():
+            np.save(tmp_path / f"{i}.{kind}.npy", np.ascontiguousarray(array), allow_pickle=False)
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "table_name": table_name,
+        "version": version,
+        "source_path": str(source_path),
+        "source_sha256": source_sha256,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "row_count": index.row_count,
+        "column_names": index.column_names,
+        "column_types": {name: index.column_types[name].to_dict() for name in index.column_names if name in index.column_types},
+        "created_at": time.time(),
+    }
+    (tmp_path / "meta.json").write_text(json.dumps(meta, indent=2))
+
+    shutil.rmtree(final_path, ignore_errors=True)
+    os.replace(tmp_path, final_path)
+    _write_latest(snapshot_dir, source_sha256)
+    _prune(snapshot_dir, keep=source_sha256)
+    logging.info(f"[Info] Snapshot saved: {final_path} ({index.row_count} rows, table '{table_name}').")
+    return Snapshot(final_path, meta)
+
+
+def _write_latest(snapshot_dir: Path, name: str):
+    tmp = snapshot_dir / f".{LATEST_FILE}.tmp"
+    tmp.write_text(name)
+    os.replace(tmp, snapshot_dir / LATEST_FILE)
+
+
+def _prune(snapshot_dir: Path, keep: str):
+    snapshots = sorted(
+        (path for path in snapshot_dir.iterdir() if path.is_dir() and not path.name.startswith(".")),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for path in snapshots[SNAPSHOT_KEEP:]:
+        if path.name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_latest_snapshot(snapshot_dir: Path) -> Optional[Snapshot]:
+    try:
+        name = (snapshot_dir / LATEST_FILE).read_text().strip()
+        path = snapshot_dir / name
+        meta = json.loads((path / "meta.json").read_text())
+    except (FileNotFoundError, ValueError) as e:
+        logging.info(f"[Info] No usable snapshot in {snapshot_dir}: {e}")
+        return None
+
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        logging.info(f"[Info] Snapshot {path.name} has format {meta.get('format')}, expected {SNAPSHOT_FORMAT}; ignoring it.")
+        return None
+    return Snapshot(path, meta)
@@ -0,0 +1,299 @@
+import os
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+# Rows inspected per column; 0 scans the whole column (still a single vectorized pass).
+TYPE_INFERENCE_SAMPLE = int(os.getenv("TYPE_INFERENCE_SAMPLE", 0))
+
+BOOLEAN = "boolean"
+INTEGER = "integer"
+FLOAT = "float"
+LOCALE_NUMBER = "locale_number"
+DATE = "date"
+TEXT = "text"
+
+# Checked in this order; the first kind every non-empty value satisfies wins.
+KIND_PRIORITY = [BOOLEAN, INTEGER, FLOAT, LOCALE_NUMBER, DATE]
+
+INTEGER_PATTERN = r"[+\-]?\d+"
+FLOAT_PATTERN = r"[+\-]?(\d+\.?\d*|\.\d+)([eE][+\-]?\d+)?"
+# Decimal comma and/or '.'/',' thousands groups, optional exponent and trailing '%':
+# "35000,00%", "789.999.961.853", "1,00E+09", "2.5".
+LOCALE_NUMBER_PATTERN = r"[+\-]?(\d+|\d{1,3}([.,]\d{3})+)([.,]\d+)?([eE][+\-]?\d+)?%?"
+DATE_PATTERN = r"\d{4}-\d{2}-\d{2}"
+BOOLEAN_VALUES = {"true", "false"}
+
+INT32_MIN, INT32_MAX = -2**31, 2**31 - 1
+INT64_MIN, INT64_MAX = -2**63, 2**63 - 1
+
+
+class ColumnType:
+    def __init__(self, name: str, kind: str, nullable: bool = False, min_value=None, max_value=None):
+        self.name = name
+        self.kind = kind
+        self.nullable = nullable
+        self.min_value = min_value
+        self.max_value = max_value
+
+    @property
+    def is_numeric(self) -> bool:
+        return self.kind in (INTEGER, FLOAT, LOCALE_NUMBER)
+
+    @property
+    def sql_type(self) -> str:
+        if self.kind == INTEGER:
+            if self.min_value is not None and INT32_MIN <= self.min_value and self.max_value <= INT32_MAX:
+                return "INTEGER"
+            if self.min_value is not None and INT64_MIN <= self.min_value and self.max_value <= INT64_MAX:
+                return "BIGINT"
+            return "NUMERIC"
+        if self.kind in (FLOAT, LOCALE_NUMBER):
+            return "NUMERIC"
+        if self.kind == BOOLEAN:
+            return "BOOLEAN"
+        if self.kind == DATE:
+            return "DATE"
+        return "TEXT"
+
+    @property
+    def xsd_type(self) -> str:
+        return {
+            INTEGER: "xs:integer",
+            FLOAT: "xs:double",
+            DATE: "xs:date",
+        }.get(self.kind, "xs:string")
+
+    @property
+    def xsd_pattern(self) -> Optional[str]:
+        if self.kind == LOCALE_NUMBER:
+            return LOCALE_NUMBER_PATTERN
+        if self.kind == BOOLEAN:
+            return "[Tt][Rr][Uu][Ee]|[Ff][Aa][Ll][Ss][Ee]"
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "nullable": self.nullable,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ColumnType":
+        return cls(data["name"], data["kind"], data["nullable"], data["min_value"], data["max_value"])
+
+    def __repr__(self):
+        return f"ColumnType({self.name!r}, {self.kind}, nullable={self.nullable}, sql={self.sql_type})"
+
+
+class TypeInferencer:
+    def __init__(self, column_names: Optional[List[str]] = None, sample_size: int = TYPE_INFERENCE_SAMPLE):
+        self.sample_size = sample_size
+        self.rows_seen = 0
+        self._set_columns(column_names or [])
+
+    def _set_columns(self, column_names: List[str]):
+        self.column_names = list(column_names)
+        self._candidates = {name: set(KIND_PRIORITY) for name in self.column_names}
+        self._non_empty = {name: 0 for name in self.column_names}
+        self._nullable = {name: False for name in self.column_names}
+        self._min: Dict[str, Optional[int]] = {name: None for name in self.column_names}
+        self._max: Dict[str, Optional[int]] = {name: None for name in self.column_names}
+
+    @property
+    def done(self) -> bool:
+        return self.sample_size > 0 and self.rows_seen >= self.sample_size
+
+    def update(self, frame: pd.DataFrame):
+        if self.done:
+            return
+        if not self.column_names and not self.rows_seen:
+            self._set_columns(list(frame.columns))
+        if self.sample_size > 0:
+            frame = frame.iloc[:self.sample_size - self.rows_seen]
+        self.rows_seen += len(frame)
+
+        for name in self.column_names:
+            self._update_column(name, frame[name])
+
+    def update_columns(self, columns: Dict[str, list]):
+        self.update(pd.DataFrame({name: pd.Series(values, dtype=object) for name, values in columns.items()}))
+
+    def _update_column(self, name: str, series: pd.Series):
+        values = series.astype(str).str.strip()
+        empty = values == ""
+        if empty.any():
+            self._nullable[name] = True
+            values = values[~empty]
+        if values.empty:
+            return
+        self._non_empty[name] += len(values)
+
+        candidates = self._candidates[name]
+
+        if BOOLEAN in candidates and not values.str.lower().isin(BOOLEAN_VALUES).all():
+            candidates.discard(BOOLEAN)
+
+        if INTEGER in candidates:
+            if values.str.fullmatch(INTEGER_PATTERN).all():
+                # int64/uint64 when the values fit, float64 beyond that; close enough to pick the SQL width.
+                numbers = pd.to_numeric(values, errors="coerce")
+                low, high = int(numbers.min()), int(numbers.max())
+                self._min[name] = low if self._min[name] is None else min(self._min[name], low)
+                self._max[name] = high if self._max[name] is None else max(self._max[name], high)
+            else:
+                candidates.discard(INTEGER)
+
+        if FLOAT in candidates and not values.str.fullmatch(FLOAT_PATTERN).all():
+            candidates.discard(FLOAT)
+
+        if LOCALE_NUMBER in candidates and not values.str.fullmatch(LOCALE_NUMBER_PATTERN).all():
+            candidates.discard(LOCALE_NUMBER)
+
+        if DATE in candidates:
+            if not values.str.fullmatch(DATE_PATTERN).all() or \
+                    pd.to_datetime(values, format="%Y-%m-%d", errors="coerce").isna().any():
+                candidates.discard(DATE)
+
+    def merge(self, other: "TypeInferencer"):
+        # Combines inferencers that saw disjoint slices of the same columns (e.g. one per CSV shard).
+        if not self.column_names and not self.rows_seen:
+            self._set_columns(other.column_names)
+        self.rows_seen += other.rows_seen
+        for name in self.column_names:
+            self._candidates[name] &= other._candidates[name]
+            self._non_empty[name] += other._non_empty[name]
+            self._nullable[name] = self._nullable[name] or other._nullable[name]
+            lows = [v for v in (self._min[name], other._min[name]) if v is not None]
+            highs = [v for v in (self._max[name], other._max[name]) if v is not None]
+            self._min[name] = min(lows) if lows else None
+            self._max[name] = max(highs) if highs else None
+
+    def result(self) -> Dict[str, ColumnType]:
+        types = {}
+        for name in self.column_names:
+            kind = TEXT
+            if self._non_empty[name]:
+                kind = next((k for k in KIND_PRIORITY if k in self._candidates[name]), TEXT)
+            types[name] = ColumnType(
+                name,
+                kind,
+                nullable=self._nullable[name],
+                min_value=self._min[name] if kind == INTEGER else None,
+                max_value=self._max[name] if kind == INTEGER else None,
+            )
+        logging.info(f"[Info] Inferred column types from {self.rows_seen} rows: "
+                     f"{ {name: t.sql_type for name, t in types.items()} }")
+        return types
+
+
+def infer_column_types(columns: Dict[str, list], sample_size: int = TYPE_INFERENCE_SAMPLE) -> Dict[str, ColumnType]:
+    inferencer = TypeInferencer(list(columns.keys()), sample_size)
+    inferencer.update_columns(columns)
+    return inferencer.result()
+
+
+def normalize_number(text: str) -> str:
+    text = text.strip().rstrip("%")
+    if "," in text:
+        if "." in text and text.rfind(".") > text.rfind(","):
+            return text.replace(",", "")
+        return text.replace(".", "").replace(",", ".")
+    if text.count(".") > 1:
+        return text.replace(".", "")
+    return text
+
+
+def parse_number(text: Optional[str]) -> Optional[float]:
+    if text is None or not text.strip():
+        return None
+    try:
+        return float(normalize_number(text))
+    except ValueError:
+        return None
+
+
+def factorize_text(values) -> Tuple[np.ndarray, pd.Series]:
+    # Dictionary-encodes a column so per-value parsing runs once per distinct value; missing cells become "".
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    uniques = pd.Series(np.append(uniques.astype(object), ""), dtype=object).astype(str)
+    return np.where(codes < 0, len(uniques) - 1, codes), uniques
+
+
+def parse_numeric_series(values) -> np.ndarray:
+    # Vectorized normalize_number(): same separator rules, NaN for empty or unparseable cells.
+    codes, text = factorize_text(values)
+    text = text.str.strip().str.rstrip("%")
+    has_comma = text.str.contains(",", regex=False)
+    english = has_comma & (text.str.rfind(".") > text.str.rfind(","))
+    comma_decimal = has_comma & ~english
+    grouped = ~has_comma & (text.str.count(r"\.") > 1)
+
+    text = text.mask(english, text.str.replace(",", "", regex=False))
+    text = text.mask(comma_decimal, text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    text = text.mask(grouped, text.str.replace(".", "", regex=False))
+
+    # float() on each distinct value: correctly rounded, unlike pandas' fast parser.
+    numbers = np.full(len(text), np.nan)
+    valid = text.str.fullmatch(FLOAT_PATTERN).to_numpy(dtype=bool)
+    numbers[valid] = text[valid].to_numpy(dtype=object).astype(np.float64)
+    return numbers[codes]
+
+
+def convert_text(value: Optional[str], column_type: ColumnType):
+    if column_type.kind == TEXT:
+        return value or ""
+
+    if value is None or not value.strip():
+        return None
+    value = value.strip()
+
+    if column_type.kind == INTEGER:
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    if column_type.kind in (FLOAT, LOCALE_NUMBER):
+        return parse_number(value)
+    if column_type.kind == BOOLEAN:
+        return value.lower() == "true"
+    return value
+
+
+def convert_column(values, column_type: ColumnType) -> pd.Series:
+    # Vectorized convert_text() for a whole column: same results, missing values as NA.
+    if column_type.kind == TEXT:
+        text = pd.Series(np.asarray(values, dtype=object), dtype=object)
+        return text.fillna("") if text.isna().any() else text
+    if column_type.kind in (FLOAT, LOCALE_NUMBER):
+        return pd.Series(parse_numeric_series(values), dtype=np.float64)
+
+    codes, text = factorize_text(values)
+    stripped = text.str.strip()
+
+    if column_type.kind == INTEGER:
+        valid = stripped.str.fullmatch(INTEGER_PATTERN)
+        if column_type.sql_type == "NUMERIC":
+            # Wider than int64: keep the digits as text, Postgres parses them exactly.
+            converted = stripped.where(valid, None)
+        else:
+            numbers = stripped.where(valid, "0").to_numpy(dtype=str).astype(np.int64)
+            converted = pd.Series(pd.array(numbers, dtype="Int64")).mask(~valid.to_numpy())
+    elif column_type.kind == BOOLEAN:
+        converted = pd.Series(pd.array(stripped.str.lower() == "true", dtype="boolean")).mask(stripped == "")
+    else:
+        converted = stripped.where(stripped != "", None)
+    return converted.take(codes).reset_index(drop=True)
+
+
+def convert_columns(columns, column_types: Dict[str, ColumnType]) -> pd.DataFrame:
+    # columns: a DataFrame or a {name: values} dict of CSV text, converted one column at a time.
+    return pd.DataFrame({name: convert_column(columns[name], column_type) for name, column_type in column_types.items()})
@@ -0,0 +1,84 @@
+import codecs
+import csv
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Longest header line accepted; text is only buffered until the first newline, so this bounds that buffer.
+UPLOAD_MAX_HEADER_BYTES = int(os.getenv("UPLOAD_MAX_HEADER_BYTES", 64 * 1024))
+
+
+class UploadRejected(Exception):
+    pass
+
+
+class UploadSpool:
+    # Writes an upload to a temp file in data_dir (same filesystem as its destination) while it streams in,
+    # hashing, counting and checking the CSV text on the fly, then renames it into place.
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self.size = 0
+        self.line_count = 0
+        self.header: Optional[List[str]] = None
+        self._digest = hashlib.sha256()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._first_line = ""
+        fd, tmp_name = tempfile.mkstemp(dir=data_dir, prefix=".upload-", suffix=".part")
+        self.tmp_path = Path(tmp_name)
+        self._file = os.fdopen(fd, "wb")
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        self.line_count += chunk.count(b"\n")
+
+        try:
+            text = self._decoder.decode(chunk)
+        except UnicodeDecodeError as e:
+            raise UploadRejected(f"Upload is not valid UTF-8 text near byte {self.size}: {e.reason}") from e
+
+        if self.header is None:
+            self._first_line += text
+            line, newline, _ = self._first_line.partition("\n")
+            if len(line.encode("utf-8")) > UPLOAD_MAX_HEADER_BYTES:
+                raise UploadRejected(f"CSV header is longer than {UPLOAD_MAX_HEADER_BYTES} bytes: {line[:200]!r}")
+            if newline:
+                self._parse_header(line)
+
+    def _parse_header(self, line: str):
+        header = next(csv.reader([line.lstrip("\ufeff").rstrip("\r")]), [])
+        if not header or any(not name.strip() for name in header):
+            raise UploadRejected(f"Invalid CSV header: {line[:200]!r}")
+        self.header = header
+        self._first_line = ""
+
+    def commit(self, final_path: Path) -> Path:
+        self._file.close()
+        try:
+            self._decoder.decode(b"", final=True)
+        except UnicodeDecodeError as e:
+            raise UploadRejected(f"Upload ends with a truncated UTF-8 sequence: {e.reason}") from e
+        if self.header is None:
+            self._parse_header(self._first_line)
+        os.chmod(self.tmp_path, 0o644)
+        os.replace(self.tmp_path, final_path)
+        logging.info(
+            f"File {final_path.name} received. Total size: {self.size} bytes, "
+            f"~{max(0, self.line_count - 1)} rows, sha256={self.sha256}."
+        )
+        return final_path
+
+    def discard(self):
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
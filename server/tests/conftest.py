@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+for path in (SERVER_DIR / "src", SERVER_DIR / "proto"):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+import grpc_server
+from catalog import DatasetCatalog
+from csv_to_xml_ev import read_csv_as_columns
+from grpc_server import GenericXMLServicer
+from jobs import JobManager
+from query_backends import MemoryIndexBackend
+from query_index import ColumnarIndex
+from result_cache import ResultCache
+from snapshot_store import save_snapshot
+from type_inference import TypeInferencer
+
+TEST_CSV = SERVER_DIR / "data" / "test.csv"
+
+
+class CatalogServicer:
+    # What the query backends use from GenericXMLServicer, over a temporary catalog and without a database.
+    ensure_xml_artifacts = GenericXMLServicer.ensure_xml_artifacts
+
+    def __init__(self, root: Path):
+        self.catalog = DatasetCatalog(root)
+
+    def publish(self, csv_path: Path, name: str = "test_csv", snapshot: bool = False):
+        inferencer = TypeInferencer()
+        columns = read_csv_as_columns(csv_path, inferencer=inferencer)
+        index = ColumnarIndex(columns, inferencer.result())
+        dataset, version = self.catalog.ensure(name), self.catalog.new_version()
+        saved = save_snapshot(index, csv_path, name, dataset.snapshot_dir, version=version) if snapshot else None
+        return self.catalog.publish(dataset, version, index, csv_path, snapshot=saved)
+
+
+@pytest.fixture
+def servicer(tmp_path):
+    return CatalogServicer(tmp_path / "datasets")
+
+
+@pytest.fixture
+def dataset(servicer):
+    return servicer.publish(TEST_CSV)
+
+
+class FakeContext:
+    def __init__(self):
+        self.code = None
+        self.details = ""
+        self.active = True
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+    def is_active(self):
+        return self.active
+
+
+@pytest.fixture
+def rpc_servicer(tmp_path, monkeypatch):
+    # The RPC handlers over a temporary catalog, without the startup load; ETL runs the fast pipeline without the database.
+    monkeypatch.setattr(grpc_server, "ETL_MODE", "fast")
+    monkeypatch.setattr(grpc_server, "load_columns_to_db", lambda *args, **kwargs: None)
+    rpc = GenericXMLServicer.__new__(GenericXMLServicer)
+    rpc.process_pool = None
+    rpc.catalog = DatasetCatalog(tmp_path / "datasets")
+    rpc.backend = MemoryIndexBackend(rpc)
+    rpc.result_cache = ResultCache()
+    rpc.jobs = JobManager()
+    yield rpc
+    rpc.jobs.shutdown()
@@ -0,0 +1,88 @@
+import shutil
+import threading
+import time
+
+import pytest
+
+from catalog import DatasetCatalog, LoadQueue
+from conftest import TEST_CSV
+
+
+@pytest.fixture
+def snapshot_root(servicer):
+    servicer.publish(TEST_CSV, snapshot=True)
+    return servicer.catalog.root
+
+
+def test_restore_publishes_snapshots_whose_table_matches(snapshot_root):
+    catalog = DatasetCatalog(snapshot_root)
+    assert catalog.restore(table_has_rows=lambda table_name: True) == []
+    assert catalog.get("test_csv").row_count == 12654
+
+
+@pytest.mark.parametrize("has_rows", [None, False])
+def test_restore_skips_datasets_whose_table_was_lost(snapshot_root, has_rows):
+    catalog = DatasetCatalog(snapshot_root)
+    lost = catalog.restore(table_has_rows=lambda table_name: has_rows)
+    assert [snapshot.table_name for snapshot in lost] == ["test_csv"]
+    assert "test_csv" not in catalog
+
+
+def test_restore_skips_datasets_when_the_table_cannot_be_checked(snapshot_root):
+    def unreachable(table_name):
+        raise ConnectionError("database unavailable")
+
+    catalog = DatasetCatalog(snapshot_root)
+    assert len(catalog.restore(table_has_rows=unreachable)) == 1
+    assert "test_csv" not in catalog
+
+
+def test_memory_budget_evicts_least_recently_used_index(servicer):
+    first = servicer.publish(TEST_CSV, name="first", snapshot=True)
+    servicer.catalog.memory_budget = int(first.index_bytes * 1.5)
+    servicer.publish(TEST_CSV, name="second", snapshot=True)
+    assert servicer.catalog.get("first").index is None
+    assert servicer.catalog.get("second").index is not None
+
+
+def test_load_queue_runs_loads_in_the_order_they_were_queued():
+    loads, ran = LoadQueue(), []
+    tickets = []
+    for name in ["a", "b", "c"]:
+        with loads.enqueue(name) as ticket:
+            tickets.append(ticket)
+
+    def run(name, ticket):
+        with loads.turn(name, ticket):
+            ran.append(name)
+
+    threads = [threading.Thread(target=run, args=(name, ticket)) for name, ticket in zip("abc", tickets)]
+    for thread in reversed(threads):
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert ran == ["a", "b", "c"]
+    assert loads.pending_sources() == set()
+
+
+def test_load_queue_gives_up_a_ticket_whose_submission_failed():
+    loads = LoadQueue()
+    with pytest.raises(RuntimeError):
+        with loads.enqueue("a"):
+            raise RuntimeError("job pool closed")
+    with loads.turn("b"):
+        assert loads.pending_sources() == {"b"}
+
+
+def test_publish_keeps_the_sources_of_queued_loads(servicer):
+    dataset = servicer.catalog.ensure("test_csv")
+    dataset.directory.mkdir(parents=True, exist_ok=True)
+    older, current, queued = (dataset.directory / f"source-{name}.csv" for name in ["older", "current", "queued"])
+    for path in [queued, older, current]:
+        shutil.copy(TEST_CSV, path)
+
+    with dataset.loads.enqueue(queued):
+        pass
+    servicer.publish(current)
+    assert sorted(path.name for path in dataset.directory.glob("source-*.csv")) == [current.name, queued.name]
@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+
+import pytest
+from psycopg2 import errors
+
+import import_xml_to_postgres
+
+
+class LockedCursor:
+    # Every swap attempt finds the table held by a reader.
+    def __init__(self, executed: list):
+        self.executed = executed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+        if sql.startswith("DROP TABLE") and "__staging" not in sql:
+            raise errors.LockNotAvailable("canceling statement due to lock timeout")
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    executed = []
+
+    class Connection:
+        def cursor(self):
+            return LockedCursor(executed)
+
+    @contextmanager
+    def connection():
+        yield Connection()
+
+    monkeypatch.setattr(import_xml_to_postgres, "connection", connection)
+    monkeypatch.setattr(import_xml_to_postgres.time, "sleep", lambda seconds: None)
+    return executed
+
+
+def test_swap_that_gives_up_drops_the_staging_table(executed):
+    with pytest.raises(errors.LockNotAvailable):
+        import_xml_to_postgres.swap_table("sales__staging", "sales", retries=3)
+    assert sum(sql.startswith('DROP TABLE IF EXISTS "sales"') for sql in executed) == 3
+    assert executed[-1] == 'DROP TABLE IF EXISTS "sales__staging" CASCADE;'
@@ -0,0 +1,112 @@
+import threading
+
+import grpc
+import pytest
+
+import ev_pb2
+import grpc_server
+from conftest import TEST_CSV, FakeContext
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobManager
+
+STATES = [QUEUED, RUNNING, SUCCEEDED, FAILED]
+
+
+def watch(servicer, job_id: str) -> list:
+    return list(servicer.WatchJob(ev_pb2.JobStatusRequest(job_id=job_id), FakeContext()))
+
+
+def assert_state_order(statuses: list, final: str):
+    states = [status.state for status in statuses]
+    assert states == sorted(states, key=STATES.index)
+    assert states[-1] == final
+
+
+@pytest.fixture
+def jobs():
+    manager = JobManager()
+    yield manager
+    manager.shutdown()
+
+
+def test_job_goes_from_queued_through_running_to_failed(jobs):
+    start, seen = threading.Event(), []
+
+    def work(job):
+        start.wait(5)
+        job.set_stage("parse_csv")
+        seen.append(job.state)
+        return False
+
+    job = jobs.submit("bad.csv", "bad", work)
+    assert job.state == QUEUED
+    start.set()
+    while not job.finished:
+        job.wait_for_change(job.version, timeout=5)
+    assert seen == [RUNNING]
+    assert (job.state, job.stage) == (FAILED, "parse_csv")
+
+
+def test_job_that_raises_fails_with_the_error(jobs):
+    def work(job):
+        job.set_stage("db_load")
+        raise ConnectionError("database unavailable")
+
+    job = jobs.submit("data.csv", "data", work)
+    while not job.finished:
+        job.wait_for_change(job.version, timeout=5)
+    assert (job.state, job.message) == (FAILED, "database unavailable")
+
+
+def test_watch_job_streams_every_stage_until_it_fails(rpc_servicer):
+    start, stages_done = threading.Event(), threading.Event()
+
+    def work(job):
+        start.wait(5)
+        for stage in ("parse_csv", "validate", "db_load"):
+            job.set_stage(stage)
+            job.set_progress(100)
+        stages_done.wait(5)
+        raise ValueError("bad row")
+
+    job = rpc_servicer.jobs.submit("data.csv", "data", work)
+    statuses = rpc_servicer.WatchJob(ev_pb2.JobStatusRequest(job_id=job.job_id), FakeContext())
+    assert next(statuses).state == QUEUED
+    start.set()
+    rest = []
+    for status in statuses:
+        rest.append(status)
+        if status.stage == "db_load" and status.rows_processed == 100:
+            stages_done.set()
+    assert_state_order(rest, FAILED)
+    assert rest[-1].message == "bad row"
+    assert {status.stage for status in rest} <= {"parse_csv", "validate", "db_load"}
+
+
+def test_failed_upload_is_reported_by_its_job(rpc_servicer, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(grpc_server, "load_columns_to_db", unavailable)
+    chunks = [ev_pb2.UploadRequest(info=ev_pb2.FileInfo(filename="sales.csv")), ev_pb2.UploadRequest(chunk_data=TEST_CSV.read_bytes())]
+    status = rpc_servicer.UploadDataset(iter(chunks), FakeContext())
+    assert status.success and status.job_id
+
+    statuses = watch(rpc_servicer, status.job_id)
+    assert_state_order(statuses, FAILED)
+    assert "database unavailable" in statuses[-1].message
+    assert rpc_servicer.GetJobStatus(ev_pb2.JobStatusRequest(job_id=status.job_id), FakeContext()).state == FAILED
+    assert status.dataset not in rpc_servicer.catalog
+
+
+def test_successful_upload_publishes_the_dataset(rpc_servicer):
+    chunks = [ev_pb2.UploadRequest(info=ev_pb2.FileInfo(filename="sales.csv")), ev_pb2.UploadRequest(chunk_data=TEST_CSV.read_bytes())]
+    status = rpc_servicer.UploadDataset(iter(chunks), FakeContext())
+    assert_state_order(watch(rpc_servicer, status.job_id), SUCCEEDED)
+    assert rpc_servicer.catalog.get(status.dataset).row_count == 12654
+
+
+def test_unknown_job_is_not_found(rpc_servicer):
+    context = FakeContext()
+    assert watch(rpc_servicer, "no-such-job") == []
+    rpc_servicer.GetJobStatus(ev_pb2.JobStatusRequest(job_id="no-such-job"), context)
+    assert context.code == grpc.StatusCode.NOT_FOUND
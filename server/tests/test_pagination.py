@@ -0,0 +1,75 @@
+import grpc
+import pytest
+
+import ev_pb2
+from conftest import TEST_CSV, FakeContext
+
+
+@pytest.fixture
+def published(rpc_servicer):
+    assert rpc_servicer.run_etl_pipeline(TEST_CSV, "test_csv")
+    assert rpc_servicer.run_etl_pipeline(TEST_CSV, "other")
+    return rpc_servicer
+
+
+def request(**kwargs):
+    return ev_pb2.SalesFilterRequest(dataset="test_csv", filters={"region": "Austria"}, **kwargs)
+
+
+def pages(servicer, limit: int, **kwargs) -> list:
+    replies = [servicer.GetSalesFiltered(request(limit=limit, **kwargs), FakeContext())]
+    while replies[-1].next_cursor:
+        replies.append(servicer.GetSalesFiltered(request(limit=limit, cursor=replies[-1].next_cursor, **kwargs), FakeContext()))
+    return replies
+
+
+@pytest.mark.parametrize("limit", [1, 7, 50])
+def test_pages_cover_every_row_once(published, limit):
+    everything = list(published.GetSalesFiltered(request(), FakeContext()).sales_xml)
+    replies = pages(published, limit)
+    assert [len(reply.sales_xml) for reply in replies[:-1]] == [limit] * (len(replies) - 1)
+    assert [row for reply in replies for row in reply.sales_xml] == everything
+    assert len(everything) > 50
+
+
+def test_columnar_pages_carry_only_the_projected_fields(published):
+    replies = pages(published, 25, format=ev_pb2.SalesFilterRequest.COLUMNAR, fields=["year", "value"])
+    assert all([column.name for column in reply.columnar.columns] == ["year", "value"] for reply in replies)
+    whole = published.GetSalesFiltered(request(format=ev_pb2.SalesFilterRequest.COLUMNAR, fields=["year", "value"]), FakeContext())
+    assert [value for reply in replies for value in reply.columnar.columns[1].double_values] == list(whole.columnar.columns[1].double_values)
+
+
+def test_stream_continues_from_a_cursor(published):
+    first = published.GetSalesFiltered(request(limit=10), FakeContext())
+    streamed = list(published.GetSalesFilteredStream(request(cursor=first.next_cursor, page_size=4), FakeContext()))
+    everything = list(published.GetSalesFiltered(request(), FakeContext()).sales_xml)
+    assert list(first.sales_xml) + [row for reply in streamed for row in reply.sales_xml] == everything
+    assert not streamed[-1].next_cursor
+
+
+@pytest.mark.parametrize("other", [
+    ev_pb2.SalesFilterRequest(dataset="test_csv", filters={"region": "Belgium"}, limit=10),
+    ev_pb2.SalesFilterRequest(dataset="other", filters={"region": "Austria"}, limit=10),
+    ev_pb2.SalesFilterRequest(dataset="test_csv", filters={"region": "Austria"}, limit=10,
+                              predicates=[ev_pb2.Predicate(field="year", op=ev_pb2.Predicate.GT, values=[ev_pb2.TypedValue(int_value=2015)])]),
+], ids=["filters", "dataset", "predicates"])
+def test_cursor_of_another_query_is_rejected(published, other):
+    cursor = published.GetSalesFiltered(request(limit=10), FakeContext()).next_cursor
+    other.cursor = cursor
+    context = FakeContext()
+    assert not published.GetSalesFiltered(other, context).sales_xml
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+
+
+def test_malformed_cursor_is_rejected(published):
+    context = FakeContext()
+    published.GetSalesFiltered(request(limit=10, cursor="not-a-cursor"), context)
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+
+
+def test_cursor_from_before_a_republish_is_rejected(published):
+    cursor = published.GetSalesFiltered(request(limit=10), FakeContext()).next_cursor
+    assert published.run_etl_pipeline(TEST_CSV, "test_csv")
+    context = FakeContext()
+    assert not published.GetSalesFiltered(request(limit=10, cursor=cursor), context).sales_xml
+    assert context.code == grpc.StatusCode.FAILED_PRECONDITION
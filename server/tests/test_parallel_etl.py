@@ -0,0 +1,38 @@
+from concurrent import futures
+
+import numpy as np
+import pandas as pd
+
+import parallel_etl
+from conftest import TEST_CSV
+from csv_to_xml_ev import read_csv_as_columns
+from import_xml_to_postgres import copy_text
+from query_index import ColumnarIndex
+from type_inference import TypeInferencer, convert_columns
+
+
+def test_parallel_parse_matches_serial_parse(monkeypatch):
+    monkeypatch.setattr(parallel_etl, "ETL_SHARD_MIN_BYTES", 64 * 1024)
+    shards = parallel_etl.plan_shards(TEST_CSV, workers=2)
+    assert len(shards) > 2
+
+    inferencer = TypeInferencer()
+    serial = ColumnarIndex(read_csv_as_columns(TEST_CSV, inferencer=inferencer), inferencer.result())
+
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        columns, column_types = parallel_etl.parse_csv_parallel(TEST_CSV, shards, executor)
+        copy_shards = list(parallel_etl.iter_copy_shards(shards, column_types, executor))
+
+    assert repr(column_types) == repr(inferencer.result())
+    index = ColumnarIndex.from_encoded(columns, column_types)
+    assert index.row_count == serial.row_count
+    for name, arrays in serial.to_arrays().items():
+        for kind, array in arrays.items():
+            assert np.array_equal(index.to_arrays()[name][kind], array), (name, kind)
+
+    frame = convert_columns(pd.read_csv(TEST_CSV, dtype=str, keep_default_na=False), column_types)
+    frame.insert(0, "id", np.arange(1, len(frame) + 1, dtype=np.int64))
+    # Shards may finish in any order; each starts with its first row's id.
+    texts = sorted((text for text, _ in copy_shards), key=lambda text: int(text.split("\t", 1)[0]))
+    assert sum(rows for _, rows in copy_shards) == len(frame)
+    assert "".join(texts) == copy_text(frame)
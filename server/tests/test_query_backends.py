@@ -0,0 +1,222 @@
+import pytest
+
+import db_pool
+from query_backends import MemoryIndexBackend, PostgresBackend, XMLBackend
+
+BACKENDS = [MemoryIndexBackend, XMLBackend]
+ROW_COUNT = 12654
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda backend: backend.name)
+def backend(request, servicer):
+    return request.param(servicer)
+
+
+def test_aggregate_without_filters_counts_every_row(backend, dataset):
+    assert backend.aggregate(dataset, {}, [], [], [("count", "")]) == [([], [ROW_COUNT])]
+
+
+@pytest.mark.parametrize("filters", [
+    {"region": "Nowhere"},
+    {"region": "Nowhere", "parameter": "EV sales"},
+    {"no_such_field": "x"},
+])
+def test_aggregate_with_unmatched_filters_counts_nothing(backend, dataset, filters):
+    assert backend.aggregate(dataset, filters, [], [], [("count", "")]) == [([], [0])]
+    assert backend.aggregate(dataset, filters, [], ["region"], [("count", "")]) == []
+
+
+def test_unknown_filter_value_is_ignored_by_queries(backend, dataset):
+    matched = list(backend.find_records(dataset, {"parameter": "EV sales"}, []))
+    assert matched
+    assert list(backend.find_records(dataset, {"region": "Nowhere", "parameter": "EV sales"}, [])) == matched
+
+
+@pytest.fixture
+def quoted_dataset(servicer, tmp_path):
+    source = tmp_path / "quoted.csv"
+    source.write_text("region,value\nCote d'Ivoire,1\nCote dIvoire,2\nPortugal,3\n")
+    return servicer.publish(source, name="quoted")
+
+
+def test_filter_value_with_apostrophe(backend, quoted_dataset):
+    rows = backend.find_records(quoted_dataset, {"region": "Cote d'Ivoire"}, [])
+    assert list(rows) == [("Cote d'Ivoire", "1")]
+
+
+def test_xml_filter_value_with_apostrophe_without_index(servicer, quoted_dataset):
+    # Without a loaded index the XML backend checks the value with an XPath lookup instead.
+    assert servicer.ensure_xml_artifacts(quoted_dataset)
+    servicer.catalog.index_for = lambda dataset: None
+    assert list(XMLBackend(servicer).find_records(quoted_dataset, {"region": "Cote d'Ivoire"}, [])) == [("Cote d'Ivoire", "1")]
+
+
+@pytest.mark.parametrize("match_all, region_clause, region_params", [
+    # Queries: a value the column does not have is ignored, inside the one query.
+    (False, '("region" = %s OR NOT EXISTS (SELECT 1 FROM "t" WHERE "region" = %s))', ["Nowhere", "Nowhere"]),
+    # Aggregates: it matches no rows.
+    (True, '"region" = %s', ["Nowhere"]),
+])
+def test_postgres_filters_go_straight_into_the_where_clause(servicer, match_all, region_clause, region_params):
+    # Built without a connection: no lookup query runs before the main one.
+    where, params = PostgresBackend(servicer)._where_clause(
+        "t",
+        {"region": "text", "value": "numeric"},
+        {"region": "Nowhere", "no_such_field": "x"},
+        [("value", "gt", ["1.234,5"])],
+        match_all=match_all,
+    )
+    assert where == [region_clause, '"value" > %s']
+    assert params == region_params + [1234.5]
+
+
+@pytest.mark.parametrize("predicates", [
+    [("value", "gt", [1000000])],
+    [("value", "le", ["1.234,5"])],
+    [("percentage", "ge", [50])],
+    [("percentage", "between", ["10,5", 1000.0])],
+    [("value", "eq", [7])],
+    [("value", "ne", [7])],
+    [("value", "in", [3, "350", 1e9])],
+    [("year", "between", [2015, 2020]), ("value", "lt", [100])],
+], ids=str)
+def test_xml_numeric_predicates_match_memory_index(servicer, dataset, predicates):
+    expected = list(MemoryIndexBackend(servicer).find_records(dataset, {"parameter": "EV sales"}, predicates))
+    assert expected
+    assert list(XMLBackend(servicer).find_records(dataset, {"parameter": "EV sales"}, predicates)) == expected
+
+
+@pytest.mark.parametrize("predicates", [
+    [("region", "lt", ["Brazil"])],
+    [("region", "ge", ["USA"])],
+    [("region", "between", ["China", "France"])],
+    # Text, not numbers: "10" sorts before "9".
+    [("region", "gt", [10])],
+    [("mode", "le", ["Cars"]), ("powertrain", "gt", ["BEV"])],
+], ids=str)
+def test_xml_text_predicates_match_memory_index(servicer, dataset, predicates):
+    expected = list(MemoryIndexBackend(servicer).find_records(dataset, {}, predicates))
+    assert expected
+    assert list(XMLBackend(servicer).find_records(dataset, {}, predicates)) == expected
+
+
+@pytest.fixture
+def typed_dataset(servicer, tmp_path):
+    source = tmp_path / "typed.csv"
+    source.write_text("region,value,share\nPortugal,\"1.234,5\",\"10,5%\"\nSpain,7,50%\nCote d'Ivoire,350,5%\n\"Bosnia \"\"BA\"\"\",3,1%\n")
+    return servicer.publish(source, name="typed")
+
+
+@pytest.mark.parametrize("predicate, regions", [
+    (("value", "eq", [7]), ["Spain"]),
+    # Values arrive as text and are coerced to the column's type.
+    (("value", "eq", ["1.234,5"]), ["Portugal"]),
+    (("value", "lt", ["350"]), ["Spain", 'Bosnia "BA"']),
+    (("value", "gt", [300]), ["Portugal", "Cote d'Ivoire"]),
+    (("value", "in", [3, "7", 9.5]), ["Spain", 'Bosnia "BA"']),
+    (("share", "gt", ["5%"]), ["Portugal", "Spain"]),
+    (("region", "eq", ["Cote d'Ivoire"]), ["Cote d'Ivoire"]),
+    (("region", "in", ['Bosnia "BA"', "Cote d'Ivoire", "Nowhere"]), ["Cote d'Ivoire", 'Bosnia "BA"']),
+    (("region", "lt", ["Portugal"]), ["Cote d'Ivoire", 'Bosnia "BA"']),
+    (("region", "gt", ["Portugal"]), ["Spain"]),
+], ids=str)
+def test_predicates(backend, typed_dataset, predicate, regions):
+    assert [row[0] for row in backend.find_records(typed_dataset, {}, [predicate])] == regions
+
+
+@pytest.mark.parametrize("predicate", [("value", "lt", ["many"]), ("value", "in", [1, "x"]), ("value", "eq", [])], ids=str)
+def test_invalid_predicate_values_are_rejected(backend, typed_dataset, predicate):
+    with pytest.raises(ValueError):
+        list(backend.find_records(typed_dataset, {}, [predicate]))
+
+
+@pytest.mark.parametrize("predicate, clause, params", [
+    (("value", "eq", ["1.234,5"]), '"value" = %s', [1234.5]),
+    (("value", "lt", ["350"]), '"value" < %s', [350]),
+    (("value", "gt", [300]), '"value" > %s', [300]),
+    (("value", "in", [3, "7"]), '"value" = ANY(%s)', [[3, 7]]),
+    (("region", "gt", ["Cote d'Ivoire"]), '"region" > %s', ["Cote d'Ivoire"]),
+    (("region", "in", ['Bosnia "BA"', 7]), '"region" = ANY(%s)', [['Bosnia "BA"', "7"]]),
+], ids=str)
+def test_postgres_predicates_bind_coerced_values(servicer, predicate, clause, params):
+    where, bound = PostgresBackend(servicer)._where_clause("t", {"region": "text", "value": "numeric"}, {}, [predicate])
+    assert (where, bound) == ([clause], params)
+
+
+def test_postgres_rejects_a_non_numeric_value_for_a_numeric_column(servicer):
+    with pytest.raises(ValueError):
+        PostgresBackend(servicer)._where_clause("t", {"value": "numeric"}, {}, [("value", "lt", ["many"])])
+
+
+class FakeCursor:
+    def __init__(self, rows, executed: list):
+        self.rows = rows
+        self.executed = executed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return [("region", "text"), ("value", "numeric")]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeConnection:
+    closed = False
+
+    def __init__(self, executed: list):
+        self.executed = executed
+
+    def cursor(self, name=None):
+        return FakeCursor([("Portugal", 1.5), ("Spain", 2.0)], self.executed)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    counts = {"borrowed": 0, "released": 0, "executed": []}
+
+    def borrow():
+        counts["borrowed"] += 1
+        return FakeConnection(counts["executed"])
+
+    def release(conn, close=False):
+        counts["released"] += 1
+
+    monkeypatch.setattr(db_pool, "borrow", borrow)
+    monkeypatch.setattr(db_pool, "release", release)
+    return counts
+
+
+@pytest.mark.parametrize("rows_read", [0, 1, 2])
+def test_postgres_rows_release_their_connection_when_closed(servicer, dataset, fake_pool, rows_read):
+    rows = PostgresBackend(servicer).find_records(dataset, {}, [("value", "gt", [0])])
+    for _ in range(rows_read):
+        next(rows)
+    rows.close()
+    assert fake_pool["borrowed"] == fake_pool["released"]
+
+
+def test_postgres_filter_value_with_apostrophe_is_a_parameter(servicer, quoted_dataset, fake_pool):
+    list(PostgresBackend(servicer).find_records(quoted_dataset, {"region": "Cote d'Ivoire"}, []))
+    sql, params = fake_pool["executed"][-1]
+    assert '"region" = %s' in sql and "Cote" not in sql
+    assert params == ["Cote d'Ivoire", "Cote d'Ivoire"]
+
+
+def test_postgres_stream_bounds_its_idle_transaction(servicer, dataset, fake_pool):
+    list(PostgresBackend(servicer).find_records(dataset, {}, [("value", "gt", [0])]))
+    assert any("idle_in_transaction_session_timeout" in sql for sql, params in fake_pool["executed"])
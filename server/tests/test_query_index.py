@@ -0,0 +1,25 @@
+import numpy as np
+
+from query_index import ColumnarIndex, encode_column, merge_encoded
+
+
+def test_nbytes_counts_dictionary_strings():
+    values = [f"{i:04d}" + "x" * 1000 for i in range(1000)]
+    index = ColumnarIndex({"text": values})
+    assert index.nbytes >= sum(len(value) for value in values)
+
+
+def test_encode_column_matches_np_unique():
+    values = ["b", "", "Türkiye", "a", "b", "10", "9", ""]
+    dictionary, codes = encode_column(values)
+    expected_dictionary, expected_codes = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+    assert dictionary.tolist() == expected_dictionary.tolist()
+    assert codes.tolist() == expected_codes.tolist() and codes.dtype == np.int32
+
+
+def test_merge_encoded_matches_encoding_the_whole_column():
+    pieces = [["b", "a", "b"], ["c", "a"], ["", "c"]]
+    dictionary, codes = merge_encoded([encode_column(piece) for piece in pieces])
+    expected_dictionary, expected_codes = encode_column(sum(pieces, []))
+    assert dictionary.tolist() == expected_dictionary.tolist()
+    assert codes.tolist() == expected_codes.tolist()
@@ -0,0 +1,54 @@
+import ev_pb2
+from conftest import TEST_CSV, FakeContext
+from result_cache import ResultCache
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = ResultCache(max_bytes=1000, max_entries=2, ttl=0)
+    cache.put("a", "A", 10)
+    cache.put("b", "B", 10)
+    assert cache.get("a") == "A"
+    cache.put("c", "C", 10)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_evicted_to_stay_within_the_byte_budget():
+    cache = ResultCache(max_bytes=100, max_entries=10, ttl=0, max_item_fraction=0.5)
+    for key in "abc":
+        cache.put(key, key, 40)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 80
+    cache.put("d", "d", 60)
+    assert cache.get("d") is None
+    assert cache.stats()["too_large"] == 1
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("result_cache.time.monotonic", lambda: now[0])
+    cache = ResultCache(max_bytes=1000, ttl=5)
+    cache.put("a", "A", 10)
+    now[0] += 4
+    assert cache.get("a") == "A"
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["bytes"] == 0
+
+
+def test_publishing_a_version_drops_the_datasets_cached_replies(rpc_servicer):
+    assert rpc_servicer.run_etl_pipeline(TEST_CSV, "test_csv")
+    assert rpc_servicer.run_etl_pipeline(TEST_CSV, "other")
+    request = ev_pb2.SalesFilterRequest(dataset="test_csv", filters={"region": "Austria"}, limit=5)
+    other = ev_pb2.SalesFilterRequest(dataset="other", filters={"region": "Austria"}, limit=5)
+    first = rpc_servicer.GetSalesFiltered(request, FakeContext())
+    assert rpc_servicer.GetSalesFiltered(request, FakeContext()) is first
+    cached_other = rpc_servicer.GetSalesFiltered(other, FakeContext())
+
+    assert rpc_servicer.run_etl_pipeline(TEST_CSV, "test_csv")
+    assert rpc_servicer.result_cache.stats()["invalidations"] == 1
+    again = rpc_servicer.GetSalesFiltered(request, FakeContext())
+    assert again is not first and list(again.sales_xml) == list(first.sales_xml)
+    assert rpc_servicer.GetSalesFiltered(other, FakeContext()) is cached_other
@@ -0,0 +1,76 @@
+import pytest
+
+import schema_generator
+from csv_to_xml_ev import convert_csv_to_xml
+from schema_generator import generate_xsd, generate_xsd_from_xml, validate_xml_with_xsd
+from type_inference import BOOLEAN, LOCALE_NUMBER, TypeInferencer
+
+ENGINES = ["xmlschema", "lxml", "lxml-stream"]
+
+
+def convert(tmp_path, text: str):
+    csv_path, xml_path, xsd_path = tmp_path / "data.csv", tmp_path / "data.xml", tmp_path / "data.xsd"
+    csv_path.write_text(text)
+    inferencer = TypeInferencer()
+    convert_csv_to_xml(csv_path, output_path=xml_path, inferencer=inferencer)
+    column_types = inferencer.result()
+    assert generate_xsd_from_xml(column_types, xml_path, xsd_path)
+    return column_types, xml_path, xsd_path
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_empty_locale_number_cell_is_valid(tmp_path, engine):
+    column_types, xml_path, xsd_path = convert(tmp_path, 'region,value\nAustria,"1.234,5"\nBelgium,\nBrazil,"50,3%"\n')
+    assert column_types["value"].kind == LOCALE_NUMBER and column_types["value"].nullable
+    assert validate_xml_with_xsd(engine, xml_path, xsd_path)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_empty_boolean_cell_is_valid(tmp_path, engine):
+    column_types, xml_path, xsd_path = convert(tmp_path, "region,electric\nAustria,true\nBelgium,\nBrazil,FALSE\n")
+    assert column_types["electric"].kind == BOOLEAN and column_types["electric"].nullable
+    assert validate_xml_with_xsd(engine, xml_path, xsd_path)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_malformed_locale_number_is_rejected(tmp_path, engine):
+    _, xml_path, xsd_path = convert(tmp_path, 'region,value\nAustria,"1.234,5"\nBelgium,\n')
+    xml_path.write_text(xml_path.read_text().replace("1.234,5", "1,2,3"))
+    assert not validate_xml_with_xsd(engine, xml_path, xsd_path)
+
+
+def test_xsd_from_column_types_matches_xsd_from_xml(tmp_path):
+    column_types, xml_path, xsd_path = convert(tmp_path, 'region,value\nAustria,"1.234,5"\nBelgium,\n')
+    assert generate_xsd(list(column_types), column_types, tmp_path / "direct.xsd")
+    assert (tmp_path / "direct.xsd").read_bytes() == xsd_path.read_bytes()
+
+
+def test_xsd_from_xml_reads_only_the_first_row(tmp_path):
+    # Not well-formed past the first row: a whole-document parse would fail.
+    xml_path = tmp_path / "data.xml"
+    xml_path.write_text("<dataset><row><region>Austria</region><value>1</value></row><row><region>" + "x" * 100_000)
+    assert generate_xsd_from_xml(None, xml_path, tmp_path / "data.xsd")
+    assert 'name="region"' in (tmp_path / "data.xsd").read_text()
+
+
+def test_lazy_xml_artifacts_take_the_xsd_from_the_index(servicer, dataset, monkeypatch):
+    def read_xml(*args):
+        raise AssertionError("the XSD must not be built by reading the XML")
+
+    monkeypatch.setattr(schema_generator, "first_row_columns", read_xml)
+    monkeypatch.setattr(schema_generator.ET, "parse", read_xml)
+    assert servicer.ensure_xml_artifacts(dataset)
+    assert validate_xml_with_xsd("lxml-stream", dataset.xml_path, dataset.xsd_path)
+
+
+def test_compiled_schemas_are_cached_by_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(schema_generator, "_schemas", schema_generator.OrderedDict())
+    monkeypatch.setattr(schema_generator, "SCHEMA_CACHE_SIZE", 2)
+    for name, columns in [("first", ["a"]), ("same", ["a"]), ("b", ["b"]), ("c", ["c"])]:
+        assert generate_xsd(columns, xsd_path=tmp_path / f"{name}.xsd")
+
+    first = schema_generator.load_compiled_schema(tmp_path / "first.xsd")
+    assert schema_generator.load_compiled_schema(tmp_path / "same.xsd") is first
+    schema_generator.load_compiled_schema(tmp_path / "b.xsd")
+    schema_generator.load_compiled_schema(tmp_path / "c.xsd")
+    assert len(schema_generator._schemas) == 2
@@ -0,0 +1,37 @@
+import numpy as np
+
+from query_index import ColumnarIndex
+from snapshot_store import save_snapshot
+from type_inference import infer_column_types
+
+
+def make_index(columns) -> ColumnarIndex:
+    return ColumnarIndex(columns, infer_column_types(columns))
+
+
+def test_snapshot_round_trip(tmp_path):
+    source = tmp_path / "source.csv"
+    source.write_text("unused")
+    columns = {
+        "region": ["Portugal", "Türkiye", "Portugal", "日本"],
+        "value": ["1.234,5", "", "50,3%", "7"],
+        "empty": ["", "", "", ""],
+    }
+    index = make_index(columns)
+    loaded = save_snapshot(index, source, "t", tmp_path / "snapshots").load_index()
+
+    rows = np.arange(index.row_count)
+    assert list(loaded.iter_rows(rows)) == list(index.iter_rows(rows))
+    assert loaded.has_value("region", "Türkiye") and not loaded.has_value("region", "Turkey")
+    assert list(loaded.evaluate("value", "gt", [10])) == list(index.evaluate("value", "gt", [10]))
+
+
+def test_long_value_does_not_widen_the_dictionary(tmp_path):
+    source = tmp_path / "source.csv"
+    source.write_text("unused")
+    values = [f"region {i}" for i in range(2_000)] + ["x" * 10_000]
+    snapshot = save_snapshot(make_index({"region": values}), source, "t", tmp_path / "snapshots")
+
+    dictionary_bytes = sum(path.stat().st_size for path in snapshot.path.glob("0.dictionary*.npy"))
+    payload = sum(len(value) for value in values)
+    assert dictionary_bytes < 2 * payload + 8 * len(values) + 1024
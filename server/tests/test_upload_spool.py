@@ -0,0 +1,23 @@
+import pytest
+
+from upload_spool import UPLOAD_MAX_HEADER_BYTES, UploadRejected, UploadSpool
+
+
+def test_header_split_across_chunks(tmp_path):
+    spool = UploadSpool(tmp_path)
+    for chunk in (b"region,cat", b"egory,v\xc3", b"\xa9\n", b"a,b,1\n"):
+        spool.write(chunk)
+    assert spool.header == ["region", "category", "vé"]
+    spool.commit(tmp_path / "upload.csv")
+    assert (tmp_path / "upload.csv").read_bytes() == "region,category,vé\na,b,1\n".encode("utf-8")
+
+
+def test_header_without_newline_is_rejected_at_the_limit(tmp_path):
+    spool = UploadSpool(tmp_path)
+    chunk = b"x" * 4096
+    with pytest.raises(UploadRejected, match="header is longer"):
+        for _ in range(UPLOAD_MAX_HEADER_BYTES // len(chunk) + 1):
+            spool.write(chunk)
+    assert len(spool._first_line) <= UPLOAD_MAX_HEADER_BYTES + len(chunk)
+    spool.discard()
+    assert not list(tmp_path.iterdir())